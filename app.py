@@ -1,7 +1,9 @@
 import streamlit as st
 import os
 import sys
-from datetime import datetime, date
+import uuid
+from concurrent.futures import TimeoutError
+from datetime import date
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(__file__))
@@ -9,19 +11,33 @@ sys.path.append(os.path.dirname(__file__))
 # Import custom modules
 try:
     from config import config
-    from database.operations import init_database, get_next_donor_id
+    from database.operations import ensure_database, get_next_donor_id
+    from database.changes import start_change_feed
     from database.operations import create_donor, get_donor_by_username, get_donor_by_email
-    from database.operations import get_inventory, get_low_stock_items, update_inventory_stock, update_inventory
-    from database.operations import create_donation, get_donations_by_donor, get_donation_analytics
-    from database.operations import create_child, get_children, get_child_by_id, create_issue, get_issues_by_child, \
-        update_child_last_issue
-    from database.operations import get_all_donations
-    from auth.authentication import hash_password, check_password, authenticate_user, validate_password_strength
+    from database.operations import get_inventory, get_low_stock_items, update_inventory
+    from database.operations import create_child, get_children, get_child_by_id, record_issue, get_issues_by_child
+    from database.operations import get_stock_levels, get_donations_between, get_issues_between, \
+        get_issue_totals_by_weekday
+    from auth.authentication import hash_password, check_password, authenticate_user, validate_password_strength, \
+        forget_unknown_identifier, LoginThrottled
+    from auth.hashing import HasherBusy
     from auth.validation import validate_nic, validate_phone, validate_email, validate_password
-    from services.email_service import send_verification_email, send_donation_receipt_email
-    from services.sms_service import send_donation_confirmation_sms
+    from services.email_service import send_verification_email
+    from services.email_outbox import start_email_worker
+    from services.sms_dispatcher import start_sms_worker
+    from services.event_pipeline import start_event_consumers, record_donation, register_analytics_refresher
+    from services.analytics_snapshot import refresh_snapshot, get_snapshot, summary
+    from services.ranking_service import refresh_ranking, get_ranking
+    from services.upload_service import store_upload, UploadRejected
     from services.report_service import display_analytics_dashboard
-    from utils.helpers import setup_directories, generate_receipt_number, get_stock_status, allowed_file, \
+    from services.cohort_service import display_cohort_analytics
+    from services.donor_history_service import display_donor_summary, display_donation_history
+    from services.campaign_service import display_campaign_progress, display_campaign_admin
+    from services.diagnostics_service import display_diagnostics_panel
+    from services.verification_service import display_verification_queue, display_reconciliation_sets
+    from utils import instrumentation, metrics
+    from utils.pdf_generator import is_receipt_ready
+    from utils.helpers import setup_directories, get_stock_status, allowed_file, \
         create_placeholder_images
 except ImportError as e:
     st.error(f"Import error: {e}")
@@ -36,12 +52,31 @@ st.set_page_config(
 )
 
 
+def start_metrics():
+    """Register scrape-time gauges and start the metrics endpoint"""
+    metrics.register_gauge(
+        'husma_inventory_stock',
+        'Current stock per product',
+        lambda: [({'product': name}, stock) for name, stock in get_stock_levels()]
+    )
+    metrics.start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
+
 def initialize_app():
     """Initialize the application"""
     try:
         setup_directories()
         create_placeholder_images()
-        init_database()
+        ensure_database()
+        instrumentation.install_streamlit_hooks()
+        start_email_worker()
+        start_sms_worker()
+        start_event_consumers()
+        start_change_feed()
+        register_analytics_refresher(refresh_snapshot)
+        register_analytics_refresher(refresh_ranking)
+        if config.METRICS_ENABLED:
+            start_metrics()
         return True
     except Exception as e:
         st.error(f"Initialization error: {e}")
@@ -160,7 +195,7 @@ def show_home():
     st.markdown("### 📈 Quick Statistics")
 
     try:
-        analytics = get_donation_analytics()
+        analytics = summary(get_snapshot())
         children = get_children()
         inventory = get_inventory()
 
@@ -181,6 +216,13 @@ def show_home():
     except Exception as e:
         st.warning("Statistics temporarily unavailable")
 
+    # Campaign Progress
+    st.markdown("### 🎯 Our Goals")
+    try:
+        display_campaign_progress()
+    except Exception as e:
+        st.warning("Campaign progress temporarily unavailable")
+
     # Call to Action
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
@@ -195,35 +237,62 @@ def show_home():
             navigate_to("Dashboard")
 
 
+def get_client_ip():
+    """Best-effort client address from the proxy headers of this session"""
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers() or {}
+    except Exception:
+        return None
+    forwarded = headers.get("X-Forwarded-For") or headers.get("X-Real-Ip")
+    return forwarded.split(",")[0].strip() if forwarded else None
+
+
+def submit_login():
+    """Login form callback: runs before the rerun, so the page renders as the signed-in donor"""
+    username = st.session_state.login_identifier
+    password = st.session_state.login_password
+    if not username or not password:
+        st.session_state.login_message = ('error', "Please enter both username and password")
+        return
+
+    try:
+        donor = authenticate_user(username, password, get_client_ip())
+    except LoginThrottled as e:
+        st.session_state.login_message = ('error', str(e))
+        return
+    except (HasherBusy, TimeoutError):
+        # A queued check that outlives HASH_TIMEOUT is as busy as one the pool turned away
+        st.session_state.login_message = ('warning', "The server is busy right now. Please try again in a moment.")
+        return
+
+    if donor:
+        st.session_state.user = {
+            'donor_id': donor['donor_id'],
+            'name': donor['name'],
+            'username': donor['username'],
+            'email': donor['email'],
+            'phone': donor['phone']
+        }
+        st.toast(f"Welcome back, {donor['name']}!")
+        st.session_state.show_login = False
+    else:
+        st.session_state.login_message = ('error', "Invalid username or password")
+
+
 # Login Form
 def show_login_form():
     st.markdown("### 🔐 Login to Your Account")
 
     with st.form("login_form"):
-        username = st.text_input("Username or Email")
-        password = st.text_input("Password", type="password")
-
-        submitted = st.form_submit_button("Login", type="primary", use_container_width=True)
+        st.text_input("Username or Email", key="login_identifier")
+        st.text_input("Password", type="password", key="login_password")
 
-        if submitted:
-            if not username or not password:
-                st.error("Please enter both username and password")
-                return
+        st.form_submit_button("Login", type="primary", use_container_width=True, on_click=submit_login)
 
-            donor = authenticate_user(username, password)
-            if donor:
-                st.session_state.user = {
-                    'donor_id': donor['donor_id'],
-                    'name': donor['name'],
-                    'username': donor['username'],
-                    'email': donor['email'],
-                    'phone': donor['phone']
-                }
-                st.success(f"Welcome back, {donor['name']}!")
-                st.session_state.show_login = False
-                st.rerun()
-            else:
-                st.error("Invalid username or password")
+        if 'login_message' in st.session_state:
+            level, message = st.session_state.pop('login_message')
+            getattr(st, level)(message)
 
 
 # Registration Page - ONLY FOR REGISTRATION
@@ -249,14 +318,15 @@ def show_register():
         col1, col2 = st.columns(2)
 
         with col1:
-            full_name = st.text_input("Full Name *", placeholder="Enter your full name")
-            nic = st.text_input("NIC Number *", placeholder="Enter your NIC number")
-            phone = st.text_input("Phone Number *", placeholder="07XXXXXXXX")
+            full_name = st.text_input("Full Name *", placeholder="Enter your full name", key="register_name")
+            nic = st.text_input("NIC Number *", placeholder="Enter your NIC number", key="register_nic")
+            phone = st.text_input("Phone Number *", placeholder="07XXXXXXXX", key="register_phone")
 
         with col2:
-            email = st.text_input("Email Address", placeholder="your.email@example.com")
-            username = st.text_input("Username *", placeholder="Choose a username")
-            password = st.text_input("Password *", type="password", placeholder="Create a strong password")
+            email = st.text_input("Email Address", placeholder="your.email@example.com", key="register_email")
+            username = st.text_input("Username *", placeholder="Choose a username", key="register_username")
+            password = st.text_input("Password *", type="password", placeholder="Create a strong password",
+                                     key="register_password")
 
         # Password strength indicator
         if password:
@@ -274,7 +344,7 @@ def show_register():
         - I consent to receive communication regarding my donations
         """)
 
-        agree_terms = st.checkbox("I agree to the terms and conditions *")
+        agree_terms = st.checkbox("I agree to the terms and conditions *", key="register_terms")
 
         submitted = st.form_submit_button("Create Account", type="primary", use_container_width=True)
 
@@ -318,6 +388,9 @@ def show_register():
                     donor_id, full_name, nic, phone, email,
                     username, hashed_password
                 ))
+                metrics.inc('husma_registrations_total')
+                forget_unknown_identifier(username)
+                forget_unknown_identifier(email)
 
                 # Send welcome email
                 if email:
@@ -350,6 +423,11 @@ def show_milk_catalog():
     **We require 1,500 tins every month** to meet the growing need.
     """)
 
+    try:
+        display_campaign_progress()
+    except Exception as e:
+        st.warning("Campaign progress temporarily unavailable")
+
     inventory = get_inventory()
 
     # Display products in a grid
@@ -386,31 +464,40 @@ def show_milk_catalog():
                         )
                     with col2:
                         if quantity > 0:
-                            if st.button("🛒 Add", key=f"add_{product['product_id']}"):
-                                # Add to cart
-                                cart_item = {
-                                    'product_id': product['product_id'],
-                                    'name': product['name'],
-                                    'price': product['price'],
-                                    'quantity': quantity,
-                                    'subtotal': product['price'] * quantity
-                                }
-
-                                # Check if item already in cart
-                                existing_index = next((i for i, item in enumerate(st.session_state.cart)
-                                                       if item['product_id'] == product['product_id']), None)
-
-                                if existing_index is not None:
-                                    st.session_state.cart[existing_index] = cart_item
-                                else:
-                                    st.session_state.cart.append(cart_item)
-
-                                st.success(f"Added {quantity} {product['name']} to cart!")
-                                st.rerun()
+                            st.button("🛒 Add", key=f"add_{product['product_id']}", on_click=add_to_cart,
+                                      args=(product, quantity))
                 else:
                     st.warning("Out of Stock")
 
 
+def add_to_cart(product, quantity):
+    """Button callback: runs before the rerun, so the cart below already includes the item"""
+    cart_item = {
+        'product_id': product['product_id'],
+        'name': product['name'],
+        'price': product['price'],
+        'quantity': quantity,
+        'subtotal': product['price'] * quantity
+    }
+
+    # Check if item already in cart
+    existing_index = next((i for i, item in enumerate(st.session_state.cart)
+                           if item['product_id'] == product['product_id']), None)
+
+    if existing_index is not None:
+        st.session_state.cart[existing_index] = cart_item
+    else:
+        st.session_state.cart.append(cart_item)
+
+    st.toast(f"Added {quantity} {product['name']} to cart!")
+
+
+def start_checkout():
+    st.session_state.checkout_active = True
+    # Identifies this cart's checkout, so a repeated Confirm records it only once
+    st.session_state.checkout_key = uuid.uuid4().hex
+
+
 # Shopping Cart Section
 def show_shopping_cart():
     if not st.session_state.cart:
@@ -450,9 +537,8 @@ def show_shopping_cart():
             st.write(f"**Total:** LKR {final_total:,.2f}")
 
         with col2:
-            if st.button("💳 Proceed to Checkout", type="primary", use_container_width=True):
-                st.session_state.checkout_active = True
-                st.rerun()
+            st.button("💳 Proceed to Checkout", type="primary", use_container_width=True, key="proceed_checkout",
+                      on_click=start_checkout)
 
 
 # Checkout Section
@@ -460,6 +546,7 @@ def show_checkout():
     st.markdown("## 💳 Checkout")
 
     st.info(f"Donor: **{st.session_state.user['name']}** (ID: {st.session_state.user['donor_id']})")
+    checkout_key = st.session_state.setdefault('checkout_key', uuid.uuid4().hex)
 
     # Display cart summary
     total_amount = sum(item['subtotal'] for item in st.session_state.cart)
@@ -491,7 +578,7 @@ def show_checkout():
     uploaded_file = st.file_uploader(
         "Upload your bank transfer confirmation slip",
         type=['png', 'jpg', 'jpeg', 'pdf'],
-        help="Supported formats: PNG, JPG, JPEG, PDF (Max 5MB)"
+        help=f"Supported formats: PNG, JPG, JPEG, PDF (Max {config.MAX_FILE_SIZE // (1024 * 1024)}MB)"
     )
 
     remarks = st.text_area("Remarks (Optional)", placeholder="Any additional comments about your donation...")
@@ -500,10 +587,11 @@ def show_checkout():
     with col1:
         if st.button("← Back to Cart", use_container_width=True):
             st.session_state.checkout_active = False
+            st.session_state.pop('checkout_key', None)
             st.rerun()
 
     with col2:
-        if st.button("✅ Confirm Donation", type="primary", use_container_width=True):
+        if st.button("✅ Confirm Donation", type="primary", use_container_width=True, key="confirm_donation"):
             if final_total == 0:
                 st.error("Please add items to your cart first")
                 return
@@ -512,48 +600,22 @@ def show_checkout():
                 # Process donation
                 payment_slip_path = None
                 if uploaded_file:
-                    # Save uploaded file
-                    upload_dir = "instance/uploads"
-                    os.makedirs(upload_dir, exist_ok=True)
-                    filename = f"payment_{st.session_state.user['donor_id']}_{datetime.now().timestamp()}.{uploaded_file.type.split('/')[-1]}"
-                    payment_slip_path = os.path.join(upload_dir, filename)
-
-                    with open(payment_slip_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-
-                # Record donation
-                create_donation(
-                    st.session_state.user['donor_id'],
+                    # Stream the slip into the content-addressed upload store
+                    try:
+                        payment_slip_path = store_upload(uploaded_file)['path']
+                    except UploadRejected as e:
+                        st.error(f"Payment slip not accepted: {e}")
+                        return
+
+                # Commit the donation; receipts and notifications follow from its event
+                donation_id, receipt_number, receipt_path = record_donation(
+                    st.session_state.user,
                     final_total,
-                    payment_slip_path
+                    st.session_state.cart,
+                    payment_slip_path,
+                    idempotency_key=checkout_key
                 )
-
-                # Update inventory
-                for item in st.session_state.cart:
-                    if item['quantity'] > 0:
-                        update_inventory_stock(item['product_id'], item['quantity'])
-
-                # Generate receipt
-                receipt_number = generate_receipt_number()
-
-                # Send notifications
-                if st.session_state.user.get('email'):
-                    send_donation_receipt_email(
-                        st.session_state.user['email'],
-                        st.session_state.user['name'],
-                        {
-                            'amount': final_total,
-                            'date': datetime.now().strftime('%Y-%m-%d'),
-                            'receipt_number': receipt_number
-                        }
-                    )
-
-                if st.session_state.user.get('phone'):
-                    send_donation_confirmation_sms(
-                        st.session_state.user['phone'],
-                        st.session_state.user['name'],
-                        final_total
-                    )
+                metrics.inc('husma_checkouts_total')
 
                 st.success(f"🎉 Thank you for your donation of LKR {final_total:,.2f}!")
                 st.info(f"**Receipt Number:** {receipt_number}")
@@ -561,22 +623,40 @@ def show_checkout():
                 # Clear cart
                 st.session_state.cart = []
                 st.session_state.checkout_active = False
+                st.session_state.pop('checkout_key', None)
 
-                # Show receipt
-                from utils.pdf_generator import generate_donation_receipt
-                generate_donation_receipt(
-                    {
-                        'amount': final_total,
-                        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'receipt_number': receipt_number
-                    },
-                    st.session_state.user
-                )
+                st.session_state.pending_receipt = {'path': receipt_path, 'receipt_number': receipt_number}
+                show_receipt_status()
 
+            except TimeoutError:
+                # The write may still commit; the same checkout key makes a retry safe
+                st.warning("Your donation is taking longer than usual to record. Please press Confirm again - "
+                           "it will not be recorded twice.")
             except Exception as e:
                 st.error(f"Donation failed: {str(e)}")
 
 
+def show_receipt_status():
+    """Offer the latest receipt for download once its PDF exists"""
+    receipt = st.session_state.get('pending_receipt')
+    if not receipt:
+        return
+
+    if is_receipt_ready(receipt['path']):
+        with open(receipt['path'], 'rb') as f:
+            st.download_button(
+                f"📄 Download Receipt {receipt['receipt_number']}",
+                data=f.read(),
+                file_name=f"receipt_{receipt['receipt_number']}.pdf",
+                mime="application/pdf",
+                key=f"receipt_{receipt['receipt_number']}"
+            )
+    else:
+        st.info(f"⏳ Your receipt {receipt['receipt_number']} is being prepared...")
+        if st.button("🔄 Check Receipt", key="check_receipt"):
+            st.rerun()
+
+
 # Donate Page - ONLY FOR DONATIONS
 def show_donate():
     show_header()
@@ -604,6 +684,8 @@ def show_donate():
     if st.session_state.get('checkout_active'):
         show_checkout()
     else:
+        show_receipt_status()
+
         # Show catalog and cart
         show_milk_catalog()
         st.markdown("---")
@@ -629,6 +711,19 @@ def admin_login():
                 st.error("Invalid admin credentials")
 
 
+def issue_milk(child):
+    """Button callback for a child's daily issue"""
+    try:
+        today = date.today().isoformat()
+        inventory = get_inventory()
+        product_id = next((p['product_id'] for p in inventory if p['name'] == child['milk_type']), None)
+        # Issue, last-issue date and stock change commit together
+        record_issue(child['id'], today, child['milk_type'], product_id)
+        st.toast(f"Milk issued to {child['name']} for today!")
+    except Exception as e:
+        st.error(f"Failed to issue milk: {str(e)}")
+
+
 # Children Management (Admin Only)
 def show_children_management():
     if not st.session_state.admin_logged_in:
@@ -665,13 +760,10 @@ def show_children_management():
                             if children:
                                 child_id = children[-1]['id']  # Get the latest child ID
                                 today = date.today().isoformat()
-                                create_issue(child_id, today, milk_type)
-                                update_child_last_issue(child_id, today)
                                 # Find the product ID for the milk type
                                 inventory = get_inventory()
                                 product_id = next((p['product_id'] for p in inventory if p['name'] == milk_type), None)
-                                if product_id:
-                                    update_inventory_stock(product_id, 1)
+                                record_issue(child_id, today, milk_type, product_id)
                                 st.success(f"Child {child_name} added and milk issued for today!")
                             else:
                                 st.success(f"Child {child_name} added successfully!")
@@ -705,21 +797,7 @@ def show_children_management():
 
                 with col2:
                     # Issue milk button
-                    if st.button("🥛 Issue Milk", key=f"issue_{child['id']}"):
-                        try:
-                            today = date.today().isoformat()
-                            create_issue(child['id'], today, child['milk_type'])
-                            update_child_last_issue(child['id'], today)
-                            # Update inventory
-                            inventory = get_inventory()
-                            product_id = next((p['product_id'] for p in inventory if p['name'] == child['milk_type']),
-                                              None)
-                            if product_id:
-                                update_inventory_stock(product_id, 1)
-                            st.success(f"Milk issued to {child['name']} for today!")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Failed to issue milk: {str(e)}")
+                    st.button("🥛 Issue Milk", key=f"issue_{child['id']}", on_click=issue_milk, args=(child,))
 
                 with col3:
                     # View history button
@@ -739,6 +817,8 @@ def show_children_management():
     else:
         st.info("No children registered yet")
 
+    show_issue_history()
+
 
 def show_inventory_management():
     st.markdown("### 📦 Inventory Management")
@@ -781,20 +861,25 @@ def show_inventory_management():
 
 
 def show_donation_management():
-    st.markdown("### 💰 All Donations")
+    display_verification_queue()
+    display_reconciliation_sets()
+
+    st.markdown("### 💰 Donations")
 
     try:
-        donations = get_all_donations()
+        start, end, weekday = date_range_filter("donations")
+        donations = get_donations_between(start, end, weekday)
 
         if donations:
             total = sum(d['amount'] for d in donations)
-            st.metric("Total Donations Received", f"LKR {total:,.2f}")
+            st.metric("Donations Received in Range", f"LKR {total:,.2f}", f"{len(donations)} donations",
+                      delta_color="off")
 
             for donation in donations:
                 with st.container():
                     col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
                     with col1:
-                        donor_name = donation.get('donor_name', 'Anonymous')
+                        donor_name = donation.get('donor_name') or 'Anonymous'
                         st.write(f"**{donor_name}** ({donation['donor_id']})")
                     with col2:
                         st.write(f"LKR {donation['amount']:,.2f}")
@@ -802,15 +887,47 @@ def show_donation_management():
                         st.write(f"{donation['timestamp'][:10]}")
                     with col4:
                         if donation.get('payment_slip'):
-                            st.write("📎 Slip")
+                            status = donation.get('verification_status', 'pending')
+                            icon = {'approved': "✅", 'rejected': "❌"}.get(status, "⏳")
+                            st.write(f"📎 Slip {icon}")
         else:
-            st.info("No donations recorded yet")
+            st.info("No donations recorded in this period")
 
     except Exception as e:
         st.error(f"Error loading donations: {str(e)}")
         st.info("This feature is being updated. Please check back later.")
 
 
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def date_range_filter(key):
+    """From/to dates (this month by default) and an optional weekday for the admin lists"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start = st.date_input("From", value=date.today().replace(day=1), key=f"{key}_from")
+    with col2:
+        end = st.date_input("To", value=date.today(), key=f"{key}_to")
+    with col3:
+        weekdays = {"Any day": None, **{name: number for number, name in enumerate(WEEKDAYS)}}
+        weekday = weekdays[st.selectbox("Weekday", list(weekdays), key=f"{key}_weekday")]
+    return start, end, weekday
+
+
+def show_issue_history():
+    st.markdown("### 🥛 Milk Issues")
+    start, end, weekday = date_range_filter("issues")
+    issues = get_issues_between(start, end, weekday)
+    st.metric("Tins Issued in Range", sum(issue['quantity'] or 1 for issue in issues))
+
+    by_weekday = get_issue_totals_by_weekday(start, end)
+    if by_weekday:
+        st.bar_chart({'weekday': [WEEKDAYS[row['weekday']][:3] for row in by_weekday],
+                      'tins': [row['quantity'] for row in by_weekday]}, x='weekday', y='tins')
+    for issue in issues:
+        st.write(f"- {issue['date']}: **{issue['child_name'] or issue['child_id']}** — {issue['milk_type']}")
+
+
 # Admin Dashboard
 def show_admin_dashboard():
     if not st.session_state.admin_logged_in:
@@ -820,7 +937,8 @@ def show_admin_dashboard():
     st.markdown("## 🔧 Admin Dashboard")
 
     # Admin tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📦 Inventory", "👶 Children", "💰 Donations", "📊 Analytics"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📦 Inventory", "👶 Children", "💰 Donations", "🎯 Campaigns",
+                                                  "📊 Analytics", "🩺 Diagnostics"])
 
     with tab1:
         show_inventory_management()
@@ -832,11 +950,18 @@ def show_admin_dashboard():
         show_donation_management()
 
     with tab4:
+        display_campaign_admin()
+
+    with tab5:
         try:
             display_analytics_dashboard()
+            display_cohort_analytics()
         except Exception as e:
             st.error(f"Error loading analytics: {e}")
 
+    with tab6:
+        display_diagnostics_panel()
+
 
 # Dashboard Page
 def show_dashboard():
@@ -854,27 +979,30 @@ def show_dashboard():
     except Exception as e:
         st.warning("Analytics temporarily unavailable")
 
-    # Recent Donations
+    # Standing among donors
+    try:
+        ranking = get_ranking()
+        rank, donors = ranking.rank(st.session_state.user['donor_id'])
+        if rank:
+            st.info(f"🏅 You are donor #{rank:,} of {donors:,} — ahead of "
+                    f"{ranking.percentile(st.session_state.user['donor_id']):.0f}% of our supporters")
+    except Exception as e:
+        st.warning("Donor ranking temporarily unavailable")
+
+    # Lifetime Summary
     st.markdown("---")
+    st.markdown("### 💝 Your Giving")
+    try:
+        display_donor_summary(st.session_state.user['donor_id'])
+    except Exception as e:
+        st.warning("Unable to load your donation summary")
+
+    # Recent Donations
     st.markdown("### 📋 Your Donation History")
 
     if st.session_state.user:
         try:
-            donations = get_donations_by_donor(st.session_state.user['donor_id'])
-            if donations:
-                for donation in donations:
-                    with st.container():
-                        col1, col2, col3 = st.columns([2, 1, 1])
-                        with col1:
-                            st.write(f"**Date:** {donation['timestamp'][:10]}")
-                        with col2:
-                            st.write(f"**Amount:** LKR {donation['amount']:,.2f}")
-                        with col3:
-                            if donation['payment_slip']:
-                                st.write("📎 Slip Attached")
-                st.markdown(f"**Total Donated:** LKR {sum(d['amount'] for d in donations):,.2f}")
-            else:
-                st.info("No donations yet. Make your first donation today!")
+            display_donation_history(st.session_state.user['donor_id'])
         except Exception as e:
             st.warning("Unable to load donation history")
 
@@ -967,27 +1095,40 @@ def show_sidebar():
                 st.session_state.cart = []
                 st.session_state.admin_logged_in = False
                 st.session_state.checkout_active = False
+                st.session_state.pop('checkout_key', None)
                 st.session_state.show_login = False
                 st.rerun()
 
 
-# Main application router
-def main():
+def route_page():
     show_sidebar()
 
     # Page routing
-    if st.session_state.current_page == "Home":
-        show_home()
-    elif st.session_state.current_page == "Register":
-        show_register()
-    elif st.session_state.current_page == "Donate":
-        show_donate()
-    elif st.session_state.current_page == "Dashboard":
-        show_dashboard()
-    elif st.session_state.current_page == "Contact":
-        show_contact()
-    elif st.session_state.current_page == "Admin":
-        show_admin_dashboard()
+    page = st.session_state.current_page
+    with instrumentation.section(f"page:{page}"), metrics.timer('husma_rerun_seconds', page=page):
+        if page == "Home":
+            show_home()
+        elif page == "Register":
+            show_register()
+        elif page == "Donate":
+            show_donate()
+        elif page == "Dashboard":
+            show_dashboard()
+        elif page == "Contact":
+            show_contact()
+        elif page == "Admin":
+            show_admin_dashboard()
+
+
+# Main application router
+def main():
+    with instrumentation.section("rerun"):
+        if st.session_state.pop('profile_next_rerun', False):
+            with instrumentation.profiled() as top_functions:
+                st.session_state.last_profile = top_functions
+                route_page()
+        else:
+            route_page()
 
 
 if __name__ == "__main__":
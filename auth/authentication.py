@@ -1,33 +1,74 @@
-import hashlib
-import secrets
-from database.operations import get_donor_by_username, get_donor_by_email
+from config import config
+from database.changes import subscribe
+from database.operations import get_donor_by_login, update_donor_password
+from auth import hashing
+from utils import metrics
+from utils.rate_limit import TokenBucketLimiter, ExpiringSet
+
+
+class LoginThrottled(Exception):
+    """Raised when too many login attempts were made for an identifier or address"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts. Try again in {int(retry_after) + 1} seconds.")
+        self.retry_after = retry_after
+
+
+_identifier_limiter = TokenBucketLimiter(config.LOGIN_IDENTIFIER_RATE, config.LOGIN_IDENTIFIER_BURST)
+_ip_limiter = TokenBucketLimiter(config.LOGIN_IP_RATE, config.LOGIN_IP_BURST)
+_unknown_identifiers = ExpiringSet(config.LOGIN_UNKNOWN_TTL)
+# Donors registered through another worker process
+subscribe('donors', _unknown_identifiers.clear)
 
 
 def hash_password(password):
-    """Hash password using SHA-256 (simplified for compatibility)"""
-    salt = secrets.token_hex(16)
-    return f"{salt}${hashlib.sha256((salt + password).encode()).hexdigest()}"
+    """Hash password with the configured KDF on the hashing pool"""
+    return hashing.hash_password_async(password).result(timeout=config.HASH_TIMEOUT)
 
 
 def check_password(hashed_password, user_password):
-    """Check password against hash"""
-    try:
-        salt, stored_hash = hashed_password.split('$')
-        computed_hash = hashlib.sha256((salt + user_password).encode()).hexdigest()
-        return computed_hash == stored_hash
-    except Exception:
-        return False
+    """Check password against hash (constant-time, on the hashing pool)"""
+    return hashing.verify_password_async(hashed_password, user_password).result(timeout=config.HASH_TIMEOUT)
+
 
+def _rehash_in_background(donor_id, password):
+    """Upgrade a legacy or outdated hash after a successful login"""
+    future = hashing.hash_password_async(password)
+    future.add_done_callback(
+        lambda f: f.exception() is None and update_donor_password(donor_id, f.result())
+    )
 
-def authenticate_user(username, password):
+
+def forget_unknown_identifier(identifier):
+    """Drop an identifier from the negative cache (e.g. after registration)"""
+    if identifier:
+        _unknown_identifiers.discard(identifier)
+
+
+def authenticate_user(username, password, client_ip=None):
     """Authenticate user with username/email and password"""
-    # Try username first
-    donor = get_donor_by_username(username)
+    # Throttled attempts never reach SQLite or the hasher
+    if client_ip and not _ip_limiter.allow(client_ip):
+        raise LoginThrottled(_ip_limiter.retry_after(client_ip))
+    if not _identifier_limiter.allow(username):
+        raise LoginThrottled(_identifier_limiter.retry_after(username))
+
+    known_unknown = username in _unknown_identifiers
+    metrics.record_cache('login_unknown_identifier', known_unknown)
+    if known_unknown:
+        return None
+
+    donor = get_donor_by_login(username)
     if not donor:
-        # Try email
-        donor = get_donor_by_email(username)
+        _unknown_identifiers.add(username)
+        return None
 
-    if donor and check_password(donor['password'], password):
+    if check_password(donor['password'], password):
+        if hashing.needs_rehash(donor['password']):
+            try:
+                _rehash_in_background(donor['donor_id'], password)
+            except hashing.HasherBusy:
+                pass  # Retried at the next login
         return donor
     return None
 
@@ -0,0 +1,143 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def make_hash(password, scheme=None):
+    """Hash a password with the configured scheme (blocking)"""
+    scheme = scheme or config.PASSWORD_HASH_SCHEME
+    salt = secrets.token_bytes(16)
+    if scheme == SCRYPT:
+        n, r, p = config.SCRYPT_N, config.SCRYPT_R, config.SCRYPT_P
+        return f"{SCRYPT}${n}${r}${p}${salt.hex()}${_scrypt(password, salt, n, r, p).hex()}"
+    if scheme == PBKDF2:
+        iterations = config.PBKDF2_ITERATIONS
+        return f"{PBKDF2}${iterations}${salt.hex()}${_pbkdf2(password, salt, iterations).hex()}"
+    raise ValueError(f"Unknown password hash scheme: {scheme}")
+
+
+def verify_hash(hashed_password, password):
+    """Check a password against any supported hash format (blocking)"""
+    try:
+        parts = hashed_password.split('$')
+        if parts[0] == SCRYPT and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            computed = _scrypt(password, bytes.fromhex(parts[4]), n, r, p).hex()
+            return hmac.compare_digest(computed, parts[5])
+        if parts[0] == PBKDF2 and len(parts) == 4:
+            computed = _pbkdf2(password, bytes.fromhex(parts[2]), int(parts[1])).hex()
+            return hmac.compare_digest(computed, parts[3])
+        if len(parts) == 2:
+            # Legacy single-round salted SHA-256
+            salt, stored_hash = parts
+            computed = hashlib.sha256((salt + password).encode()).hexdigest()
+            return hmac.compare_digest(computed, stored_hash)
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return False
+
+
+def needs_rehash(hashed_password):
+    """True if the hash is legacy or uses different parameters than the current config"""
+    parts = (hashed_password or '').split('$')
+    scheme = config.PASSWORD_HASH_SCHEME
+    if scheme == SCRYPT:
+        return parts[:4] != [SCRYPT, str(config.SCRYPT_N), str(config.SCRYPT_R), str(config.SCRYPT_P)]
+    if scheme == PBKDF2:
+        return parts[:2] != [PBKDF2, str(config.PBKDF2_ITERATIONS)]
+    return False
+
+
+class HashingPool:
+    """Bounded worker pool that hashes and verifies passwords off the script thread"""
+
+    def __init__(self, workers, queue_limit):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="husma-hasher")
+        self.slots = threading.BoundedSemaphore(queue_limit)
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(config.HASH_WORKERS, config.HASH_QUEUE_LIMIT)
+    return _pool
+
+
+def hash_password_async(password):
+    """Submit a password hash; returns a future"""
+    return get_pool().submit(make_hash, password)
+
+
+def verify_password_async(hashed_password, password):
+    """Submit a password verification; returns a future"""
+    return get_pool().submit(verify_hash, hashed_password, password)
+
+
+def calibrate(target_ms=250, scheme=SCRYPT, password="calibration-password"):
+    """Pick the largest cost parameter whose hash time stays within target_ms on this host"""
+    salt = secrets.token_bytes(16)
+
+    def measure(func, *args):
+        best = None
+        for _ in range(3):
+            started = time.perf_counter()
+            func(password, salt, *args)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    if scheme == SCRYPT:
+        r, p = config.SCRYPT_R, config.SCRYPT_P
+        n, elapsed = 2 ** 12, measure(_scrypt, 2 ** 12, r, p)
+        while True:
+            candidate = measure(_scrypt, n * 2, r, p)
+            if candidate > target_ms:
+                break
+            n, elapsed = n * 2, candidate
+        return {'scheme': SCRYPT, 'SCRYPT_N': n, 'SCRYPT_R': r, 'SCRYPT_P': p, 'elapsed_ms': round(elapsed, 1)}
+
+    if scheme == PBKDF2:
+        probe = 100000
+        per_iteration = measure(_pbkdf2, probe) / probe
+        iterations = max(100000, int(target_ms / per_iteration) // 1000 * 1000)
+        return {'scheme': PBKDF2, 'PBKDF2_ITERATIONS': iterations,
+                'elapsed_ms': round(measure(_pbkdf2, iterations), 1)}
+
+    raise ValueError(f"Unknown password hash scheme: {scheme}")
@@ -1,33 +1,32 @@
 import re
 
+# Compiled once; the bulk importer calls these directly on normalised values
+NIC_PATTERN = re.compile(r'\d{9}[VX]|\d{12}')  # old format (9 digits + V/X) or new format (12 digits)
+PHONE_PATTERN = re.compile(r'\d{10}')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def normalize_nic(nic):
+    return nic.strip().upper()
 
-def validate_nic(nic):
-    """Validate NIC format for Sri Lanka"""
-    nic = nic.strip().upper()
 
-    if len(nic) == 10:  # Old format
-        if not nic[:-1].isdigit():
-            return False
-        if nic[-1] not in ['V', 'X']:
-            return False
-        return True
-    elif len(nic) == 12:  # New format
-        return nic.isdigit()
+def normalize_phone(phone):
+    return phone.strip().replace(' ', '').replace('-', '')
 
-    return False
+
+def validate_nic(nic):
+    """Validate NIC format for Sri Lanka"""
+    return NIC_PATTERN.fullmatch(normalize_nic(nic)) is not None
 
 
 def validate_phone(phone):
     """Validate Sri Lankan phone number"""
-    phone = phone.strip()
-    phone = phone.replace(' ', '').replace('-', '')
-    return len(phone) == 10 and phone.isdigit()
+    return PHONE_PATTERN.fullmatch(normalize_phone(phone)) is not None
 
 
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 
 def validate_password(password):
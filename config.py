@@ -3,20 +3,91 @@ import os
 
 class Config:
     # Database
-    DATABASE_URL = "husma_foundation.db"
+    DATABASE_URL = os.environ.get("DATABASE_URL", "husma_foundation.db").replace("sqlite:///", "")
 
     # Security
     SECRET_KEY = "husma-foundation-secret-key-2024"
     PASSWORD_RESET_TIMEOUT = 3600
 
+    # Password hashing (tune with: python manage.py calibrate-hasher)
+    PASSWORD_HASH_SCHEME = os.environ.get("PASSWORD_HASH_SCHEME", "scrypt")
+    SCRYPT_N = int(os.environ.get("SCRYPT_N", str(2 ** 14)))
+    SCRYPT_R = int(os.environ.get("SCRYPT_R", "8"))
+    SCRYPT_P = int(os.environ.get("SCRYPT_P", "1"))
+    PBKDF2_ITERATIONS = int(os.environ.get("PBKDF2_ITERATIONS", "600000"))
+    HASH_WORKERS = int(os.environ.get("HASH_WORKERS", "4"))
+    HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", "64"))
+    HASH_TIMEOUT = 10
+
+    # Login throttling (token buckets: burst attempts, refilled per second)
+    LOGIN_IDENTIFIER_BURST = int(os.environ.get("LOGIN_IDENTIFIER_BURST", "5"))
+    LOGIN_IDENTIFIER_RATE = 1 / 60
+    LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", "30"))
+    LOGIN_IP_RATE = 0.5
+    LOGIN_UNKNOWN_TTL = 300
+
     # App Settings
     UPLOAD_FOLDER = "instance/uploads"
     RECEIPT_FOLDER = "temp/receipts"
+    RECEIPT_WORKERS = int(os.environ.get("RECEIPT_WORKERS", "2"))
     MAX_FILE_SIZE = 5 * 1024 * 1024
+    THUMBNAIL_WORKERS = 4
+    THUMBNAIL_CACHE_SIZE = 512
 
     # Inventory
     LOW_STOCK_THRESHOLD = 20
     CRITICAL_STOCK_THRESHOLD = 10
+    MONTHLY_TIN_TARGET = 1500
+
+    # Email delivery (outbox worker runs only when SMTP_SERVER is set)
+    SMTP_SERVER = os.environ.get("SMTP_SERVER", "")
+    SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+    SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "")
+    SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+    SMTP_USE_TLS = os.environ.get("SMTP_USE_TLS", "true").lower() == "true"
+    EMAIL_SENDER = os.environ.get("EMAIL_SENDER", "husmafoundation@gmail.com")
+    EMAIL_BATCH_SIZE = 50
+    EMAIL_POLL_INTERVAL = 2.0
+    EMAIL_MAX_ATTEMPTS = 6
+    EMAIL_BACKOFF_BASE = 30
+    EMAIL_BACKOFF_MAX = 3600
+
+    # SMS delivery ("log" writes to the application log, "http" posts to SMS_API_URL)
+    SMS_TRANSPORT = os.environ.get("SMS_TRANSPORT", "log")
+    SMS_API_URL = os.environ.get("SMS_API_URL", "")
+    SMS_API_KEY = os.environ.get("SMS_API_KEY", "")
+    SMS_SENDER_ID = os.environ.get("SMS_SENDER_ID", "HUSMA")
+    SMS_RATE_PER_SECOND = float(os.environ.get("SMS_RATE_PER_SECOND", "10"))
+    SMS_BULK_SIZE = 50
+    SMS_DEDUPE_WINDOW = 600
+    SMS_BATCH_SIZE = 200
+    SMS_POLL_INTERVAL = 2.0
+    SMS_MAX_ATTEMPTS = 6
+    SMS_BACKOFF_BASE = 30
+    SMS_BACKOFF_MAX = 3600
+
+    # Shared database (several worker processes; see manage.py serve)
+    DB_BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "5"))
+    DB_WRITE_RETRIES = 5
+    DB_RETRY_BACKOFF = 0.05
+    CHANGE_POLL_INTERVAL = float(os.environ.get("CHANGE_POLL_INTERVAL", "0.5"))
+
+    # Writer thread: session writes queued within the window commit as one transaction
+    WRITER_GROUP_WINDOW = float(os.environ.get("WRITER_GROUP_WINDOW", "0.002"))
+    WRITER_MAX_BATCH = 64
+    WRITER_TIMEOUT = float(os.environ.get("WRITER_TIMEOUT", "30"))
+
+    # Checkout idempotency keys are kept this long (purge with manage.py purge-idempotency-keys)
+    IDEMPOTENCY_KEY_TTL = 24 * 3600
+
+    # Post-checkout event consumers
+    EVENT_BATCH_SIZE = 20
+    EVENT_POLL_INTERVAL = 0.5
+
+    # Metrics
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
 
 
 config = Config()
\ No newline at end of file
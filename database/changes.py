@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+from config import config
+
+# Topics with a row in change_versions. Appends need no notice: caches read rows
+# past their high-water mark anyway. These cover what a high-water mark misses.
+#   donors:       new donors and login changes (login's negative cache); inserts bump it by hand
+#   donations:    donations deleted or their donor, amount or date rewritten
+#   donor_totals: donor_totals rebuilt from the donations table
+#   uploads:      stored uploads deleted by garbage collection
+CHANGE_TOPICS = ('donors', 'donations', 'donor_totals', 'uploads')
+
+_subscribers = {}
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def bump_change(cursor, topic):
+    """Announce a change to other processes; commits with the caller's transaction"""
+    cursor.execute("UPDATE change_versions SET version = version + 1 WHERE topic = ?", (topic,))
+
+
+def subscribe(topic, callback):
+    """Call callback() whenever any process commits a change to topic"""
+    callbacks = _subscribers.setdefault(topic, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+class ChangeFeed:
+    """
+    Polls change_versions for commits made by any connection in any process.
+
+    Each poll first reads PRAGMA data_version, which only changes when another
+    connection has committed, so an idle database costs one pragma per interval.
+    The first poll records the current versions without notifying anyone.
+    """
+
+    def __init__(self, database, poll_interval):
+        self.database = database
+        self.poll_interval = poll_interval
+        self.conn = sqlite3.connect(database, timeout=config.DB_BUSY_TIMEOUT, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.versions = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def poll(self):
+        """Notify subscribers of topics changed since the last poll; returns those topics"""
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self.data_version:
+                return []
+            self.data_version = data_version
+            versions = dict(self.conn.execute("SELECT topic, version FROM change_versions"))
+            changed = [] if self.versions is None else \
+                [topic for topic, version in versions.items() if self.versions.get(topic) != version]
+            self.versions = versions
+
+        for topic in changed:
+            for callback in _subscribers.get(topic, ()):
+                try:
+                    callback()
+                except Exception:
+                    pass  # One failing cache must not keep the others stale
+        return changed
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except sqlite3.Error:
+                pass
+            self.stop_event.wait(self.poll_interval)
+
+    def start(self):
+        self.poll()
+        self.thread = threading.Thread(target=self.run_forever, name="husma-change-feed", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+        self.conn.close()
+
+
+def start_change_feed():
+    """Poll the configured database for changes, once per process (restarted if DATABASE_URL changes)"""
+    global _feed
+    with _feed_lock:
+        if _feed is None or _feed.database != config.DATABASE_URL:
+            if _feed is not None:
+                _feed.stop()
+            _feed = ChangeFeed(config.DATABASE_URL, config.CHANGE_POLL_INTERVAL).start()
+        return _feed
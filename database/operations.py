@@ -1,20 +1,40 @@
+import json
 import sqlite3
 import os
-from datetime import datetime, timedelta
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from config import config
+from database.changes import CHANGE_TOPICS, bump_change
+from database.writer import write, statement, begin_immediate
+from utils import instrumentation, metrics
 
 
 def get_connection():
     """Create database connection"""
-    conn = sqlite3.connect(config.DATABASE_URL, check_same_thread=False)
+    conn = sqlite3.connect(config.DATABASE_URL, timeout=config.DB_BUSY_TIMEOUT, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def add_column_if_missing(cursor, table, column, definition):
+    """Add a column to an existing table (SQLite has no ADD COLUMN IF NOT EXISTS)"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# Databases this process has already backfilled, and already initialized through ensure_database
+_backfilled = set()
+_initialized = set()
+
+
 def init_database():
     """Initialize database tables"""
     conn = get_connection()
     cursor = conn.cursor()
+    # Readers never block the writer, so several worker processes can share the file
+    cursor.execute("PRAGMA journal_mode = WAL")
 
     # Create tables
     cursor.execute('''
@@ -222,6 +242,340 @@ def init_database():
                        )
                    ''')
 
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS email_outbox
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       idempotency_key TEXT NOT NULL UNIQUE,
+                       recipient TEXT NOT NULL,
+                       subject TEXT NOT NULL,
+                       body TEXT NOT NULL,
+                       html_body TEXT,
+                       status TEXT NOT NULL DEFAULT 'pending',
+                       attempts INTEGER NOT NULL DEFAULT 0,
+                       next_attempt_at REAL NOT NULL,
+                       claim_token TEXT,
+                       claimed_at REAL,
+                       last_error TEXT,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       sent_at TIMESTAMP
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS sms_outbox
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       idempotency_key TEXT NOT NULL UNIQUE,
+                       recipient TEXT NOT NULL,
+                       body TEXT NOT NULL,
+                       status TEXT NOT NULL DEFAULT 'pending',
+                       attempts INTEGER NOT NULL DEFAULT 0,
+                       next_attempt_at REAL NOT NULL,
+                       claim_token TEXT,
+                       claimed_at REAL,
+                       last_error TEXT,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       sent_at TIMESTAMP
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS events
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       event_type TEXT NOT NULL,
+                       payload TEXT NOT NULL,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+    # One row per checkout attempt; a replayed key returns the stored response instead of writing again
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS idempotency_keys
+                   (
+                       idempotency_key TEXT PRIMARY KEY,
+                       donor_id TEXT NOT NULL,
+                       amount REAL NOT NULL,
+                       response TEXT NOT NULL,
+                       expires_at INTEGER NOT NULL
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS event_deliveries
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       idempotency_key TEXT NOT NULL UNIQUE,
+                       event_id INTEGER NOT NULL,
+                       consumer TEXT NOT NULL,
+                       status TEXT NOT NULL DEFAULT 'pending',
+                       attempts INTEGER NOT NULL DEFAULT 0,
+                       next_attempt_at REAL NOT NULL,
+                       claim_token TEXT,
+                       claimed_at REAL,
+                       last_error TEXT,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       sent_at TIMESTAMP,
+                       FOREIGN KEY
+                   (
+                       event_id
+                   ) REFERENCES events
+                   (
+                       id
+                   )
+                       )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS uploads
+                   (
+                       sha256 TEXT PRIMARY KEY,
+                       path TEXT NOT NULL UNIQUE,
+                       size INTEGER NOT NULL,
+                       mime_type TEXT NOT NULL,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS bank_statement_lines
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       line_hash TEXT NOT NULL UNIQUE,
+                       source TEXT,
+                       posted_date TEXT NOT NULL,
+                       amount_cents INTEGER NOT NULL,
+                       reference TEXT,
+                       description TEXT,
+                       status TEXT NOT NULL DEFAULT 'unmatched',
+                       imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS reconciliation_links
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       statement_line_id INTEGER NOT NULL,
+                       donation_id INTEGER NOT NULL,
+                       status TEXT NOT NULL,
+                       method TEXT NOT NULL,
+                       score REAL,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       UNIQUE (statement_line_id, donation_id)
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS sequences
+                   (
+                       name TEXT PRIMARY KEY,
+                       value INTEGER NOT NULL
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS import_jobs
+                   (
+                       job_id TEXT PRIMARY KEY,
+                       kind TEXT NOT NULL,
+                       source TEXT NOT NULL,
+                       last_line INTEGER NOT NULL DEFAULT 0,
+                       imported INTEGER NOT NULL DEFAULT 0,
+                       rejected INTEGER NOT NULL DEFAULT 0,
+                       finished_at TIMESTAMP,
+                       updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS import_errors
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       job_id TEXT NOT NULL,
+                       line INTEGER NOT NULL,
+                       field TEXT,
+                       message TEXT NOT NULL,
+                       record TEXT
+                   )
+                   ''')
+
+    # Cross-process cache invalidation: triggers bump a topic's version (see database/changes.py)
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS change_versions
+                   (
+                       topic TEXT PRIMARY KEY,
+                       version INTEGER NOT NULL DEFAULT 0
+                   )
+                   ''')
+    cursor.executemany("INSERT OR IGNORE INTO change_versions (topic) VALUES (?)",
+                       [(topic,) for topic in CHANGE_TOPICS])
+    for trigger, event, topic in (
+            ('trg_changes_donors_update', "UPDATE OF username, email ON donors", 'donors'),
+            ('trg_changes_donations_update', "UPDATE OF donor_id, amount, timestamp ON donations", 'donations'),
+            ('trg_changes_donations_delete', "DELETE ON donations", 'donations'),
+            ('trg_changes_uploads_delete', "DELETE ON uploads", 'uploads')):
+        cursor.execute(f'''
+                       CREATE TRIGGER IF NOT EXISTS {trigger}
+                           AFTER {event}
+                       BEGIN
+                           UPDATE change_versions SET version = version + 1 WHERE topic = '{topic}';
+                       END
+                       ''')
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'donor_yearly_totals'")
+    summaries_exist = cursor.fetchone() is not None
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS donor_totals
+                   (
+                       donor_id TEXT PRIMARY KEY,
+                       total_donated REAL NOT NULL DEFAULT 0,
+                       donation_count INTEGER NOT NULL DEFAULT 0,
+                       first_donation TEXT,
+                       last_donation TEXT
+                   )
+                   ''')
+    add_column_if_missing(cursor, "donor_totals", "first_donation", "TEXT")
+    add_column_if_missing(cursor, "donor_totals", "last_donation", "TEXT")
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS donor_yearly_totals
+                   (
+                       donor_id TEXT NOT NULL,
+                       year INTEGER NOT NULL,
+                       total_donated REAL NOT NULL DEFAULT 0,
+                       donation_count INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (donor_id, year)
+                   )
+                   ''')
+
+    # Every write path (checkout, imports, seeding) keeps the per-donor summaries current.
+    # Databases from before the yearly totals have older trigger bodies to replace.
+    if not summaries_exist:
+        cursor.execute("DROP TRIGGER IF EXISTS trg_donor_totals_insert")
+        cursor.execute("DROP TRIGGER IF EXISTS trg_donor_totals_delete")
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS trg_donor_totals_insert
+                       AFTER INSERT ON donations
+                       WHEN NEW.donor_id IS NOT NULL AND NEW.donor_id != 'anonymous'
+                   BEGIN
+                       INSERT INTO donor_totals (donor_id, total_donated, donation_count, first_donation, last_donation)
+                       VALUES (NEW.donor_id, NEW.amount, 1, NEW.timestamp, NEW.timestamp)
+                       ON CONFLICT (donor_id) DO UPDATE SET
+                           total_donated = total_donated + excluded.total_donated,
+                           donation_count = donation_count + 1,
+                           first_donation = MIN(COALESCE(first_donation, excluded.first_donation), excluded.first_donation),
+                           last_donation = MAX(COALESCE(last_donation, excluded.last_donation), excluded.last_donation);
+                       INSERT INTO donor_yearly_totals (donor_id, year, total_donated, donation_count)
+                       VALUES (NEW.donor_id, CAST(SUBSTR(NEW.timestamp, 1, 4) AS INTEGER), NEW.amount, 1)
+                       ON CONFLICT (donor_id, year) DO UPDATE SET
+                           total_donated = total_donated + excluded.total_donated,
+                           donation_count = donation_count + 1;
+                   END
+                   ''')
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS trg_donor_totals_delete
+                       AFTER DELETE ON donations
+                       WHEN OLD.donor_id IS NOT NULL AND OLD.donor_id != 'anonymous'
+                   BEGIN
+                       UPDATE donor_totals
+                       SET total_donated = total_donated - OLD.amount,
+                           donation_count = donation_count - 1,
+                           first_donation = (SELECT MIN(timestamp) FROM donations WHERE donor_id = OLD.donor_id),
+                           last_donation = (SELECT MAX(timestamp) FROM donations WHERE donor_id = OLD.donor_id)
+                       WHERE donor_id = OLD.donor_id;
+                       UPDATE donor_yearly_totals
+                       SET total_donated = total_donated - OLD.amount, donation_count = donation_count - 1
+                       WHERE donor_id = OLD.donor_id AND year = CAST(SUBSTR(OLD.timestamp, 1, 4) AS INTEGER);
+                   END
+                   ''')
+    if not summaries_exist:
+        rebuild_donor_totals(cursor)
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS campaigns
+                   (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       name TEXT NOT NULL,
+                       target_type TEXT NOT NULL,
+                       target REAL NOT NULL,
+                       product_id INTEGER,
+                       recurrence TEXT NOT NULL DEFAULT 'none',
+                       starts_on TEXT NOT NULL,
+                       ends_on TEXT,
+                       active BOOLEAN NOT NULL DEFAULT TRUE,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       FOREIGN KEY (product_id) REFERENCES inventory (product_id)
+                   )
+                   ''')
+
+    # One counter row per campaign and period ('YYYY-MM' for monthly campaigns, '' otherwise)
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS campaign_progress
+                   (
+                       campaign_id INTEGER NOT NULL,
+                       period TEXT NOT NULL,
+                       tins INTEGER NOT NULL DEFAULT 0,
+                       amount REAL NOT NULL DEFAULT 0,
+                       donations INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (campaign_id, period),
+                       FOREIGN KEY (campaign_id) REFERENCES campaigns (id)
+                   )
+                   ''')
+
+    # Columns added after the first release
+    add_column_if_missing(cursor, "donations", "receipt_number", "TEXT")
+    add_column_if_missing(cursor, "donations", "receipt_path", "TEXT")
+    add_column_if_missing(cursor, "donations", "verification_status", "TEXT NOT NULL DEFAULT 'pending'")
+    add_column_if_missing(cursor, "donations", "verified_at", "TIMESTAMP")
+    add_column_if_missing(cursor, "donations", "epoch_second", "INTEGER")
+    add_column_if_missing(cursor, "donations", "epoch_day", "INTEGER")
+    add_column_if_missing(cursor, "issues", "epoch_day", "INTEGER")
+
+    # Writers set the epoch columns themselves; these only fill in rows inserted without them
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS trg_donations_epoch
+                       AFTER INSERT ON donations
+                       WHEN NEW.epoch_day IS NULL
+                   BEGIN
+                       UPDATE donations
+                       SET epoch_second = CAST(strftime('%s', NEW.timestamp) AS INTEGER),
+                           epoch_day = CAST(strftime('%s', NEW.timestamp) AS INTEGER) / 86400
+                       WHERE id = NEW.id;
+                   END
+                   ''')
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS trg_issues_epoch
+                       AFTER INSERT ON issues
+                       WHEN NEW.epoch_day IS NULL
+                   BEGIN
+                       UPDATE issues SET epoch_day = CAST(strftime('%s', NEW.date) AS INTEGER) / 86400
+                       WHERE id = NEW.id;
+                   END
+                   ''')
+
+    # Indexes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donors_email ON donors (email)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sms_outbox_due ON sms_outbox (status, next_attempt_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donations_donor_timestamp ON donations (donor_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donations_payment_slip ON donations (payment_slip)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donations_verification ON donations (verification_status, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_import_errors_job ON import_errors (job_id, line)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reconciliation_donation ON reconciliation_links (donation_id, status)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_event_deliveries_due ON event_deliveries (consumer, status, next_attempt_at)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donor_totals_total ON donor_totals (total_donated)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_donations_epoch_day ON donations (epoch_day, epoch_second)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_issues_epoch_day ON issues (epoch_day)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expiry ON idempotency_keys (expires_at)")
+
+    # Seed the donor id sequence once; afterwards allocate_donor_ids keeps it ahead of every stored id
+    cursor.execute("SELECT 1 FROM sequences WHERE name = 'donor_id'")
+    if cursor.fetchone() is None:
+        sync_donor_sequence(cursor)
+
     # Initialize inventory if empty
     cursor.execute("SELECT COUNT(*) FROM inventory")
     if cursor.fetchone()[0] == 0:
@@ -235,14 +589,43 @@ def init_database():
         ]
         cursor.executemany("INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", products)
 
+    # The catalog's standing monthly need
+    cursor.execute("SELECT COUNT(*) FROM campaigns")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(
+            """INSERT INTO campaigns (name, target_type, target, recurrence, starts_on)
+               VALUES ('Monthly supplement need', 'tins', ?, 'monthly', ?)""",
+            (config.MONTHLY_TIN_TARGET, date.today().replace(day=1).isoformat())
+        )
+
     conn.commit()
     conn.close()
 
+    # Streamlit calls init_database on every rerun; the backfill only has work after an upgrade
+    if config.DATABASE_URL not in _backfilled:
+        backfill_epoch_columns()
+        _backfilled.add(config.DATABASE_URL)
+
+
+def ensure_database():
+    """init_database once per process and database, for callers that run on every Streamlit rerun
+
+    Workers started by ``manage.py serve`` skip it altogether: the launcher migrates
+    before starting them and names the database in HUSMA_MIGRATED.
+    """
+    database = config.DATABASE_URL
+    if database in _initialized:
+        return
+    if os.environ.get("HUSMA_MIGRATED") != database:
+        init_database()
+    _initialized.add(database)
+
 
 def execute_query(query, params=(), fetch=False, fetchall=False):
     """Execute database queries safely"""
     conn = get_connection()
     cursor = conn.cursor()
+    started = time.perf_counter()
     try:
         cursor.execute(query, params)
         if fetchall:
@@ -251,36 +634,157 @@ def execute_query(query, params=(), fetch=False, fetchall=False):
             row = cursor.fetchone()
             result = dict(row) if row else None
         else:
-            result = None
+            result = cursor.rowcount
         conn.commit()
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
+        elapsed = time.perf_counter() - started
+        instrumentation.record_query(elapsed)
+        metrics.observe('husma_query_seconds', elapsed, operation=metrics.query_operation(query))
     return result
 
 
-# Donor Operations
-def get_next_donor_id():
+@contextmanager
+def transaction():
+    """Run several statements on one connection and commit them together"""
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT donor_id FROM donors ORDER BY donor_id DESC LIMIT 1")
-    result = cursor.fetchone()
-    conn.close()
+    started = time.perf_counter()
+    try:
+        # Take the write lock up front; upgrading a read lock fails at once if another process wrote meanwhile
+        begin_immediate(conn)
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        elapsed = time.perf_counter() - started
+        instrumentation.record_query(elapsed)
+        metrics.observe('husma_query_seconds', elapsed, operation='transaction')
+
 
-    if result:
-        num = int(result[0][1:]) + 1
-        return f"D{num:03d}"
-    return "D001"
+def execute_write(query, params=()):
+    """Run a write statement on the writer thread, grouped with other sessions' writes; returns the row count"""
+    return write(statement, query, params)
+
+
+# Donor Operations
+def sync_donor_sequence(cursor):
+    """Move the donor id sequence past the highest numeric id already stored
+
+    Ids are compared as numbers, so D1000 counts as higher than D999.
+    """
+    cursor.execute(
+        """INSERT INTO sequences (name, value)
+           SELECT 'donor_id', COALESCE(MAX(CAST(SUBSTR(donor_id, 2) AS INTEGER)), 0) FROM donors WHERE TRUE
+           ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)"""
+    )
+
+
+def rebuild_donor_totals(cursor):
+    """Recompute donor_totals and donor_yearly_totals from the donations table"""
+    cursor.execute("DELETE FROM donor_totals")
+    cursor.execute(
+        """INSERT INTO donor_totals (donor_id, total_donated, donation_count, first_donation, last_donation)
+           SELECT donor_id, SUM(amount), COUNT(*), MIN(timestamp), MAX(timestamp) FROM donations
+           WHERE donor_id IS NOT NULL AND donor_id != 'anonymous'
+           GROUP BY donor_id"""
+    )
+    cursor.execute("DELETE FROM donor_yearly_totals")
+    cursor.execute(
+        """INSERT INTO donor_yearly_totals (donor_id, year, total_donated, donation_count)
+           SELECT donor_id, CAST(SUBSTR(timestamp, 1, 4) AS INTEGER), SUM(amount), COUNT(*) FROM donations
+           WHERE donor_id IS NOT NULL AND donor_id != 'anonymous'
+           GROUP BY donor_id, CAST(SUBSTR(timestamp, 1, 4) AS INTEGER)"""
+    )
+    bump_change(cursor, 'donor_totals')
+
+
+EPOCH = datetime(1970, 1, 1)
+
+# table -> (text column, SET clause filling the epoch columns from it)
+EPOCH_COLUMNS = {
+    'donations': ("timestamp", "epoch_second = CAST(strftime('%s', timestamp) AS INTEGER), "
+                               "epoch_day = CAST(strftime('%s', timestamp) AS INTEGER) / 86400"),
+    'issues': ("date", "epoch_day = CAST(strftime('%s', date) AS INTEGER) / 86400"),
+}
+
+
+def epoch_seconds(timestamp):
+    """Seconds since 1970-01-01 of an ISO timestamp, on the same local wall clock the text uses"""
+    return int((datetime.fromisoformat(timestamp) - EPOCH).total_seconds())
+
+
+def epoch_day(day):
+    """Days since 1970-01-01 of a date or ISO date string"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return (day - EPOCH.date()).days
+
+
+def backfill_epoch_columns(batch_size=5000, progress=None):
+    """Fill epoch columns left NULL by older releases, one short transaction per batch
+
+    Rows are walked in id order past a high-water mark, so each batch is a
+    primary-key range and text that does not parse is passed over, not retried.
+    Returns {table: rows filled}.
+    """
+    filled = {}
+    for table, (column, assignments) in EPOCH_COLUMNS.items():
+        filled[table] = 0
+        high_water = 0
+        while True:
+            with transaction() as conn:
+                ids = [row[0] for row in conn.execute(
+                    f"SELECT id FROM {table} WHERE id > ? AND epoch_day IS NULL ORDER BY id LIMIT ?",
+                    (high_water, batch_size)
+                )]
+                if not ids:
+                    break
+                conn.execute(f"UPDATE {table} SET {assignments} WHERE id BETWEEN ? AND ? AND epoch_day IS NULL",
+                             (ids[0], ids[-1]))
+            high_water = ids[-1]
+            filled[table] += len(ids)
+            if progress:
+                progress(table, filled[table])
+    return filled
+
+
+def allocate_donor_ids(count, conn=None):
+    """Reserve a block of count consecutive donor ids and return them"""
+    if conn is None:
+        return write(_allocate_donor_ids, count)
+    return _allocate_donor_ids(conn, count)
+
+
+def _allocate_donor_ids(conn, count):
+    last = conn.execute(
+        "UPDATE sequences SET value = value + ? WHERE name = 'donor_id' RETURNING value",
+        (count,)
+    ).fetchone()[0]
+    return [f"D{number:03d}" for number in range(last - count + 1, last + 1)]
+
+
+def get_next_donor_id():
+    return allocate_donor_ids(1)[0]
 
 
 def create_donor(donor_data):
-    return execute_query(
+    return write(_create_donor, donor_data)
+
+
+def _create_donor(conn, donor_data):
+    # Announced by hand rather than by a trigger, so bulk imports pay for one notice per chunk
+    bump_change(conn, 'donors')
+    return conn.execute(
         """INSERT INTO donors (donor_id, name, nic, phone, email, username, password)
            VALUES (?, ?, ?, ?, ?, ?, ?)""",
         donor_data
-    )
+    ).rowcount
 
 
 def get_donor_by_username(username):
@@ -299,6 +803,15 @@ def get_donor_by_email(email):
     )
 
 
+def get_donor_by_login(identifier):
+    """Find a donor by username or email in one indexed lookup (username wins)"""
+    return execute_query(
+        "SELECT * FROM donors WHERE username = ? OR email = ? ORDER BY username = ? DESC LIMIT 1",
+        (identifier, identifier, identifier),
+        fetch=True
+    )
+
+
 def get_donor_by_id(donor_id):
     return execute_query(
         "SELECT * FROM donors WHERE donor_id = ?",
@@ -307,6 +820,13 @@ def get_donor_by_id(donor_id):
     )
 
 
+def update_donor_password(donor_id, hashed_password):
+    return execute_query(
+        "UPDATE donors SET password = ? WHERE donor_id = ?",
+        (hashed_password, donor_id)
+    )
+
+
 # Inventory Operations
 def get_inventory():
     return execute_query("SELECT * FROM inventory", fetchall=True)
@@ -320,35 +840,149 @@ def get_low_stock_items():
 
 
 def update_inventory_stock(product_id, quantity):
-    return execute_query(
+    return execute_write(
         "UPDATE inventory SET stock = stock - ? WHERE product_id = ?",
         (quantity, product_id)
     )
 
 
 def update_inventory(product_id, adjustment):
-    return execute_query(
+    return execute_write(
         "UPDATE inventory SET stock = stock + ? WHERE product_id = ?",
         (adjustment, product_id)
     )
 
 
 # Donation Operations
-def create_donation(donor_id, amount, payment_slip=None):
-    return execute_query(
-        "INSERT INTO donations (donor_id, amount, payment_slip, timestamp) VALUES (?, ?, ?, ?)",
-        (donor_id, amount, payment_slip, datetime.now().isoformat())
+def create_donation(donor_id, amount, payment_slip=None, receipt_number=None):
+    """Record a donation and return its id"""
+    return write(_insert_donation, donor_id, amount, payment_slip, receipt_number, datetime.now())
+
+
+def _insert_donation(conn, donor_id, amount, payment_slip, receipt_number, now):
+    seconds = epoch_seconds(now.isoformat())
+    return conn.execute(
+        """INSERT INTO donations (donor_id, amount, payment_slip, timestamp, receipt_number, epoch_second, epoch_day)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (donor_id, amount, payment_slip, now.isoformat(), receipt_number, seconds, seconds // 86400)
+    ).lastrowid
+
+
+def record_checkout(donor_id, amount, items, payload, consumers, payment_slip=None, receipt_number=None,
+                    idempotency_key=None):
+    """Record a donation, take its items out of stock and emit a donation_recorded event
+
+    Everything happens in one transaction, so the event (and one delivery row per
+    consumer) exists exactly when the donation does. Returns the event payload,
+    which includes the donation id. A checkout submitted again with the same
+    idempotency_key writes nothing and returns the original payload.
+    """
+    return write(_record_checkout, donor_id, amount, items, payload, consumers, payment_slip, receipt_number,
+                 idempotency_key)
+
+
+def _record_checkout(conn, donor_id, amount, items, payload, consumers, payment_slip, receipt_number,
+                     idempotency_key=None):
+    if idempotency_key:
+        row = conn.execute(
+            "SELECT donor_id, amount, response FROM idempotency_keys WHERE idempotency_key = ?",
+            (idempotency_key,)
+        ).fetchone()
+        if row:
+            if row['donor_id'] != donor_id or abs(row['amount'] - amount) > 0.005:
+                raise ValueError("Idempotency key was already used for a different checkout")
+            return json.loads(row['response'])
+
+    now = time.time()
+    recorded_at = datetime.now()
+    donation_id = _insert_donation(conn, donor_id, amount, payment_slip, receipt_number, recorded_at)
+    conn.executemany(
+        "UPDATE inventory SET stock = stock - ? WHERE product_id = ?",
+        [(quantity, product_id) for product_id, quantity in items]
+    )
+    add_campaign_progress(conn, amount, items, recorded_at)
+    recorded = dict(payload, donation_id=donation_id)
+    event_id = conn.execute(
+        "INSERT INTO events (event_type, payload) VALUES (?, ?)",
+        ("donation_recorded", json.dumps(recorded))
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO event_deliveries (idempotency_key, event_id, consumer, next_attempt_at) VALUES (?, ?, ?, ?)",
+        [(f"{event_id}:{consumer}", event_id, consumer, now) for consumer in consumers]
+    )
+    if idempotency_key:
+        conn.execute(
+            """INSERT INTO idempotency_keys (idempotency_key, donor_id, amount, response, expires_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (idempotency_key, donor_id, amount, json.dumps(recorded), int(now) + config.IDEMPOTENCY_KEY_TTL)
+        )
+    return recorded
+
+
+def purge_idempotency_keys(batch_size=5000, now=None):
+    """Delete expired idempotency keys in batches read off the expiry index; returns how many went"""
+    now = int(time.time()) if now is None else now
+    purged = 0
+    while True:
+        with transaction() as conn:
+            deleted = conn.execute(
+                """DELETE FROM idempotency_keys WHERE idempotency_key IN
+                   (SELECT idempotency_key FROM idempotency_keys WHERE expires_at <= ? LIMIT ?)""",
+                (now, batch_size)
+            ).rowcount
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+def set_donation_receipt(donation_id, receipt_path):
+    return execute_write(
+        "UPDATE donations SET receipt_path = ?, receipt_generated = TRUE WHERE id = ?",
+        (receipt_path, donation_id)
     )
 
 
 def get_donations_by_donor(donor_id):
     return execute_query(
-        "SELECT amount, timestamp, payment_slip FROM donations WHERE donor_id = ? ORDER BY timestamp DESC",
+        """SELECT id, amount, timestamp, payment_slip, receipt_number, receipt_path
+           FROM donations WHERE donor_id = ? ORDER BY timestamp DESC""",
         (donor_id,),
         fetchall=True
     )
 
 
+def get_donor_summary(donor_id):
+    """Totals, first and last donation and yearly totals, read from the summaries kept on write"""
+    summary = execute_query(
+        """SELECT total_donated, donation_count, first_donation, last_donation
+           FROM donor_totals WHERE donor_id = ?""",
+        (donor_id,), fetch=True
+    ) or {'total_donated': 0, 'donation_count': 0, 'first_donation': None, 'last_donation': None}
+    summary['yearly'] = execute_query(
+        """SELECT year, total_donated, donation_count FROM donor_yearly_totals
+           WHERE donor_id = ? AND donation_count > 0 ORDER BY year""",
+        (donor_id,), fetchall=True
+    )
+    return summary
+
+
+def get_donations_page(donor_id, before=None, limit=10):
+    """One page of a donor's donations, newest first
+
+    before is the (timestamp, id) of the last row on the previous page; seeking
+    past it on the (donor_id, timestamp) index keeps every page equally cheap.
+    """
+    query = """SELECT id, amount, timestamp, payment_slip, receipt_number, receipt_path
+               FROM donations WHERE donor_id = ?"""
+    params = [donor_id]
+    if before:
+        query += " AND (timestamp, id) < (?, ?)"
+        params.extend(before)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit)
+    return execute_query(query, params, fetchall=True)
+
+
 def get_all_donations():
     """Get all donations for admin view"""
     return execute_query(
@@ -360,9 +994,189 @@ def get_all_donations():
     )
 
 
+# Campaign Operations
+CAMPAIGN_TARGET_TYPES = ('tins', 'amount')
+CAMPAIGN_RECURRENCES = ('none', 'monthly')
+
+
+def campaign_period(recurrence, day):
+    """Counter row a day falls in: its month for monthly campaigns, '' for one-off ones"""
+    return day.strftime('%Y-%m') if recurrence == 'monthly' else ''
+
+
+def create_campaign(name, target_type, target, starts_on, ends_on=None, product_id=None, recurrence='none'):
+    """Add a campaign; tins targets may be limited to one product, LKR targets count whole donations"""
+    if target_type not in CAMPAIGN_TARGET_TYPES:
+        raise ValueError(f"Unknown target type: {target_type}")
+    if recurrence not in CAMPAIGN_RECURRENCES:
+        raise ValueError(f"Unknown recurrence: {recurrence}")
+    if target_type == 'amount' and product_id is not None:
+        raise ValueError("LKR targets cannot be limited to one product")
+    if target <= 0:
+        raise ValueError("Target must be positive")
+    if ends_on and ends_on < starts_on:
+        raise ValueError("Campaign ends before it starts")
+    with transaction() as conn:
+        return conn.execute(
+            """INSERT INTO campaigns (name, target_type, target, product_id, recurrence, starts_on, ends_on)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (name, target_type, target, product_id, recurrence, starts_on, ends_on)
+        ).lastrowid
+
+
+def set_campaign_active(campaign_id, active):
+    return execute_query("UPDATE campaigns SET active = ? WHERE id = ?", (active, campaign_id))
+
+
+def add_campaign_progress(conn, amount, items, now):
+    """Add one checkout to the counters of every campaign running now, on the caller's transaction"""
+    today = now.strftime('%Y-%m-%d')
+    campaigns = conn.execute(
+        """SELECT id, product_id, recurrence FROM campaigns
+           WHERE active = TRUE AND starts_on <= ? AND (ends_on IS NULL OR ends_on >= ?)""",
+        (today, today)
+    ).fetchall()
+    rows = []
+    for campaign in campaigns:
+        if campaign['product_id'] is None:
+            rows.append((campaign['id'], campaign_period(campaign['recurrence'], now),
+                         sum(quantity for _, quantity in items), amount))
+        else:
+            tins = sum(quantity for product_id, quantity in items if product_id == campaign['product_id'])
+            if tins:
+                rows.append((campaign['id'], campaign_period(campaign['recurrence'], now), tins, 0))
+    conn.executemany(
+        """INSERT INTO campaign_progress (campaign_id, period, tins, amount, donations) VALUES (?, ?, ?, ?, 1)
+           ON CONFLICT (campaign_id, period) DO UPDATE SET tins = tins + excluded.tins,
+                                                           amount = amount + excluded.amount,
+                                                           donations = donations + 1""",
+        rows
+    )
+
+
+def _campaign_row(row):
+    row = dict(row)
+    row['achieved'] = row['tins'] if row['target_type'] == 'tins' else row['amount']
+    row['attainment'] = row['achieved'] / row['target']
+    return row
+
+
+def get_campaign_progress(day=None):
+    """Campaigns running on day with their current period's counters, one primary-key read each"""
+    day = day or date.today()
+    today = day.isoformat()
+    rows = execute_query(
+        """SELECT c.id, c.name, c.target_type, c.target, c.product_id, c.recurrence, c.starts_on, c.ends_on,
+                  i.name AS product_name,
+                  COALESCE(p.tins, 0) AS tins, COALESCE(p.amount, 0) AS amount,
+                  COALESCE(p.donations, 0) AS donations
+           FROM campaigns c
+                    LEFT JOIN inventory i ON i.product_id = c.product_id
+                    LEFT JOIN campaign_progress p ON p.campaign_id = c.id
+               AND p.period = CASE c.recurrence WHEN 'monthly' THEN ? ELSE '' END
+           WHERE c.active = TRUE AND c.starts_on <= ? AND (c.ends_on IS NULL OR c.ends_on >= ?)
+           ORDER BY c.id""",
+        (campaign_period('monthly', day), today, today), fetchall=True
+    )
+    return [_campaign_row(row) for row in rows]
+
+
+def get_campaigns():
+    return execute_query(
+        """SELECT c.*, i.name AS product_name FROM campaigns c
+               LEFT JOIN inventory i ON i.product_id = c.product_id
+           ORDER BY c.active DESC, c.id DESC""",
+        fetchall=True
+    )
+
+
+def get_campaign_attainment(campaign_id):
+    """Every recorded period of a campaign with its target attainment, oldest first"""
+    rows = execute_query(
+        """SELECT p.period, p.tins, p.amount, p.donations, c.target_type, c.target
+           FROM campaign_progress p
+                    JOIN campaigns c ON c.id = p.campaign_id
+           WHERE p.campaign_id = ?
+           ORDER BY p.period""",
+        (campaign_id,), fetchall=True
+    )
+    return [_campaign_row(row) for row in rows]
+
+
+# Slip Verification Operations
+def count_pending_slips():
+    result = execute_query(
+        "SELECT COUNT(*) AS n FROM donations WHERE verification_status = 'pending' AND payment_slip IS NOT NULL",
+        fetch=True
+    )
+    return result['n']
+
+
+def get_pending_slips(limit, offset=0):
+    """One page of donations whose payment slip is waiting for review, oldest first"""
+    return execute_query(
+        """SELECT d.id, d.donor_id, d.amount, d.timestamp, d.payment_slip, d.receipt_number,
+                  don.name as donor_name
+           FROM donations d
+                    LEFT JOIN donors don ON d.donor_id = don.donor_id
+           WHERE d.verification_status = 'pending' AND d.payment_slip IS NOT NULL
+           ORDER BY d.id
+           LIMIT ? OFFSET ?""",
+        (limit, offset),
+        fetchall=True
+    )
+
+
+def set_verification_status(donation_ids, status):
+    """Approve or reject pending donations in one statement; returns how many changed"""
+    donation_ids = list(donation_ids)
+    if not donation_ids:
+        return 0
+    placeholders = ", ".join("?" for _ in donation_ids)
+    return execute_write(
+        f"""UPDATE donations SET verification_status = ?, verified_at = CURRENT_TIMESTAMP
+            WHERE verification_status = 'pending' AND id IN ({placeholders})""",
+        (status,) + tuple(donation_ids)
+    )
+
+
+# Upload Operations
+def record_upload(sha256, path, size, mime_type):
+    """Store upload metadata; returns False if the content was already stored"""
+    return execute_query(
+        "INSERT OR IGNORE INTO uploads (sha256, path, size, mime_type) VALUES (?, ?, ?, ?)",
+        (sha256, path, size, mime_type)
+    ) == 1
+
+
+def get_upload(sha256):
+    return execute_query("SELECT * FROM uploads WHERE sha256 = ?", (sha256,), fetch=True)
+
+
+def get_referenced_slips(paths):
+    """The subset of paths that at least one donation uses as its payment slip"""
+    paths = list(paths)
+    referenced = set()
+    for start in range(0, len(paths), 500):
+        chunk = paths[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = execute_query(
+            f"SELECT DISTINCT payment_slip FROM donations WHERE payment_slip IN ({placeholders})",
+            tuple(chunk),
+            fetchall=True
+        )
+        referenced.update(row['payment_slip'] for row in rows)
+    return referenced
+
+
+def delete_uploads(paths):
+    with transaction() as conn:
+        conn.executemany("DELETE FROM uploads WHERE path = ?", [(path,) for path in paths])
+
+
 # Child Operations
 def create_child(child_data):
-    return execute_query(
+    return execute_write(
         "INSERT INTO children (name, birthday, guardian, phone, milk_type) VALUES (?, ?, ?, ?, ?)",
         child_data
     )
@@ -383,7 +1197,7 @@ def get_child_by_id(child_id):
 
 
 def update_child_last_issue(child_id, date):
-    return execute_query(
+    return execute_write(
         "UPDATE children SET last_issue = ? WHERE id = ?",
         (date, child_id)
     )
@@ -391,10 +1205,25 @@ def update_child_last_issue(child_id, date):
 
 # Issue Operations
 def create_issue(child_id, date, milk_type):
-    return execute_query(
-        "INSERT INTO issues (child_id, date, milk_type) VALUES (?, ?, ?)",
-        (child_id, date, milk_type)
+    return execute_write(
+        "INSERT INTO issues (child_id, date, milk_type, epoch_day) VALUES (?, ?, ?, ?)",
+        (child_id, date, milk_type, epoch_day(date))
+    )
+
+
+def record_issue(child_id, date, milk_type, product_id=None):
+    """Log an issue, stamp the child's last issue date and take one tin out of stock, as one write"""
+    return write(_record_issue, child_id, date, milk_type, product_id)
+
+
+def _record_issue(conn, child_id, date, milk_type, product_id):
+    conn.execute(
+        "INSERT INTO issues (child_id, date, milk_type, epoch_day) VALUES (?, ?, ?, ?)",
+        (child_id, date, milk_type, epoch_day(date))
     )
+    conn.execute("UPDATE children SET last_issue = ? WHERE id = ?", (date, child_id))
+    if product_id is not None:
+        conn.execute("UPDATE inventory SET stock = stock - 1 WHERE product_id = ?", (product_id,))
 
 
 def get_issues_by_child(child_id):
@@ -419,15 +1248,112 @@ def get_donation_analytics():
 
 
 def get_monthly_donation_trend():
-    return execute_query('''
-                         SELECT strftime('%Y-%m', timestamp) as month,
-            COALESCE(SUM(amount), 0) as monthly_total,
-            COUNT(*) as donation_count
-                         FROM donations
-                         GROUP BY strftime('%Y-%m', timestamp)
-                         ORDER BY month DESC
-                             LIMIT 12
-                         ''', fetchall=True)
+    """Totals for the 12 calendar months up to the latest donation's, newest first
+
+    Only that window is read through the epoch_day index; strftime runs on its
+    rows alone rather than on the whole table. Months without donations are
+    listed with zero totals, so the trend always covers the same span.
+    """
+    latest = execute_query("SELECT MAX(epoch_day) AS day FROM donations", fetch=True)['day']
+    if latest is None:
+        return []
+    latest = EPOCH.date() + timedelta(days=latest)
+    first_month = date(latest.year - (latest.month <= 11), (latest.month - 12) % 12 + 1, 1)
+    rows = execute_query(
+        """SELECT strftime('%Y-%m', epoch_day * 86400, 'unixepoch') AS month,
+                  COALESCE(SUM(amount), 0) AS monthly_total,
+                  COUNT(*) AS donation_count
+           FROM donations
+           WHERE epoch_day >= ?
+           GROUP BY month""",
+        (epoch_day(first_month),), fetchall=True
+    )
+    by_month = {row['month']: row for row in rows}
+    trend = []
+    year, month = latest.year, latest.month
+    for _ in range(12):
+        key = f"{year:04d}-{month:02d}"
+        trend.append(by_month.get(key, {'month': key, 'monthly_total': 0.0, 'donation_count': 0}))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return trend
+
+
+def _range_conditions(column, start=None, end=None, weekday=None):
+    """WHERE conditions on an epoch_day column: inclusive date bounds and an optional weekday (Monday is 0)"""
+    conditions, params = [f"{column} IS NOT NULL"], []
+    if start:
+        conditions.append(f"{column} >= ?")
+        params.append(epoch_day(start))
+    if end:
+        conditions.append(f"{column} <= ?")
+        params.append(epoch_day(end))
+    if weekday is not None:
+        # 1970-01-01 was a Thursday
+        conditions.append(f"({column} + 3) % 7 = ?")
+        params.append(weekday)
+    return " WHERE " + " AND ".join(conditions), params
+
+
+def month_bounds(year, month):
+    """First and last day of a month"""
+    first = date(year, month, 1)
+    following = date(year + (month == 12), month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def get_donations_between(start=None, end=None, weekday=None, limit=None):
+    """Donations from start to end inclusive, newest first, found through the epoch_day index"""
+    where, params = _range_conditions("d.epoch_day", start, end, weekday)
+    query = f"""SELECT d.*, don.name as donor_name
+                FROM donations d
+                         LEFT JOIN donors don ON d.donor_id = don.donor_id{where}
+                ORDER BY d.epoch_day DESC, d.epoch_second DESC"""
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return execute_query(query, params, fetchall=True)
+
+
+def get_donations_in_month(year, month, weekday=None):
+    return get_donations_between(*month_bounds(year, month), weekday=weekday)
+
+
+def get_donation_totals_by_weekday(start=None, end=None):
+    """[{weekday, total, donation_count}] with Monday as 0, for donations from start to end"""
+    where, params = _range_conditions("epoch_day", start, end)
+    return execute_query(
+        f"""SELECT (epoch_day + 3) % 7 AS weekday, COALESCE(SUM(amount), 0) AS total, COUNT(*) AS donation_count
+            FROM donations{where}
+            GROUP BY weekday ORDER BY weekday""",
+        params, fetchall=True
+    )
+
+
+def get_issues_between(start=None, end=None, weekday=None):
+    """Milk issues from start to end inclusive with the child's name, newest first"""
+    where, params = _range_conditions("i.epoch_day", start, end, weekday)
+    return execute_query(
+        f"""SELECT i.id, i.child_id, c.name AS child_name, i.date, i.milk_type, i.quantity
+            FROM issues i
+                     LEFT JOIN children c ON c.id = i.child_id{where}
+            ORDER BY i.epoch_day DESC, i.id DESC""",
+        params, fetchall=True
+    )
+
+
+def get_issues_in_month(year, month, weekday=None):
+    return get_issues_between(*month_bounds(year, month), weekday=weekday)
+
+
+def get_issue_totals_by_weekday(start=None, end=None):
+    """[{weekday, quantity, issue_count}] with Monday as 0, for issues from start to end"""
+    where, params = _range_conditions("epoch_day", start, end)
+    return execute_query(
+        f"""SELECT (epoch_day + 3) % 7 AS weekday, COALESCE(SUM(quantity), 0) AS quantity, COUNT(*) AS issue_count
+            FROM issues{where}
+            GROUP BY weekday ORDER BY weekday""",
+        params, fetchall=True
+    )
 
 
 def get_donor_ranking():
@@ -441,4 +1367,173 @@ def get_donor_ranking():
                          WHERE d.is_verified = TRUE
                          GROUP BY d.donor_id
                          ORDER BY total_donated DESC LIMIT 10
-                         ''', fetchall=True)
\ No newline at end of file
+                         ''', fetchall=True)
+
+
+def get_verified_donors(donor_ids=None, limit=None):
+    """{donor_id: name} of verified donors, optionally only the given ids"""
+    query = "SELECT donor_id, name FROM donors WHERE is_verified = TRUE"
+    params = []
+    if donor_ids is not None:
+        query += f" AND donor_id IN ({', '.join('?' for _ in donor_ids)})"
+        params.extend(donor_ids)
+    if limit is not None:
+        query += " ORDER BY donor_id LIMIT ?"
+        params.append(limit)
+    return {row['donor_id']: row['name'] for row in execute_query(query, params, fetchall=True)}
+
+
+def get_donor_names(donor_ids):
+    """{donor_id: name} for the given ids"""
+    rows = execute_query(
+        f"SELECT donor_id, name FROM donors WHERE donor_id IN ({', '.join('?' for _ in donor_ids)})",
+        list(donor_ids), fetchall=True
+    )
+    return {row['donor_id']: row['name'] for row in rows}
+
+
+# Donor Ranking Operations
+def get_top_donor_totals(limit=10):
+    """Verified donors with the highest totals, read through the donor_totals index"""
+    return execute_query(
+        """SELECT d.name, t.donor_id, t.donation_count, t.total_donated
+           FROM donor_totals t
+                    JOIN donors d ON d.donor_id = t.donor_id
+           WHERE d.is_verified = TRUE
+           ORDER BY t.total_donated DESC LIMIT ?""",
+        (limit,), fetchall=True
+    )
+
+
+def load_donor_totals():
+    """(highest donation id, {donor_id: (total, count)}) read from one consistent snapshot"""
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        high_water = conn.execute("SELECT COALESCE(MAX(id), 0) FROM donations").fetchone()[0]
+        rows = conn.execute("SELECT donor_id, total_donated, donation_count FROM donor_totals").fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return high_water, {row[0]: (row[1], row[2]) for row in rows}
+
+
+def get_donations_after(donation_id):
+    """(id, donor_id, amount) of donations with an id above donation_id, oldest first"""
+    conn = get_connection()
+    try:
+        return conn.execute(
+            "SELECT id, donor_id, amount FROM donations WHERE id > ? ORDER BY id", (donation_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def compute_donor_totals():
+    """{donor_id: (total, count)} recomputed from every donation, for verification"""
+    rows = execute_query(
+        """SELECT donor_id, SUM(amount) AS total_donated, COUNT(*) AS donation_count FROM donations
+           WHERE donor_id IS NOT NULL AND donor_id != 'anonymous'
+           GROUP BY donor_id""",
+        fetchall=True
+    )
+    return {row['donor_id']: (row['total_donated'], row['donation_count']) for row in rows}
+
+
+# Outbox Operations (email_outbox, sms_outbox, event_deliveries)
+def enqueue_outbox(table, columns):
+    """Queue a message; returns False if its idempotency key was already queued"""
+    names = ", ".join(columns)
+    placeholders = ", ".join("?" for _ in columns)
+    return execute_query(
+        f"INSERT OR IGNORE INTO {table} ({names}, next_attempt_at) VALUES ({placeholders}, ?)",
+        tuple(columns.values()) + (time.time(),)
+    ) == 1
+
+
+def _scope(filters):
+    """Extra equality conditions (e.g. one consumer of event_deliveries)"""
+    filters = filters or {}
+    return "".join(f" AND {column} = ?" for column in filters), tuple(filters.values())
+
+
+def claim_outbox_batch(table, claim_token, limit, lease_seconds=300, filters=None):
+    """Claim due messages for one worker; stale claims from crashed workers are taken over"""
+    now = time.time()
+    scope, scope_params = _scope(filters)
+    with transaction() as conn:
+        conn.execute(
+            f"""UPDATE {table}
+                SET status = 'sending', claim_token = ?, claimed_at = ?
+                WHERE id IN (SELECT id FROM {table}
+                             WHERE ((status = 'pending' AND next_attempt_at <= ?)
+                                 OR (status = 'sending' AND claimed_at < ?)){scope}
+                             ORDER BY next_attempt_at LIMIT ?)""",
+            (claim_token, now, now, now - lease_seconds) + scope_params + (limit,)
+        )
+        rows = conn.execute(
+            f"SELECT * FROM {table} WHERE status = 'sending' AND claim_token = ? ORDER BY id",
+            (claim_token,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def complete_outbox_batch(table, sent_ids, failures, max_attempts, backoff_base, backoff_max, released_ids=()):
+    """Mark sent messages and reschedule (or dead-letter) failed ones in one transaction"""
+    now = time.time()
+    with transaction() as conn:
+        # Released messages were never attempted; they go straight back to the queue
+        conn.executemany(
+            f"UPDATE {table} SET status = 'pending', claim_token = NULL WHERE id = ?",
+            [(message_id,) for message_id in released_ids]
+        )
+        conn.executemany(
+            f"UPDATE {table} SET status = 'sent', claim_token = NULL, sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+            [(message_id,) for message_id in sent_ids]
+        )
+        for message_id, attempts, error in failures:
+            attempts += 1
+            if attempts >= max_attempts:
+                conn.execute(
+                    f"UPDATE {table} SET status = 'dead', attempts = ?, last_error = ?, claim_token = NULL "
+                    f"WHERE id = ?",
+                    (attempts, error, message_id)
+                )
+            else:
+                delay = min(backoff_max, backoff_base * 2 ** (attempts - 1))
+                conn.execute(
+                    f"UPDATE {table} SET status = 'pending', attempts = ?, last_error = ?, claim_token = NULL, "
+                    f"next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, now + delay, message_id)
+                )
+
+
+def count_outbox(table, statuses=('pending', 'sending'), filters=None):
+    """Number of messages in the given states (outstanding by default)"""
+    placeholders = ", ".join("?" for _ in statuses)
+    scope, scope_params = _scope(filters)
+    result = execute_query(
+        f"SELECT COUNT(*) AS n FROM {table} WHERE status IN ({placeholders}){scope}",
+        tuple(statuses) + scope_params,
+        fetch=True
+    )
+    return result['n']
+
+
+def get_event_payloads(event_ids):
+    """Decoded payloads of the given events keyed by event id"""
+    if not event_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in event_ids)
+    rows = execute_query(
+        f"SELECT id, payload FROM events WHERE id IN ({placeholders})",
+        tuple(event_ids),
+        fetchall=True
+    )
+    return {row['id']: json.loads(row['payload']) for row in rows}
+
+
+def get_stock_levels():
+    """Current stock per product as (name, stock) pairs"""
+    rows = execute_query("SELECT name, stock FROM inventory", fetchall=True)
+    return [(row['name'], row['stock']) for row in rows]
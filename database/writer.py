@@ -0,0 +1,209 @@
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from config import config
+from utils import instrumentation, metrics
+
+
+def statement(conn, query, params=()):
+    """A single write statement as a writer operation; returns the row count"""
+    return conn.execute(query, params).rowcount
+
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+
+def begin_immediate(conn):
+    """Take the write lock, retrying with jittered backoff if another process holds it past the busy timeout"""
+    for attempt in range(config.DB_WRITE_RETRIES):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == config.DB_WRITE_RETRIES - 1:
+                raise
+            time.sleep(config.DB_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class Writer:
+    """
+    Dedicated thread that owns the process's write connection.
+
+    Sessions submit operations, functions called as ``operation(conn, *args)``,
+    and get a Future back. The thread takes whatever is queued within
+    ``group_window`` seconds of the first operation (up to ``max_batch``), runs
+    the batch in one transaction with a savepoint per operation, and commits
+    once. An operation that raises is rolled back to its savepoint and fails
+    alone; futures resolve only after the commit, so a caller never sees a
+    result that could still be rolled back.
+    """
+
+    def __init__(self, database, group_window, max_batch):
+        self.database = database
+        self.group_window = group_window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="husma-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, operation, *args):
+        future = Future()
+        self.queue.put((operation, args, future))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.group_window
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, conn, batch):
+        """Run one group of operations; returns (future, result, error) per operation"""
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            begin_immediate(conn)
+            for operation, args, future in batch:
+                conn.execute("SAVEPOINT operation")
+                try:
+                    outcomes.append((future, operation(conn, *args), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    outcomes.append((future, None, e))
+                conn.execute("RELEASE operation")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Nothing in the batch was committed, so every operation fails, with its own error if it had one
+            errors = {future: error for future, _, error in outcomes if error is not None}
+            return [(future, None, errors.get(future, e)) for _, _, future in batch]
+        return outcomes
+
+    def run(self):
+        conn = sqlite3.connect(self.database, isolation_level=None, timeout=config.DB_BUSY_TIMEOUT,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                batch = self._collect()
+                stop = batch[-1] is None
+                batch = [item for item in batch if item is not None]
+                if batch:
+                    started = time.perf_counter()
+                    try:
+                        outcomes = self._run_batch(conn, batch)
+                    except Exception as e:
+                        outcomes = [(future, None, e) for _, _, future in batch if not future.done()]
+                    metrics.observe('husma_write_batch_seconds', time.perf_counter() - started)
+                    metrics.observe('husma_write_batch_operations', len(batch), buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+                    for future, result, error in outcomes:
+                        if error is None:
+                            future.set_result(result)
+                        else:
+                            future.set_exception(error)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def stop(self, timeout=None):
+        """Finish the operations already queued, then close the connection"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The writer for the configured database, restarted when DATABASE_URL changes"""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.database == config.DATABASE_URL:
+        return writer
+    with _writer_lock:
+        if _writer is None or _writer.database != config.DATABASE_URL:
+            if _writer is not None:
+                _writer.stop()
+            _writer = Writer(config.DATABASE_URL, config.WRITER_GROUP_WINDOW, config.WRITER_MAX_BATCH)
+        return _writer
+
+
+def write(operation, *args):
+    """Run operation(conn, *args) on the writer thread and wait for its committed result
+
+    If the writer has not started the operation within WRITER_TIMEOUT seconds it is
+    cancelled, so it can never commit, and concurrent.futures.TimeoutError is raised.
+    An operation already running is waited for up to WRITER_TIMEOUT more; if that
+    expires too, TimeoutError is raised although the operation may still commit, so
+    a caller must retry with the same idempotency key rather than report a failure.
+    """
+    started = time.perf_counter()
+    future = get_writer().submit(operation, *args)
+    try:
+        try:
+            return future.result(timeout=config.WRITER_TIMEOUT)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result(timeout=config.WRITER_TIMEOUT)
+    finally:
+        elapsed = time.perf_counter() - started
+        instrumentation.record_query(elapsed)
+        label = metrics.query_operation(args[0]) if operation is statement else operation.__name__.lstrip('_')
+        metrics.observe('husma_query_seconds', elapsed, operation=label)
+
+
+def benchmark_writes(threads=16, writes=100, database="temp/writer_bench.db"):
+    """Concurrent checkouts with a transaction per write versus through the writer thread"""
+    from database.operations import init_database, create_donor, transaction, _record_checkout
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+    create_donor(("D001", "Bench Donor", "199012345678", "0771234567", "bench@example.com", "bench", "!"))
+    checkout = ("D001", 3900.0, [(1, 1)], {'donor_id': "D001"}, (), None, None)
+
+    def direct():
+        with transaction() as conn:
+            _record_checkout(conn, *checkout)
+
+    def grouped():
+        write(_record_checkout, *checkout)
+
+    result = {'threads': threads, 'writes': threads * writes}
+    for name, run in (('direct', direct), ('writer', grouped)):
+        errors = []
+
+        def session():
+            for _ in range(writes):
+                try:
+                    run()
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            for future in [pool.submit(session) for _ in range(threads)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        result[f"{name}_writes_per_second"] = round((threads * writes - len(errors)) / elapsed, 1)
+        result[f"{name}_lock_errors"] = len(errors)
+    result['speedup'] = round(result['writer_writes_per_second'] / result['direct_writes_per_second'], 2)
+    return result
@@ -0,0 +1,500 @@
+import argparse
+import json
+import os
+import sys
+
+# Run from the project root so relative paths in config resolve
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cmd_loadtest(args):
+    from utils.loadtest import run_load_test, print_report
+
+    report = run_load_test(
+        users=args.users,
+        iterations=args.iterations,
+        seed_donors=args.donors,
+        seed_donations=args.donations,
+        seed_children=args.children,
+        database=args.database,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+def cmd_calibrate_hasher(args):
+    from auth.hashing import calibrate
+
+    result = calibrate(target_ms=args.target_ms, scheme=args.scheme)
+    print(f"Calibrated {result['scheme']} at {result['elapsed_ms']} ms per hash (target {args.target_ms} ms)")
+    print("Set these environment variables:")
+    print(f"PASSWORD_HASH_SCHEME={result['scheme']}")
+    for key, value in result.items():
+        if key.isupper():
+            print(f"{key}={value}")
+
+
+def cmd_email_bench(args):
+    from services.email_outbox import benchmark_delivery
+
+    result = benchmark_delivery(messages=args.messages, batch_size=args.batch_size)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_sms_bench(args):
+    from services.sms_dispatcher import benchmark_dispatch
+
+    result = benchmark_dispatch(messages=args.messages, rate_per_second=args.rate)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_bench_templates(args):
+    from services.template_service import benchmark_rendering
+
+    result = benchmark_rendering(recipients=args.recipients, name=args.template)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_bench_receipts(args):
+    from config import config
+    from utils.pdf_generator import benchmark_receipts
+
+    if args.workers:
+        config.RECEIPT_WORKERS = args.workers
+    result = benchmark_receipts(count=args.count)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_check_receipts(args):
+    from utils.pdf_generator import check_receipt
+
+    result = check_receipt(timeout=args.timeout)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if not result['rendered']:
+        sys.exit(1)
+
+
+def cmd_statements(args):
+    from services.statement_service import run_statement_job
+
+    run_statement_job(args.year, workers=args.workers, send_email=args.send_email, write_pdf=not args.text_only)
+
+
+def cmd_bench_statements(args):
+    from services.statement_service import benchmark_statements
+
+    result = benchmark_statements(donors=args.donors, donations_per_donor=args.donations_per_donor,
+                                  workers=args.workers, write_pdf=args.pdf)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    over_budget = []
+    if args.max_seconds and result['seconds'] > args.max_seconds:
+        over_budget.append(f"time {result['seconds']}s > {args.max_seconds}s")
+    if args.max_memory_mb and result['peak_memory_mb'] > args.max_memory_mb:
+        over_budget.append(f"memory {result['peak_memory_mb']} MB > {args.max_memory_mb} MB")
+    if over_budget:
+        print("Budget exceeded: " + ", ".join(over_budget))
+        sys.exit(1)
+
+
+def cmd_bench_checkout(args):
+    from services.event_pipeline import benchmark_checkout
+
+    result = benchmark_checkout(checkouts=args.checkouts, consumer_delay=args.consumer_delay_ms / 1000)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if args.max_ms and result['checkout_p95_ms'] > args.max_ms:
+        print(f"Budget exceeded: checkout p95 {result['checkout_p95_ms']} ms > {args.max_ms} ms")
+        sys.exit(1)
+
+
+def cmd_check_pipeline(args):
+    from services.event_pipeline import check_pipeline
+
+    result = check_pipeline(checkouts=args.checkouts, timeout=args.timeout)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if not result['complete']:
+        print("Not every event delivery completed")
+        sys.exit(1)
+
+
+def cmd_gc_uploads(args):
+    from services.upload_service import collect_garbage
+
+    orphans = collect_garbage(grace_seconds=args.grace_hours * 3600, delete=args.delete)
+    for path, size in orphans:
+        print(f"{'removed' if args.delete else 'orphaned'}: {path} ({size:,} bytes)")
+    total = sum(size for _, size in orphans)
+    action = "Removed" if args.delete else "Would remove (pass --delete)"
+    print(f"{action}: {len(orphans)} files, {total:,} bytes")
+
+
+def cmd_import_statement(args):
+    from database.operations import init_database
+    from services.reconciliation_service import import_statement
+
+    init_database()
+    columns = {key: value for key, value in (('date', args.date_column), ('amount', args.amount_column),
+                                              ('reference', args.reference_column),
+                                              ('description', args.description_column)) if value}
+    result = import_statement(args.path, columns=columns, date_format=args.date_format)
+    for line_number, error in result['errors']:
+        print(f"line {line_number}: {error}")
+    print(f"Imported {result['imported']} of {result['lines']} credit lines "
+          f"({result['duplicates']} already imported, {len(result['errors'])} rejected)")
+
+
+def cmd_reconcile(args):
+    from database.operations import init_database
+    from services.reconciliation_service import get_reconciliation_sets, reconcile
+
+    init_database()
+    result = reconcile(window_days=args.window_days)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if args.show:
+        for status, rows in get_reconciliation_sets(limit=args.show).items():
+            print(f"\n{status} (first {len(rows)}):")
+            for row in rows:
+                print(f"  line {row['id']}  {row['posted_date']}  {row['amount']:,.2f}  "
+                      f"{row['reference'] or row['description'] or '-'}  -> {row['donation_ids'] or '-'}")
+
+
+def cmd_bench_reconcile(args):
+    from services.reconciliation_service import benchmark_reconciliation
+
+    result = benchmark_reconciliation(lines=args.lines)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_import(args):
+    from database.operations import init_database
+    from services.import_service import run_import
+
+    init_database()
+    result = run_import(args.kind, args.path, job_id=args.job_id, chunk_size=args.chunk_size, progress=print)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+def cmd_bench_import(args):
+    from services.import_service import benchmark_import
+
+    result = benchmark_import(rows=args.rows, kind=args.kind)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if args.min_rows_per_second and result['rows_per_second'] < args.min_rows_per_second:
+        print(f"Budget exceeded: {result['rows_per_second']} rows/s < {args.min_rows_per_second} rows/s")
+        sys.exit(1)
+
+
+def cmd_export(args):
+    from services.export_service import export_dataset
+
+    extension = "csv.gz" if args.format == "csv.gz" else "hcol"
+    path = args.output or f"exports/{args.dataset}.{extension}"
+    rows = export_dataset(args.dataset, path, args.format, start=args.start, end=args.end, donor_id=args.donor)
+    print(f"Exported {rows} {args.dataset} rows to {path}")
+
+
+def cmd_bench_export(args):
+    from services.export_service import benchmark_export
+
+    result = benchmark_export(rows=args.rows)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    slowest = max(result['csv_gz_seconds'], result['columnar_seconds'])
+    if args.max_seconds and slowest > args.max_seconds:
+        print(f"Budget exceeded: {slowest}s > {args.max_seconds}s")
+        sys.exit(1)
+
+
+def cmd_bench_analytics(args):
+    from services.analytics_snapshot import benchmark_analytics
+
+    result = benchmark_analytics(rows=args.rows, donors=args.donors)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if not all(value for key, value in result.items() if key.endswith("_matches")):
+        print("Snapshot results differ from the SQL queries")
+        sys.exit(1)
+
+
+def cmd_bench_cohorts(args):
+    from services.cohort_service import benchmark_cohorts
+
+    result = benchmark_cohorts(rows=args.rows, donors=args.donors)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if not result['anonymous_matches']:
+        print("Anonymous donations changed the cohort report")
+        sys.exit(1)
+
+    if args.max_seconds and result['report_seconds'] > args.max_seconds:
+        print(f"Budget exceeded: {result['report_seconds']}s > {args.max_seconds}s")
+        sys.exit(1)
+
+
+def cmd_verify_ranking(args):
+    from database.operations import init_database
+    from services.ranking_service import verify_ranking
+
+    init_database()
+    result = verify_ranking(repair=args.repair)
+    for key, value in result.items():
+        if key.endswith("_mismatches"):
+            value = f"{len(value)} {value[:10]}" if value else 0
+        print(f"{key}: {value}")
+
+    if (result['table_mismatches'] or result['mirror_mismatches'] or not result.get('order_matches', True)) \
+            and not result.get('repaired'):
+        sys.exit(1)
+
+
+def cmd_backfill_epochs(args):
+    from database.operations import init_database, backfill_epoch_columns
+
+    init_database()
+    filled = backfill_epoch_columns(
+        batch_size=args.batch_size,
+        progress=lambda table, rows: print(f"\r{table}: {rows} rows filled", end="", flush=True)
+    )
+    print()
+    for table, rows in filled.items():
+        print(f"{table}: {rows} rows backfilled")
+
+
+def cmd_bench_writes(args):
+    from database.writer import benchmark_writes
+
+    result = benchmark_writes(threads=args.threads, writes=args.writes)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if result['writer_lock_errors']:
+        print("Writes through the writer thread failed with lock errors")
+        sys.exit(1)
+
+
+def cmd_serve(args):
+    from utils.launcher import serve
+
+    serve(workers=args.workers, host=args.host, port=args.port, base_port=args.base_port)
+
+
+def cmd_check_workers(args):
+    from utils.launcher import check_workers
+
+    result = check_workers(workers=args.workers, threads=args.threads, checkouts=args.checkouts)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if not result['consistent']:
+        print("Worker processes disagree with the database")
+        sys.exit(1)
+
+
+def cmd_purge_idempotency_keys(args):
+    from database.operations import init_database, purge_idempotency_keys
+
+    init_database()
+    print(f"Purged {purge_idempotency_keys(batch_size=args.batch_size)} expired checkout idempotency keys")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Husma Foundation management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    loadtest = commands.add_parser("loadtest", help="Drive concurrent virtual users through the app")
+    loadtest.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    loadtest.add_argument("--iterations", type=int, default=5, help="Flow iterations per user")
+    loadtest.add_argument("--donors", type=int, default=100, help="Seeded donors")
+    loadtest.add_argument("--donations", type=int, default=1000, help="Seeded donations")
+    loadtest.add_argument("--children", type=int, default=50, help="Seeded children")
+    loadtest.add_argument("--database", default="temp/loadtest.db", help="Scratch database path")
+    loadtest.add_argument("--json", action="store_true", help="Print the report as JSON")
+    loadtest.set_defaults(func=cmd_loadtest)
+
+    calibrate = commands.add_parser("calibrate-hasher", help="Pick a password hash cost for a target latency")
+    calibrate.add_argument("--target-ms", type=float, default=250, help="Target hash time in milliseconds")
+    calibrate.add_argument("--scheme", choices=["scrypt", "pbkdf2_sha256"], default="scrypt")
+    calibrate.set_defaults(func=cmd_calibrate_hasher)
+
+    email_bench = commands.add_parser("email-bench", help="Deliver queued emails to a local SMTP sink")
+    email_bench.add_argument("--messages", type=int, default=1000)
+    email_bench.add_argument("--batch-size", type=int, default=None)
+    email_bench.set_defaults(func=cmd_email_bench)
+
+    sms_bench = commands.add_parser("sms-bench", help="Dispatch queued SMS to a local stub gateway")
+    sms_bench.add_argument("--messages", type=int, default=1000)
+    sms_bench.add_argument("--rate", type=float, default=500, help="Gateway rate limit (messages/second)")
+    sms_bench.set_defaults(func=cmd_sms_bench)
+
+    templates = commands.add_parser("bench-templates", help="Measure email template render cost")
+    templates.add_argument("--recipients", type=int, default=100000)
+    templates.add_argument("--template", default="donation_receipt")
+    templates.set_defaults(func=cmd_bench_templates)
+
+    receipts = commands.add_parser("bench-receipts", help="Measure PDF receipt generation throughput")
+    receipts.add_argument("--count", type=int, default=200)
+    receipts.add_argument("--workers", type=int, default=None)
+    receipts.set_defaults(func=cmd_bench_receipts)
+
+    check_receipts = commands.add_parser("check-receipts",
+                                         help="Render a receipt in a fresh process through generate_donation_receipt")
+    check_receipts.add_argument("--timeout", type=float, default=60, help="Fail if it takes longer (seconds)")
+    check_receipts.set_defaults(func=cmd_check_receipts)
+
+    statements = commands.add_parser("statements", help="Render year-end donor statements (resumable)")
+    statements.add_argument("--year", type=int, required=True)
+    statements.add_argument("--workers", type=int, default=None)
+    statements.add_argument("--send-email", action="store_true", help="Queue a statement email per donor")
+    statements.add_argument("--text-only", action="store_true", help="Write text statements instead of PDFs")
+    statements.set_defaults(func=cmd_statements)
+
+    bench_statements = commands.add_parser("bench-statements", help="Run the statement job on a scratch database")
+    bench_statements.add_argument("--donors", type=int, default=100000)
+    bench_statements.add_argument("--donations-per-donor", type=int, default=3)
+    bench_statements.add_argument("--workers", type=int, default=None)
+    bench_statements.add_argument("--pdf", action="store_true", help="Render PDFs (slower) instead of text")
+    bench_statements.add_argument("--max-seconds", type=float, default=None, help="Fail if slower than this")
+    bench_statements.add_argument("--max-memory-mb", type=float, default=None,
+                                  help="Fail if the coordinating process peaks above this")
+    bench_statements.set_defaults(func=cmd_bench_statements)
+
+    bench_checkout = commands.add_parser("bench-checkout",
+                                         help="Time checkouts against deliberately slow event consumers")
+    bench_checkout.add_argument("--checkouts", type=int, default=200)
+    bench_checkout.add_argument("--consumer-delay-ms", type=float, default=50,
+                                help="Time each consumer spends per event")
+    bench_checkout.add_argument("--max-ms", type=float, default=None, help="Fail if checkout p95 exceeds this")
+    bench_checkout.set_defaults(func=cmd_bench_checkout)
+
+    check_pipeline = commands.add_parser("check-pipeline",
+                                         help="Run checkouts through the real event consumers until delivered")
+    check_pipeline.add_argument("--checkouts", type=int, default=3)
+    check_pipeline.add_argument("--timeout", type=float, default=60, help="Fail if deliveries take longer (seconds)")
+    check_pipeline.set_defaults(func=cmd_check_pipeline)
+
+    gc_uploads = commands.add_parser("gc-uploads", help="Find payment slips that no donation references")
+    gc_uploads.add_argument("--delete", action="store_true", help="Remove the files (default is a dry run)")
+    gc_uploads.add_argument("--grace-hours", type=float, default=24, help="Ignore files younger than this")
+    gc_uploads.set_defaults(func=cmd_gc_uploads)
+
+    import_statement = commands.add_parser("import-statement", help="Import a bank statement CSV export")
+    import_statement.add_argument("path")
+    import_statement.add_argument("--date-column", default=None)
+    import_statement.add_argument("--amount-column", default=None)
+    import_statement.add_argument("--reference-column", default=None)
+    import_statement.add_argument("--description-column", default=None)
+    import_statement.add_argument("--date-format", default=None, help="strptime format, e.g. %%d/%%m/%%Y")
+    import_statement.set_defaults(func=cmd_import_statement)
+
+    reconcile = commands.add_parser("reconcile", help="Match imported statement lines to donations")
+    reconcile.add_argument("--window-days", type=int, default=3)
+    reconcile.add_argument("--show", type=int, default=10, help="Lines to print from each set (0 for none)")
+    reconcile.set_defaults(func=cmd_reconcile)
+
+    bench_reconcile = commands.add_parser("bench-reconcile", help="Reconcile a synthetic year of statements")
+    bench_reconcile.add_argument("--lines", type=int, default=300000)
+    bench_reconcile.set_defaults(func=cmd_bench_reconcile)
+
+    bulk_import = commands.add_parser("import", help="Bulk import donors, children or donations (CSV or JSONL)")
+    bulk_import.add_argument("kind", choices=["donors", "children", "donations"])
+    bulk_import.add_argument("path")
+    bulk_import.add_argument("--job-id", default=None, help="Resume this job (defaults to one per unchanged file)")
+    bulk_import.add_argument("--chunk-size", type=int, default=5000, help="Rows per transaction")
+    bulk_import.set_defaults(func=cmd_import)
+
+    bench_import = commands.add_parser("bench-import", help="Import generated rows into a scratch database")
+    bench_import.add_argument("--rows", type=int, default=200000)
+    bench_import.add_argument("--kind", choices=["donors", "children", "donations"], default="donors")
+    bench_import.add_argument("--min-rows-per-second", type=float, default=None)
+    bench_import.set_defaults(func=cmd_bench_import)
+
+    export = commands.add_parser("export", help="Stream a dataset to gzip CSV or the columnar format")
+    export.add_argument("dataset", choices=["donations", "issues", "children"])
+    export.add_argument("--format", choices=["csv.gz", "columnar"], default="csv.gz")
+    export.add_argument("--output", default=None)
+    export.add_argument("--start", default=None, help="First date included (YYYY-MM-DD)")
+    export.add_argument("--end", default=None, help="First date excluded (YYYY-MM-DD)")
+    export.add_argument("--donor", default=None, help="Only this donor's donations")
+    export.set_defaults(func=cmd_export)
+
+    bench_export = commands.add_parser("bench-export", help="Export generated donations from a scratch database")
+    bench_export.add_argument("--rows", type=int, default=1000000)
+    bench_export.add_argument("--max-seconds", type=float, default=None, help="Fail if either format is slower")
+    bench_export.set_defaults(func=cmd_bench_export)
+
+    bench_analytics = commands.add_parser("bench-analytics",
+                                          help="Compare SQL analytics with the NumPy donation snapshot")
+    bench_analytics.add_argument("--rows", type=int, default=10000000)
+    bench_analytics.add_argument("--donors", type=int, default=100000)
+    bench_analytics.set_defaults(func=cmd_bench_analytics)
+
+    bench_cohorts = commands.add_parser("bench-cohorts", help="Time the cohort and lifetime-value report")
+    bench_cohorts.add_argument("--rows", type=int, default=5000000)
+    bench_cohorts.add_argument("--donors", type=int, default=100000)
+    bench_cohorts.add_argument("--max-seconds", type=float, default=None, help="Fail if the report is slower")
+    bench_cohorts.set_defaults(func=cmd_bench_cohorts)
+
+    verify_ranking = commands.add_parser("verify-ranking",
+                                         help="Check donor_totals and the in-process ranking against a full recompute")
+    verify_ranking.add_argument("--repair", action="store_true", help="Rebuild donor_totals if they disagree")
+    verify_ranking.set_defaults(func=cmd_verify_ranking)
+
+    backfill_epochs = commands.add_parser("backfill-epochs",
+                                          help="Fill the integer date columns of donations and issues in batches")
+    backfill_epochs.add_argument("--batch-size", type=int, default=5000)
+    backfill_epochs.set_defaults(func=cmd_backfill_epochs)
+
+    bench_writes = commands.add_parser("bench-writes",
+                                       help="Concurrent checkouts: a transaction per write vs the writer thread")
+    bench_writes.add_argument("--threads", type=int, default=16, help="Concurrent sessions")
+    bench_writes.add_argument("--writes", type=int, default=100, help="Checkouts per session")
+    bench_writes.set_defaults(func=cmd_bench_writes)
+
+    serve = commands.add_parser("serve", help="Run several app worker processes behind a local proxy")
+    serve.add_argument("--workers", type=int, default=2)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8501, help="Port the proxy listens on")
+    serve.add_argument("--base-port", type=int, default=8600, help="First worker port")
+    serve.set_defaults(func=cmd_serve)
+
+    check_workers = commands.add_parser("check-workers",
+                                        help="Concurrent checkouts from several processes, then compare their caches")
+    check_workers.add_argument("--workers", type=int, default=2)
+    check_workers.add_argument("--threads", type=int, default=4, help="Concurrent sessions per worker")
+    check_workers.add_argument("--checkouts", type=int, default=50, help="Checkouts per session")
+    check_workers.set_defaults(func=cmd_check_workers)
+
+    purge_keys = commands.add_parser("purge-idempotency-keys",
+                                     help="Delete expired checkout idempotency keys in batches")
+    purge_keys.add_argument("--batch-size", type=int, default=5000)
+    purge_keys.set_defaults(func=cmd_purge_idempotency_keys)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from config import config
+from database.changes import subscribe
+from database.operations import get_connection, get_verified_donors, init_database, \
+    get_donation_analytics, get_monthly_donation_trend, get_donor_ranking
+
+FETCH_SIZE = 200000
+GIFT_SIZE_EDGES = (0, 1000, 2500, 5000, 10000, 25000, 50000, float('inf'))
+
+# name -> dtype of each snapshot column
+COLUMNS = (('donor', np.int32), ('amount', np.float64), ('day', np.int32))
+
+Columns = namedtuple('Columns', 'donor amount day donor_ids version')
+
+
+class DonationSnapshot:
+    """
+    The donations table held as NumPy columns: donor index, amount and epoch day.
+    refresh() appends rows past the rowid high-water mark, so after the first
+    load it only reads new donations. Appending cannot follow a deleted or
+    rewritten donation, so those reset the snapshot through the change feed.
+    """
+
+    def __init__(self, version=0):
+        self.lock = threading.Lock()
+        self.high_water = 0
+        self.size = 0
+        self.version = version
+        self.donor_ids = []
+        self.donor_index = {}
+        self.arrays = {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+
+    def _append(self, donor, amount, day):
+        needed = self.size + len(donor)
+        if needed > len(self.arrays['donor']):
+            capacity = max(needed, 2 * len(self.arrays['donor']), 1024)
+            for name, dtype in COLUMNS:
+                grown = np.empty(capacity, dtype)
+                grown[:self.size] = self.arrays[name][:self.size]
+                self.arrays[name] = grown
+        for name, values in (('donor', donor), ('amount', amount), ('day', day)):
+            self.arrays[name][self.size:needed] = values
+        self.size = needed
+
+    def _donor_codes(self, donor_ids):
+        for donor_id in dict.fromkeys(donor_ids):
+            if donor_id not in self.donor_index:
+                self.donor_index[donor_id] = len(self.donor_ids)
+                self.donor_ids.append(donor_id)
+        return np.fromiter(map(self.donor_index.__getitem__, donor_ids), np.int32, len(donor_ids))
+
+    def refresh(self):
+        """Load donations added since the last refresh; returns how many were added"""
+        with self.lock:
+            conn = get_connection()
+            added = 0
+            try:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute("SELECT id, donor_id, amount, timestamp FROM donations WHERE id > ? ORDER BY id",
+                               (self.high_water,))
+                while True:
+                    batch = cursor.fetchmany(FETCH_SIZE)
+                    if not batch:
+                        break
+                    ids, donor_ids, amounts, timestamps = zip(*batch)
+                    # Truncating to U10 keeps the YYYY-MM-DD prefix, which NumPy parses in bulk
+                    days = np.array(timestamps, dtype='U10').astype('datetime64[D]').astype(np.int32)
+                    self._append(self._donor_codes(donor_ids), np.array(amounts, np.float64), days)
+                    self.high_water = ids[-1]
+                    added += len(batch)
+            finally:
+                conn.close()
+            if added:
+                self.version += 1
+            return added
+
+    def columns(self):
+        """Consistent read-only views of the loaded rows"""
+        with self.lock:
+            views = [self.arrays[name][:self.size] for name, _ in COLUMNS]
+            for view in views:
+                view.flags.writeable = False
+            return Columns(*views, self.donor_ids[:], self.version)
+
+
+_snapshot = DonationSnapshot()
+
+
+def get_snapshot(refresh=True):
+    """Process-wide snapshot columns; the refresh is a single indexed query when nothing changed"""
+    if refresh:
+        _snapshot.refresh()
+    return _snapshot.columns()
+
+
+def refresh_snapshot(event=None):
+    """Analytics refresher for the donation_recorded event pipeline"""
+    _snapshot.refresh()
+
+
+def reset_snapshot():
+    """Drop the loaded rows, e.g. after switching databases"""
+    global _snapshot
+    # Versions keep increasing so caches keyed on them never see an old value again
+    _snapshot = DonationSnapshot(_snapshot.version + 1)
+
+
+subscribe('donations', reset_snapshot)
+
+
+def _named_mask(columns):
+    """Rows from identified donors; like SQL's donor_id != 'anonymous', NULL donor ids are excluded too"""
+    named = np.ones(len(columns.donor), bool)
+    for donor_id in ('anonymous', None):
+        if donor_id in columns.donor_ids:
+            named &= columns.donor != columns.donor_ids.index(donor_id)
+    return named
+
+
+def _months(days):
+    """Months since 1970 for epoch days, via a per-day lookup table instead of calendar maths per row"""
+    first = int(days.min())
+    table = np.arange(first, int(days.max()) + 1).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return table[days - first]
+
+
+def summary(columns):
+    named = _named_mask(columns)
+    amount = columns.amount[named]
+    return {
+        'total_donations': int(len(amount)),
+        'total_amount': float(amount.sum()),
+        'average_donation': float(amount.mean()) if len(amount) else 0,
+        'unique_donors': int(np.count_nonzero(np.bincount(columns.donor[named]))) if len(amount) else 0,
+        'largest_donation': float(amount.max()) if len(amount) else 0,
+    }
+
+
+def monthly_trend(columns, months=12):
+    """Totals for the calendar months up to the latest donation's, newest first, as get_monthly_donation_trend"""
+    if not len(columns.day):
+        return []
+    month = _months(columns.day)
+    last = int(month.max())
+    recent = month > last - months
+    # Months back from the latest; a month without donations keeps a zero row
+    back = last - month[recent]
+    totals = np.bincount(back, weights=columns.amount[recent], minlength=months)
+    counts = np.bincount(back, minlength=months)
+    return [{'month': str(np.datetime64(last - i, 'M')), 'monthly_total': float(totals[i]),
+             'donation_count': int(counts[i])} for i in range(months)]
+
+
+def donor_totals(columns):
+    """(total donated, donation count) arrays indexed by donor"""
+    size = len(columns.donor_ids)
+    return (np.bincount(columns.donor, weights=columns.amount, minlength=size),
+            np.bincount(columns.donor, minlength=size))
+
+
+def top_donors(columns, limit=10):
+    """Verified donors with the highest totals; names come from the donors table"""
+    totals, counts = donor_totals(columns)
+    order = np.argsort(-totals, kind='stable')
+    order = order[counts[order] > 0]
+    ranking = []
+    for start in range(0, len(order), limit * 10):
+        chunk = order[start:start + limit * 10]
+        names = get_verified_donors([columns.donor_ids[i] for i in chunk])
+        for i in chunk:
+            donor_id = columns.donor_ids[i]
+            if donor_id in names:
+                ranking.append({'name': names[donor_id], 'donor_id': donor_id,
+                                'donation_count': int(counts[i]), 'total_donated': float(totals[i])})
+                if len(ranking) == limit:
+                    return ranking
+    # Like the SQL ranking, verified donors without donations fill any remaining places
+    ranked = {donor['donor_id'] for donor in ranking}
+    for donor_id, name in get_verified_donors(limit=limit + len(ranking)).items():
+        if donor_id not in ranked and len(ranking) < limit:
+            ranking.append({'name': name, 'donor_id': donor_id, 'donation_count': 0, 'total_donated': 0.0})
+    return ranking
+
+
+def repeat_donor_rate(columns):
+    """Share of identified donors who have given more than once"""
+    counts = np.bincount(columns.donor[_named_mask(columns)], minlength=len(columns.donor_ids))
+    donors = np.count_nonzero(counts)
+    return float(np.count_nonzero(counts > 1) / donors) if donors else 0.0
+
+
+def rolling_totals(columns, window=30):
+    """(dates, totals) of the amount given in the trailing window of days, one entry per day"""
+    if not len(columns.day):
+        return np.array([], 'datetime64[D]'), np.array([])
+    first = int(columns.day.min())
+    daily = np.bincount(columns.day - first, weights=columns.amount)
+    running = np.concatenate(([0.0], np.cumsum(daily)))
+    totals = running[1:] - running[np.maximum(np.arange(1, len(running)) - window, 0)]
+    return np.arange(first, first + len(daily)).astype('datetime64[D]'), totals
+
+
+def gift_size_distribution(columns, edges=GIFT_SIZE_EDGES):
+    """[(label, count)] of donations per gift-size band"""
+    counts, _ = np.histogram(columns.amount, bins=np.array(edges, dtype=np.float64))
+    labels = [f"{low:,.0f}+" if high == float('inf') else f"{low:,.0f}–{high:,.0f}"
+              for low, high in zip(edges, edges[1:])]
+    return list(zip(labels, counts.tolist()))
+
+
+def cohort_retention(columns):
+    """
+    (cohort months, retention matrix): row c counts the donors whose first gift was
+    in cohort month c and who gave again k months later, at column k.
+    """
+    named = _named_mask(columns)
+    if not named.any():
+        return [], np.zeros((0, 0), np.int64)
+    donor = columns.donor[named]
+    month = _months(columns.day[named])
+    first_month = np.full(len(columns.donor_ids), np.iinfo(np.int64).max)
+    np.minimum.at(first_month, donor, month)
+    offset = month - first_month[donor]
+    span = int(offset.max()) + 1
+    # Each donor counts once per (months since first gift)
+    seen = np.zeros(len(columns.donor_ids) * span, bool)
+    seen[donor.astype(np.int64) * span + offset] = True
+    active_donor, active_offset = np.divmod(np.flatnonzero(seen), span)
+    cohort = first_month[active_donor]
+    oldest = int(cohort.min())
+    cohorts = int(cohort.max()) - oldest + 1
+    matrix = np.bincount((cohort - oldest) * span + active_offset, minlength=cohorts * span).reshape(cohorts, span)
+    months = [str(np.datetime64(oldest + i, 'M')) for i in range(cohorts)]
+    return months, matrix
+
+
+def _timed(function, repeat=3):
+    """(result, best seconds) over a few runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def seed_benchmark_database(rows, donors, database):
+    """Fresh scratch database with generated donors and donations; the snapshot is reset to match"""
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+    reset_snapshot()
+
+    rng = random.Random(rows)
+    conn = get_connection()
+    conn.executemany(
+        "INSERT INTO donors (donor_id, name, nic, phone, email, username, password, is_verified) "
+        "VALUES (?, ?, ?, ?, ?, ?, '!', ?)",
+        ((f"D{i:06d}", f"Donor {i}", f"{i:012d}", "0771234567", f"d{i}@example.com", f"d{i}", rng.random() < 0.9)
+         for i in range(1, donors + 1))
+    )
+    # Generated in SQL; 10M rows through executemany would dominate the run
+    conn.execute(
+        """WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+           INSERT INTO donations (donor_id, amount, timestamp, receipt_number)
+           SELECT printf('D%06d', abs(random()) % ? + 1),
+                  CASE abs(random()) % 6 WHEN 0 THEN 3900.0 WHEN 1 THEN 3500.0 WHEN 2 THEN 7878.0
+                      WHEN 3 THEN 3232.0 WHEN 4 THEN 15600.0 ELSE 500.0 END,
+                  strftime('%Y-%m-%dT%H:%M:%S', '2020-01-01', '+' || (abs(random()) % 150000000) || ' seconds'),
+                  printf('HF%012d', i)
+           FROM n""",
+        (rows, donors)
+    )
+    conn.commit()
+    conn.close()
+    return rng
+
+
+def benchmark_analytics(rows=10000000, donors=100000, database="temp/analytics_bench.db"):
+    """Seed a scratch database, then time the SQL analytics queries against the snapshot"""
+    rng = seed_benchmark_database(rows, donors, database)
+
+    result = {'rows': rows}
+    started = time.perf_counter()
+    _snapshot.refresh()
+    result['snapshot_load_seconds'] = round(time.perf_counter() - started, 2)
+    columns = _snapshot.columns()
+    result['snapshot_memory_mb'] = round(sum(array.nbytes for array in columns[:3]) / 1024 / 1024, 1)
+
+    pairs = (('summary', get_donation_analytics, summary),
+             ('monthly_trend', get_monthly_donation_trend, monthly_trend),
+             ('top_donors', get_donor_ranking, top_donors))
+    for name, sql, vectorized in pairs:
+        expected, sql_seconds = _timed(sql, repeat=1)
+        actual, numpy_seconds = _timed(lambda: vectorized(get_snapshot()))
+        result[f"{name}_sql_seconds"] = round(sql_seconds, 3)
+        result[f"{name}_numpy_seconds"] = round(numpy_seconds, 3)
+        if name == 'summary':
+            result[f"{name}_matches"] = all(abs(expected[key] - actual[key]) < 0.01 * max(1, abs(expected[key]))
+                                            for key in expected)
+        elif name == 'monthly_trend':
+            result[f"{name}_matches"] = [(row['month'], row['donation_count']) for row in expected] == \
+                [(row['month'], row['donation_count']) for row in actual]
+        else:
+            result[f"{name}_matches"] = [round(row['total_donated'], 2) for row in expected] == \
+                [round(row['total_donated'], 2) for row in actual]
+
+    for name, function in (('repeat_donor_rate', repeat_donor_rate), ('rolling_30_day', rolling_totals),
+                           ('gift_sizes', gift_size_distribution), ('cohort_retention', cohort_retention)):
+        result[f"{name}_numpy_seconds"] = round(_timed(lambda: function(columns))[1], 3)
+
+    conn = get_connection()
+    conn.executemany("INSERT INTO donations (donor_id, amount, timestamp) VALUES (?, 3900.0, ?)",
+                     ((f"D{rng.randint(1, donors):06d}", "2024-10-01T10:00:00") for _ in range(1000)))
+    conn.commit()
+    conn.close()
+    started = time.perf_counter()
+    result['incremental_rows'] = _snapshot.refresh()
+    result['incremental_refresh_seconds'] = round(time.perf_counter() - started, 4)
+
+    # A donation months after the rest leaves empty months in the trend; both sides list them as zero
+    conn = get_connection()
+    conn.execute("INSERT INTO donations (donor_id, amount, timestamp) VALUES ('D000001', 3900.0, ?)",
+                 ("2025-06-15T10:00:00",))
+    conn.commit()
+    conn.close()
+    expected = [(row['month'], row['donation_count']) for row in get_monthly_donation_trend()]
+    actual = [(row['month'], row['donation_count']) for row in monthly_trend(get_snapshot())]
+    result['monthly_trend_gaps_matches'] = expected == actual and len(actual) == 12
+
+    # Anonymous gifts and gifts with no donor id are left out of the summary on both sides
+    conn = get_connection()
+    conn.executemany("INSERT INTO donations (donor_id, amount, timestamp) VALUES (?, 500.0, ?)",
+                     [('anonymous', "2024-10-02T10:00:00"), (None, "2024-10-02T10:00:00")])
+    conn.commit()
+    conn.close()
+    # Tight tolerance: one stray row in the counts must show up
+    expected, actual = get_donation_analytics(), summary(get_snapshot())
+    result['summary_unnamed_matches'] = all(abs(expected[key] - actual[key]) < 1e-6 * max(1, abs(expected[key]))
+                                            for key in expected)
+    return result
@@ -0,0 +1,120 @@
+from datetime import date
+
+import streamlit as st
+from database.operations import get_campaign_progress, get_campaigns, get_campaign_attainment, create_campaign, \
+    set_campaign_active, get_inventory
+from utils.instrumentation import instrument
+
+
+def _format(value, target_type):
+    return f"{value:,.0f} tins" if target_type == 'tins' else f"LKR {value:,.2f}"
+
+
+def _months(start, end):
+    """'YYYY-MM' for every month from start to end inclusive"""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def attainment_report(campaign, today=None):
+    """Period-by-period attainment; monthly campaigns list every month so far, including empty ones"""
+    rows = {row['period']: row for row in get_campaign_attainment(campaign['id'])}
+    if campaign['recurrence'] != 'monthly':
+        return list(rows.values()) or [{'period': '', 'achieved': 0, 'attainment': 0.0, 'donations': 0}]
+
+    end = today or date.today()
+    if campaign['ends_on']:
+        end = min(end, date.fromisoformat(campaign['ends_on']))
+    empty = {'achieved': 0, 'attainment': 0.0, 'donations': 0}
+    return [rows.get(period, dict(empty, period=period))
+            for period in _months(date.fromisoformat(campaign['starts_on']), end)]
+
+
+@instrument()
+def display_campaign_progress():
+    """Progress bars for the campaigns running today, read from their counter rows"""
+    for campaign in get_campaign_progress():
+        label = campaign['name']
+        if campaign['product_name']:
+            label += f" ({campaign['product_name']})"
+        if campaign['recurrence'] == 'monthly':
+            label += f" — {date.today().strftime('%B %Y')}"
+        st.progress(
+            min(campaign['attainment'], 1.0),
+            text=f"**{label}:** {_format(campaign['achieved'], campaign['target_type'])} of "
+                 f"{_format(campaign['target'], campaign['target_type'])} ({campaign['attainment']:.0%})"
+        )
+
+
+@instrument()
+def display_campaign_admin():
+    """Create and retire campaigns and review their month-by-month attainment"""
+    st.subheader("🎯 Campaigns")
+    display_campaign_progress()
+
+    with st.expander("➕ New Campaign"):
+        with st.form("campaign_form"):
+            name = st.text_input("Name")
+            col1, col2 = st.columns(2)
+            with col1:
+                target_type = {"Tins": 'tins', "LKR": 'amount'}[st.selectbox("Target in", ["Tins", "LKR"])]
+                target = st.number_input("Target", min_value=1.0, value=1500.0, step=100.0)
+                # Label -> value maps rather than format_func, which AppTest cannot round-trip
+                products = {"All products": None,
+                            **{product['name']: product['product_id'] for product in get_inventory()}}
+                product_id = products[st.selectbox("Product (tins only)", list(products))]
+            with col2:
+                recurrence = {"Once": 'none', "Monthly": 'monthly'}[st.selectbox("Repeats", ["Once", "Monthly"])]
+                starts_on = st.date_input("Starts on", value=date.today())
+                ends_on = st.date_input("Ends on (optional)", value=None)
+            if st.form_submit_button("Create Campaign"):
+                try:
+                    create_campaign(name.strip(), target_type, target, starts_on.isoformat(),
+                                    ends_on.isoformat() if ends_on else None, product_id, recurrence)
+                    st.success(f"Campaign '{name}' created")
+                    st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
+
+    campaigns = get_campaigns()
+    if not campaigns:
+        return
+
+    for campaign in campaigns:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            window = f"{campaign['starts_on']} → {campaign['ends_on'] or 'open'}"
+            scope = f" · {campaign['product_name']}" if campaign['product_name'] else ""
+            status = "" if campaign['active'] else " · ⏸️ inactive"
+            st.write(f"**{campaign['name']}** — {_format(campaign['target'], campaign['target_type'])}"
+                     f"{' per month' if campaign['recurrence'] == 'monthly' else ''}{scope} · {window}{status}")
+        with col2:
+            if st.button("Pause" if campaign['active'] else "Resume", key=f"campaign_toggle_{campaign['id']}",
+                         use_container_width=True):
+                set_campaign_active(campaign['id'], not campaign['active'])
+                st.rerun()
+
+    st.write("**Target attainment history**")
+    names = {}
+    for campaign in campaigns:
+        label = campaign['name'] if campaign['name'] not in names else f"{campaign['name']} (#{campaign['id']})"
+        names[label] = campaign
+    campaign = names[st.selectbox("Campaign", list(names), key="campaign_report")]
+    report = attainment_report(campaign)
+    st.dataframe(
+        [{
+            'Period': row['period'] or "Whole campaign",
+            'Achieved': _format(row['achieved'], campaign['target_type']),
+            'Target': _format(campaign['target'], campaign['target_type']),
+            'Attainment': f"{row['attainment']:.0%}",
+            'Donations': row['donations'],
+        } for row in reversed(report)],
+        use_container_width=True,
+        hide_index=True
+    )
+    if campaign['recurrence'] == 'monthly' and len(report) > 1:
+        st.bar_chart({'month': [row['period'] for row in report],
+                      'attainment': [round(row['attainment'] * 100, 1) for row in report]},
+                     x='month', y='attainment')
@@ -0,0 +1,220 @@
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import streamlit as st
+
+from database.operations import get_donor_names, get_connection
+from services.analytics_snapshot import get_snapshot, cohort_retention, seed_benchmark_database, _named_mask, \
+    _months
+from utils.instrumentation import instrument
+
+LAPSED_DAYS = 365
+LAPSED_LIMIT = 50
+MAX_LIFETIME_YEARS = 10
+RETENTION_MONTHS = (1, 3, 6, 12)
+
+_cache = {'key': None, 'report': None}
+_cache_lock = threading.Lock()
+
+
+def donor_aggregates(columns):
+    """Per-donor first day, last day, total and gift count from one sort by donor and reduceat"""
+    named = _named_mask(columns)
+    order = np.argsort(columns.donor[named])
+    donor = columns.donor[named][order]
+    day = columns.day[named][order]
+    amount = columns.amount[named][order]
+    starts = np.flatnonzero(np.concatenate(([True], donor[1:] != donor[:-1])))
+    return {
+        'donor': donor[starts],
+        'first': np.minimum.reduceat(day, starts),
+        'last': np.maximum.reduceat(day, starts),
+        'total': np.add.reduceat(amount, starts),
+        'gifts': np.diff(np.append(starts, len(donor))),
+    }
+
+
+def _active(columns, named, start, end):
+    """Boolean per donor: gave at least once on days [start, end)"""
+    rows = named & (columns.day >= start) & (columns.day < end)
+    return np.bincount(columns.donor[rows], minlength=len(columns.donor_ids)) > 0
+
+
+def compute_cohort_report(columns, as_of=None, lapsed_days=LAPSED_DAYS, lapsed_limit=LAPSED_LIMIT):
+    """
+    Cohorts by first-donation month with retention, average gift and lifetime value.
+
+    Annual retention is the share of donors who gave in the year before last and
+    gave again in the last year. Projected lifetime value adds the expected future
+    giving to the value per donor so far: each cohort's share of still-active donors
+    times the annual value per active donor, summed over later years as a geometric
+    series in the retention rate (capped at MAX_LIFETIME_YEARS).
+    """
+    as_of = ((as_of or date.today()) - date(1970, 1, 1)).days
+    named = _named_mask(columns)
+    if not named.any():
+        return None
+
+    donors = donor_aggregates(columns)
+    months, matrix = cohort_retention(columns)
+    # The first cohort month, as in cohort_retention: anonymous gifts start no cohort
+    first_months = _months(donors['first'])
+    oldest = int(first_months.min())
+    cohort = first_months - oldest
+    sizes = matrix[:, 0]
+    # Months in which nobody gave for the first time have no cohort
+    divisor = np.maximum(sizes, 1)
+    gifts = np.bincount(cohort, weights=donors['gifts'], minlength=len(months))
+    totals = np.bincount(cohort, weights=donors['total'], minlength=len(months))
+
+    previous_year = _active(columns, named, as_of - 730, as_of - 365)
+    last_year = _active(columns, named, as_of - 365, as_of + 1)
+    retained = np.count_nonzero(previous_year & last_year)
+    annual_retention = retained / np.count_nonzero(previous_year) if previous_year.any() else 0.0
+    annual_value = columns.amount[named & (columns.day > as_of - 365) & (columns.day <= as_of)].sum()
+    annual_value = annual_value / np.count_nonzero(last_year) if last_year.any() else 0.0
+    future_years = min(annual_retention / (1 - annual_retention), MAX_LIFETIME_YEARS - 1) \
+        if annual_retention < 1 else MAX_LIFETIME_YEARS - 1
+    active_share = np.bincount(cohort, weights=last_year[donors['donor']], minlength=len(months)) / divisor
+
+    # Months each cohort has had to come back; the current, unfinished month is left out
+    as_of_month = _months(np.array([as_of]))[0] - oldest
+    elapsed = as_of_month - np.arange(len(months))
+    span = matrix.shape[1]
+    eligible = (elapsed[:, None] > np.arange(span)[None, :]) | (np.arange(span) == 0)
+    curve = (matrix * eligible).sum(axis=0) / np.maximum((sizes[:, None] * eligible).sum(axis=0), 1)
+
+    value_per_donor = totals / divisor
+    cohorts = []
+    for i, month in enumerate(months):
+        if not sizes[i]:
+            continue
+        cohorts.append({
+            'month': month,
+            'donors': int(sizes[i]),
+            'gifts': int(gifts[i]),
+            'average_gift': float(totals[i] / gifts[i]),
+            'value_per_donor': float(value_per_donor[i]),
+            'projected_ltv': float(value_per_donor[i] + active_share[i] * annual_value * future_years),
+            'retention': {k: (float(matrix[i, k] / sizes[i]) if k < span else 0.0) if k < elapsed[i] else None
+                          for k in RETENTION_MONTHS},
+        })
+
+    lapsed = np.flatnonzero(donors['last'] < as_of - lapsed_days)
+    top = lapsed[np.argsort(-donors['total'][lapsed], kind='stable')[:lapsed_limit]]
+    names = get_donor_names([columns.donor_ids[donors['donor'][i]] for i in top]) if len(top) else {}
+    lapsed_donors = []
+    for i in top:
+        donor_id = columns.donor_ids[donors['donor'][i]]
+        lapsed_donors.append({
+            'donor_id': donor_id,
+            'name': names.get(donor_id, donor_id),
+            'last_gift': str(np.datetime64(int(donors['last'][i]), 'D')),
+            'gifts': int(donors['gifts'][i]),
+            'total_donated': float(donors['total'][i]),
+        })
+
+    return {
+        'as_of': str(np.datetime64(as_of, 'D')),
+        'cohorts': cohorts,
+        'retention_curve': curve.tolist(),
+        'annual_retention': float(annual_retention),
+        'annual_value_per_donor': float(annual_value),
+        'projected_ltv': float(annual_value * (1 + future_years)),
+        'lapsed_count': int(len(lapsed)),
+        'lapsed_donors': lapsed_donors,
+    }
+
+
+def get_cohort_report(as_of=None):
+    """Cohort report for the current snapshot, recomputed only when the data version or day changes"""
+    columns = get_snapshot()
+    key = (columns.version, as_of or date.today())
+    with _cache_lock:
+        if _cache['key'] != key:
+            _cache['report'] = compute_cohort_report(columns, as_of)
+            _cache['key'] = key
+        return _cache['report']
+
+
+def _percent(value):
+    return "–" if value is None else f"{value:.0%}"
+
+
+@instrument()
+def display_cohort_analytics():
+    """Cohort retention, lifetime value and lapsed donors for the admin analytics tab"""
+    report = get_cohort_report()
+    st.subheader("👥 Donor Cohorts & Lifetime Value")
+    if not report:
+        st.info("No donations recorded yet")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Annual Retention", _percent(report['annual_retention']))
+    with col2:
+        st.metric("Annual Value per Donor", f"LKR {report['annual_value_per_donor']:,.2f}")
+    with col3:
+        st.metric("Projected Lifetime Value", f"LKR {report['projected_ltv']:,.2f}")
+    with col4:
+        st.metric("Lapsed Donors", report['lapsed_count'])
+
+    st.write("**Retention by months since first donation**")
+    curve = report['retention_curve'][:25]
+    st.line_chart({'month': list(range(len(curve))), 'retention': curve}, x='month', y='retention')
+
+    st.write("**Cohorts by first-donation month (latest 24)**")
+    st.dataframe(
+        [{
+            'Cohort': cohort['month'],
+            'Donors': cohort['donors'],
+            'Avg Gift (LKR)': round(cohort['average_gift'], 2),
+            'Value/Donor (LKR)': round(cohort['value_per_donor'], 2),
+            'Projected LTV (LKR)': round(cohort['projected_ltv'], 2),
+            **{f"M{k}": _percent(cohort['retention'][k]) for k in RETENTION_MONTHS},
+        } for cohort in reversed(report['cohorts'][-24:])],
+        use_container_width=True,
+        hide_index=True
+    )
+
+    with st.expander(f"Lapsed donors — no gift for {LAPSED_DAYS} days (top {LAPSED_LIMIT} by total)"):
+        for donor in report['lapsed_donors']:
+            st.write(
+                f"**{donor['name']}** ({donor['donor_id']}) - LKR {donor['total_donated']:,.2f} "
+                f"over {donor['gifts']} donations, last on {donor['last_gift']}"
+            )
+
+
+def benchmark_cohorts(rows=5000000, donors=100000, database="temp/cohort_bench.db"):
+    """Time the cohort report on a generated history, cold and then from the cache"""
+    seed_benchmark_database(rows, donors, database)
+    result = {'rows': rows, 'donors': donors}
+
+    started = time.perf_counter()
+    columns = get_snapshot()
+    result['snapshot_load_seconds'] = round(time.perf_counter() - started, 2)
+
+    as_of = np.datetime64(int(columns.day.max()), 'D').item()
+    started = time.perf_counter()
+    report = get_cohort_report(as_of)
+    result['report_seconds'] = round(time.perf_counter() - started, 3)
+    started = time.perf_counter()
+    get_cohort_report(as_of)
+    result['cached_report_seconds'] = round(time.perf_counter() - started, 4)
+
+    result['cohorts'] = len(report['cohorts'])
+    result['annual_retention'] = round(report['annual_retention'], 3)
+    result['projected_ltv'] = round(report['projected_ltv'], 2)
+    result['lapsed_count'] = report['lapsed_count']
+
+    # Anonymous gifts, one before every named gift, must not shift or change any cohort
+    conn = get_connection()
+    conn.executemany("INSERT INTO donations (donor_id, amount, timestamp) VALUES ('anonymous', 500.0, ?)",
+                     (("2019-06-01T10:00:00",), ("2022-03-15T10:00:00",)))
+    conn.commit()
+    conn.close()
+    result['anonymous_matches'] = compute_cohort_report(get_snapshot(), as_of) == report
+    return result
@@ -0,0 +1,39 @@
+import streamlit as st
+from datetime import datetime
+from utils import instrumentation
+
+
+def display_diagnostics_panel():
+    """Display per-section performance statistics (admin only)"""
+    st.subheader("🩺 Performance Diagnostics")
+
+    stats = instrumentation.get_section_stats()
+    if stats:
+        st.dataframe(stats, use_container_width=True, hide_index=True)
+    else:
+        st.info("No samples recorded yet")
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.download_button(
+            "⬇️ Export JSON Lines",
+            data=instrumentation.export_jsonl(),
+            file_name=f"husma_perf_{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl",
+            mime="application/x-ndjson",
+            use_container_width=True
+        )
+
+    with col2:
+        if st.button("🔬 Profile Next Rerun", use_container_width=True):
+            st.session_state.profile_next_rerun = True
+            st.success("The next rerun of this session will be profiled")
+
+    with col3:
+        if st.button("🧹 Reset Samples", use_container_width=True):
+            instrumentation.reset()
+            st.rerun()
+
+    if st.session_state.get('last_profile'):
+        st.markdown("#### Top Functions by Cumulative Time")
+        st.dataframe(st.session_state.last_profile, use_container_width=True, hide_index=True)
@@ -0,0 +1,73 @@
+import streamlit as st
+from database.operations import get_donor_summary, get_donations_page
+from utils.instrumentation import instrument
+from utils.pdf_generator import is_receipt_ready
+
+PAGE_SIZE = 10
+
+
+@instrument()
+def display_donor_summary(donor_id):
+    """Lifetime and yearly totals from the per-donor summary, however long the history"""
+    summary = get_donor_summary(donor_id)
+    if not summary['donation_count']:
+        return summary
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Donated", f"LKR {summary['total_donated']:,.2f}")
+    with col2:
+        st.metric("Donations", summary['donation_count'])
+    with col3:
+        st.metric("Donating Since", summary['first_donation'][:10])
+    st.caption(f"Last donation on {summary['last_donation'][:10]}")
+
+    if len(summary['yearly']) > 1:
+        st.bar_chart({'year': [str(row['year']) for row in summary['yearly']],
+                      'total': [row['total_donated'] for row in summary['yearly']]}, x='year', y='total')
+    return summary
+
+
+@instrument()
+def display_donation_history(donor_id):
+    """One page of donations at a time, walked with keyset cursors kept in the session"""
+    state_key = f"history_cursors_{donor_id}"
+    cursors = st.session_state.setdefault(state_key, [None])
+    donations = get_donations_page(donor_id, cursors[-1], PAGE_SIZE + 1)
+    has_older = len(donations) > PAGE_SIZE
+    donations = donations[:PAGE_SIZE]
+
+    if not donations:
+        st.info("No donations yet. Make your first donation today!")
+        return
+
+    for donation in donations:
+        with st.container():
+            col1, col2, col3 = st.columns([2, 1, 1])
+            with col1:
+                st.write(f"**Date:** {donation['timestamp'][:10]}")
+            with col2:
+                st.write(f"**Amount:** LKR {donation['amount']:,.2f}")
+            with col3:
+                if donation['payment_slip']:
+                    st.write("📎 Slip Attached")
+                if is_receipt_ready(donation['receipt_path']):
+                    with open(donation['receipt_path'], 'rb') as f:
+                        st.download_button(
+                            "📄 Receipt",
+                            data=f.read(),
+                            file_name=f"receipt_{donation['receipt_number'] or donation['id']}.pdf",
+                            mime="application/pdf",
+                            key=f"history_receipt_{donation['id']}"
+                        )
+
+    # Callbacks move the cursor before the rerun, so a page is fetched once per click
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Newer", disabled=len(cursors) == 1, use_container_width=True, key="history_newer",
+                  on_click=cursors.pop)
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        st.button("Older ▶", disabled=not has_older, use_container_width=True, key="history_older",
+                  on_click=cursors.append, args=((donations[-1]['timestamp'], donations[-1]['id']),))
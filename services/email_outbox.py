@@ -0,0 +1,132 @@
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from config import config
+from services.outbox_worker import OutboxWorker
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def default_smtp_factory():
+    """Open an SMTP connection from the configured settings"""
+    smtp = smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT, timeout=30)
+    if config.SMTP_USE_TLS:
+        smtp.starttls()
+    if config.SMTP_USERNAME:
+        smtp.login(config.SMTP_USERNAME, config.SMTP_PASSWORD)
+    return smtp
+
+
+def build_message(row, sender):
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = row['recipient']
+    message['Subject'] = row['subject']
+    message['Message-ID'] = f"<{row['idempotency_key'].replace(' ', '_')}@husmafoundation>"
+    message.set_content(row['body'])
+    if row['html_body']:
+        message.add_alternative(row['html_body'], subtype='html')
+    return message
+
+
+class EmailDeliveryWorker(OutboxWorker):
+    """Delivers queued emails in batches over one reused SMTP connection"""
+
+    table = "email_outbox"
+    name = "email"
+
+    def __init__(self, smtp_factory=default_smtp_factory, sender=None, batch_size=None, poll_interval=None,
+                 max_attempts=None, backoff_base=None, backoff_max=None):
+        super().__init__(
+            batch_size or config.EMAIL_BATCH_SIZE,
+            config.EMAIL_POLL_INTERVAL if poll_interval is None else poll_interval,
+            max_attempts or config.EMAIL_MAX_ATTEMPTS,
+            config.EMAIL_BACKOFF_BASE if backoff_base is None else backoff_base,
+            config.EMAIL_BACKOFF_MAX if backoff_max is None else backoff_max,
+        )
+        self.smtp_factory = smtp_factory
+        self.sender = sender or config.EMAIL_SENDER
+        self.smtp = None
+
+    def _close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+    def idle(self):
+        self._close()
+
+    def deliver(self, batch):
+        sent_ids, failures, released_ids = [], [], []
+        for index, row in enumerate(batch):
+            try:
+                if self.smtp is None:
+                    self.smtp = self.smtp_factory()
+                self.smtp.send_message(build_message(row, self.sender))
+                sent_ids.append(row['id'])
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                # The message was rejected; the connection is still usable
+                failures.append((row['id'], row['attempts'], str(e)))
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection problem: fail this message and put the rest back untouched
+                self._close()
+                failures.append((row['id'], row['attempts'], str(e)))
+                released_ids.extend(r['id'] for r in batch[index + 1:])
+                break
+        return sent_ids, failures, released_ids
+
+
+def start_email_worker():
+    """Start the background email delivery worker once per process"""
+    global _worker
+    with _worker_lock:
+        if _worker is None and config.SMTP_SERVER:
+            _worker = EmailDeliveryWorker().start()
+    return _worker
+
+
+def benchmark_delivery(messages=1000, batch_size=None, database="temp/email_bench.db"):
+    """Queue messages in a scratch database and deliver them to a local SMTP sink"""
+    from database.operations import init_database, enqueue_outbox, count_outbox
+    from utils.smtp_sink import SMTPSink
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+
+    for i in range(messages):
+        enqueue_outbox("email_outbox", {
+            'idempotency_key': f"bench:{i}",
+            'recipient': f"donor{i}@example.com",
+            'subject': "Donation Receipt - Husma Foundation",
+            'body': "Thank you for your generous donation!\n" * 10,
+            'html_body': None,
+        })
+
+    sink = SMTPSink().start()
+    worker = EmailDeliveryWorker(smtp_factory=lambda: smtplib.SMTP("127.0.0.1", sink.port, timeout=10),
+                                 batch_size=batch_size, poll_interval=0)
+    started = time.perf_counter()
+    while worker.run_once():
+        pass
+    elapsed = time.perf_counter() - started
+    sink.stop()
+
+    return {
+        'messages': messages,
+        'delivered': sink.messages,
+        'smtp_connections': sink.connections,
+        'outstanding': count_outbox("email_outbox"),
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(sink.messages / elapsed, 1) if elapsed else 0.0,
+    }
@@ -1,83 +1,54 @@
-import streamlit as st
+from datetime import datetime
+from database.operations import enqueue_outbox
+from services.template_service import render_email
+from utils.instrumentation import instrument
 
 
-def send_email(to_email, subject, body, is_html=False):
+@instrument()
+def send_email(to_email, subject, body, html_body=None, idempotency_key=None):
     """
-    Simulate email sending - shows email in Streamlit
-    In production, replace with real email service
+    Queue an email in the outbox; the delivery worker sends it over SMTP.
+    Returns False if a message with the same idempotency key was already queued.
     """
-    st.info(f"""
-    **📧 Email Notification**
+    return enqueue_outbox("email_outbox", {
+        'idempotency_key': idempotency_key or f"{to_email}:{subject}:{datetime.now().isoformat()}",
+        'recipient': to_email,
+        'subject': subject,
+        'body': body,
+        'html_body': html_body,
+    })
 
-    **To:** {to_email}
-    **Subject:** {subject}
 
-    {body}
-
-    *In production, this would be sent via SMTP*
-    """)
-    return True
-
-
-def send_verification_email(email, donor_name):
+@instrument()
+def send_verification_email(email, donor_name, idempotency_key=None):
     """Send email verification"""
     subject = "Welcome to Husma Foundation - Verify Your Email"
-    body = f"""
-    Dear {donor_name},
-
-    Thank you for registering with Husma Foundation!
-
-    Your account has been successfully created and verified.
+    html_body, body = render_email("verification_email", {'donor_name': donor_name})
 
-    You can now login and start making donations to support children fighting cancer.
-
-    Best regards,
-    Husma Foundation Team
-    """
-
-    return send_email(email, subject, body)
+    return send_email(email, subject, body, html_body, idempotency_key=idempotency_key or f"verification:{email}")
 
 
-def send_password_reset_email(email, donor_name):
+@instrument()
+def send_password_reset_email(email, donor_name, idempotency_key=None):
     """Send password reset instructions"""
     subject = "Password Reset Instructions - Husma Foundation"
-    body = f"""
-    Dear {donor_name},
-
-    We received a request to reset your password.
-
-    Please contact our support team at 0777348822 for assistance with password reset.
+    html_body, body = render_email("password_reset", {'donor_name': donor_name})
 
-    Best regards,
-    Husma Foundation Team
-    """
-
-    return send_email(email, subject, body)
+    # One reset email per address per hour
+    key = idempotency_key or f"password_reset:{email}:{datetime.now().strftime('%Y%m%d%H')}"
+    return send_email(email, subject, body, html_body, idempotency_key=key)
 
 
-def send_donation_receipt_email(email, donor_name, donation_data):
+@instrument()
+def send_donation_receipt_email(email, donor_name, donation_data, idempotency_key=None):
     """Send donation receipt via email"""
     subject = "Donation Receipt - Husma Foundation"
-
-    body = f"""
-    Dear {donor_name},
-
-    Thank you for your generous donation of LKR {donation_data['amount']:,.2f}!
-
-    **Donation Details:**
-    - Amount: LKR {donation_data['amount']:,.2f}
-    - Date: {donation_data['date']}
-    - Receipt Number: {donation_data['receipt_number']}
-
-    Your support helps provide nutritional supplements to children fighting cancer at Apeksha Hospital.
-
-    **Bank Details for Future Donations:**
-    Account: Husma Foundation
-    Number: 106914030823
-    Bank: Sampath Bank, Homagama
-
-    Best regards,
-    Husma Foundation Team
-    """
-
-    return send_email(email, subject, body)
\ No newline at end of file
+    html_body, body = render_email("donation_receipt", {
+        'donor_name': donor_name,
+        'amount': donation_data['amount'],
+        'date': donation_data['date'],
+        'receipt_number': donation_data['receipt_number'],
+    })
+
+    key = idempotency_key or f"receipt:{donation_data['receipt_number']}"
+    return send_email(email, subject, body, html_body, idempotency_key=key)
@@ -0,0 +1,219 @@
+import os
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from config import config
+from database.operations import record_checkout, get_event_payloads, set_donation_receipt, count_outbox
+from services.outbox_worker import OutboxWorker
+from utils.helpers import generate_receipt_number
+from utils.pdf_generator import generate_donation_receipt, receipt_path_for_donation
+
+_consumers = []
+_consumers_lock = threading.Lock()
+_analytics_refreshers = []
+
+
+def register_analytics_refresher(refresh):
+    """Run refresh(event) after every recorded donation (e.g. to update a cached snapshot)"""
+    if refresh not in _analytics_refreshers:
+        _analytics_refreshers.append(refresh)
+
+
+def _receipt_data(event):
+    return {'amount': event['amount'], 'date': event['date'], 'receipt_number': event['receipt_number']}
+
+
+def deliver_receipt(event):
+    generate_donation_receipt(
+        _receipt_data(event),
+        event['donor'],
+        on_ready=lambda path: set_donation_receipt(event['donation_id'], path),
+        wait=True
+    )
+
+
+def deliver_email(event):
+    from services.email_service import send_donation_receipt_email
+
+    if event['donor'].get('email'):
+        send_donation_receipt_email(
+            event['donor']['email'],
+            event['donor']['name'],
+            dict(_receipt_data(event), date=event['date'][:10])
+        )
+
+
+def deliver_sms(event):
+    from services.sms_service import send_donation_confirmation_sms
+
+    if event['donor'].get('phone'):
+        # One confirmation per donation: repeat donations of the same amount each get theirs, retries do not
+        send_donation_confirmation_sms(event['donor']['phone'], event['donor']['name'], event['amount'],
+                                       idempotency_key=f"receipt:{event['receipt_number']}")
+
+
+def refresh_analytics(event):
+    for refresh in _analytics_refreshers:
+        refresh(event)
+
+
+# consumer -> (handler, max_attempts, backoff_base, backoff_max)
+CONSUMERS = {
+    'receipt': (deliver_receipt, 5, 10, 600),
+    'email': (deliver_email, 8, 5, 900),
+    'sms': (deliver_sms, 8, 5, 900),
+    'analytics': (refresh_analytics, 3, 30, 300),
+}
+
+
+class EventConsumer(OutboxWorker):
+    """Handles one consumer's deliveries of donation_recorded events, each with its own retry policy"""
+
+    table = "event_deliveries"
+
+    def __init__(self, consumer, handler=None, batch_size=None, poll_interval=None, max_attempts=None,
+                 backoff_base=None, backoff_max=None):
+        default_handler, default_attempts, default_base, default_max = CONSUMERS[consumer]
+        super().__init__(
+            batch_size or config.EVENT_BATCH_SIZE,
+            config.EVENT_POLL_INTERVAL if poll_interval is None else poll_interval,
+            max_attempts or default_attempts,
+            default_base if backoff_base is None else backoff_base,
+            default_max if backoff_max is None else backoff_max,
+        )
+        self.name = f"event_{consumer}"
+        self.filters = {'consumer': consumer}
+        self.handler = handler or default_handler
+
+    def deliver(self, batch):
+        events = get_event_payloads([row['event_id'] for row in batch])
+        sent_ids, failures = [], []
+        for row in batch:
+            try:
+                self.handler(events[row['event_id']])
+                sent_ids.append(row['id'])
+            except Exception as e:
+                failures.append((row['id'], row['attempts'], str(e)))
+        return sent_ids, failures, []
+
+
+def start_event_consumers():
+    """Start one background consumer per entry in CONSUMERS, once per process"""
+    with _consumers_lock:
+        if not _consumers:
+            _consumers.extend(EventConsumer(consumer).start() for consumer in CONSUMERS)
+    return _consumers
+
+
+def record_donation(donor, amount, cart, payment_slip=None, idempotency_key=None):
+    """
+    Commit a checkout and return (donation_id, receipt_number, receipt_path).
+    Receipts, notifications and analytics are left to the event consumers, so the
+    caller only waits for the database commit. Repeating a checkout's
+    idempotency_key returns the first attempt's donation and receipt.
+    """
+    receipt_number = generate_receipt_number()
+    date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    donor = {key: donor.get(key) for key in ('donor_id', 'name', 'nic', 'phone', 'email')}
+    payload = {'donor': donor, 'amount': amount, 'date': date, 'receipt_number': receipt_number}
+
+    recorded = record_checkout(
+        donor['donor_id'],
+        amount,
+        [(item['product_id'], item['quantity']) for item in cart if item['quantity'] > 0],
+        payload,
+        list(CONSUMERS),
+        payment_slip,
+        receipt_number,
+        idempotency_key
+    )
+    receipt_path = receipt_path_for_donation(_receipt_data(recorded), recorded['donor'])
+    return recorded['donation_id'], recorded['receipt_number'], receipt_path
+
+
+def benchmark_checkout(checkouts=200, consumer_delay=0.05, database="temp/checkout_bench.db"):
+    """Time checkouts while deliberately slow consumers drain the events in the background"""
+    from database.operations import init_database, create_donor
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+    donor = {'donor_id': "D001", 'name': "Bench Donor", 'nic': "199012345678", 'phone': "0771234567",
+             'email': "bench@example.com"}
+    create_donor(tuple(donor.values()) + ("bench", "!"))
+    cart = [{'product_id': 1, 'quantity': 1}]
+
+    def slow(event):
+        time.sleep(consumer_delay)
+
+    consumers = [EventConsumer(consumer, handler=slow, poll_interval=0.01).start() for consumer in CONSUMERS]
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(checkouts):
+        checkout_started = time.perf_counter()
+        record_donation(donor, 3900.0, cart)
+        latencies.append(time.perf_counter() - checkout_started)
+    checkouts_done = time.perf_counter() - started
+
+    while count_outbox("event_deliveries"):
+        time.sleep(0.05)
+    drained = time.perf_counter() - started
+    for consumer in consumers:
+        consumer.stop()
+
+    latencies.sort()
+    return {
+        'checkouts': checkouts,
+        'consumer_delay_ms': consumer_delay * 1000,
+        'checkout_p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'checkout_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        'sequential_estimate_ms': round((statistics.median(latencies) + consumer_delay * len(CONSUMERS)) * 1000, 2),
+        'checkouts_seconds': round(checkouts_done, 3),
+        'drained_seconds': round(drained, 3),
+    }
+
+
+def check_pipeline(checkouts=3, timeout=60, database="temp/pipeline_check.db"):
+    """Checkouts through the real consumers; every delivery must reach 'sent' and every receipt its file"""
+    from database.operations import init_database, create_donor, execute_query
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+    donor = {'donor_id': "D001", 'name': "Check Donor", 'nic': "199012345678", 'phone': "0771234567",
+             'email': "check@example.com"}
+    create_donor(tuple(donor.values()) + ("check", "!"))
+
+    consumers = [EventConsumer(consumer, poll_interval=0.05).start() for consumer in CONSUMERS]
+    started = time.perf_counter()
+    receipt_paths = [record_donation(donor, 3900.0 + i, [{'product_id': 1, 'quantity': 1}])[2]
+                     for i in range(checkouts)]
+    while count_outbox("event_deliveries") and time.perf_counter() - started < timeout:
+        time.sleep(0.05)
+    seconds = time.perf_counter() - started
+    for consumer in consumers:
+        consumer.stop(timeout=1)
+
+    rows = execute_query("SELECT consumer, status, COUNT(*) AS n FROM event_deliveries GROUP BY consumer, status",
+                         fetchall=True)
+    result = {'checkouts': checkouts, 'seconds': round(seconds, 3)}
+    for consumer in CONSUMERS:
+        statuses = {row['status']: row['n'] for row in rows if row['consumer'] == consumer}
+        result[f"{consumer}_sent"] = statuses.pop('sent', 0)
+        result[f"{consumer}_not_sent"] = sum(statuses.values())
+    result['receipts_ready'] = sum(os.path.exists(path) for path in receipt_paths)
+    result['receipts_recorded'] = execute_query(
+        "SELECT COUNT(*) AS n FROM donations WHERE receipt_path IS NOT NULL", fetch=True
+    )['n']
+    result['complete'] = all(result[f"{consumer}_sent"] == checkouts for consumer in CONSUMERS) and \
+        result['receipts_ready'] == result['receipts_recorded'] == checkouts
+    return result
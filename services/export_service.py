@@ -0,0 +1,255 @@
+import csv
+import gzip
+import json
+import os
+import random
+import struct
+import time
+import tracemalloc
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+from config import config
+from database.operations import get_connection, init_database
+
+FETCH_SIZE = 5000
+ROW_GROUP_SIZE = 65536
+
+COLUMNAR_MAGIC = b"HCOL1"
+COLUMNAR_TYPES = {'int': 'q', 'float': 'd'}
+
+# dataset -> (table, [(column, type)], date column, donor column)
+DATASETS = {
+    'donations': ("donations",
+                  [('id', 'int'), ('donor_id', 'str'), ('amount', 'float'), ('timestamp', 'str'),
+                   ('receipt_number', 'str'), ('verification_status', 'str')],
+                  "timestamp", "donor_id"),
+    'issues': ("issues",
+               [('id', 'int'), ('child_id', 'int'), ('date', 'str'), ('milk_type', 'str'), ('quantity', 'int')],
+               "date", None),
+    'children': ("children",
+                 [('id', 'int'), ('name', 'str'), ('birthday', 'str'), ('guardian', 'str'), ('phone', 'str'),
+                  ('milk_type', 'str'), ('last_issue', 'str'), ('created_at', 'str')],
+                 "created_at", None),
+}
+
+
+def iter_batches(dataset, start=None, end=None, donor_id=None, fetch_size=FETCH_SIZE):
+    """Stream a dataset in id order as lists of row tuples; end is exclusive"""
+    table, columns, date_column, donor_column = DATASETS[dataset]
+    conditions, params = [], []
+    if start:
+        conditions.append(f"{date_column} >= ?")
+        params.append(start)
+    if end:
+        conditions.append(f"{date_column} < ?")
+        params.append(end)
+    if donor_id:
+        if donor_column is None:
+            raise ValueError(f"{dataset} cannot be filtered by donor")
+        conditions.append(f"{donor_column} = ?")
+        params.append(donor_id)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"SELECT {', '.join(name for name, _ in columns)} FROM {table}{where} ORDER BY id",
+                       params)
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                return
+            yield batch
+    finally:
+        conn.close()
+
+
+def write_csv_gz(path, columns, batches):
+    rows = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=1) as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        for batch in batches:
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+
+def _string_buffers(strings):
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = array('I', [0])
+    position = 0
+    for item in encoded:
+        position += len(item)
+        offsets.append(position)
+    return [offsets.tobytes(), b"".join(encoded)]
+
+
+def _encode_column(values, column_type):
+    """Encode one column chunk as (encoding, buffers)
+
+    Numbers become a typed array; strings become offsets plus UTF-8 data, or a
+    dictionary plus integer codes when values repeat (donor ids, statuses).
+    Every chunk starts with a validity byte per row.
+    """
+    validity = bytes(value is not None for value in values)
+    if column_type in COLUMNAR_TYPES:
+        default = 0 if column_type == 'int' else float('nan')
+        data = array(COLUMNAR_TYPES[column_type], [default if value is None else value for value in values])
+        return "plain", [validity, data.tobytes()]
+    values = ["" if value is None else value for value in values]
+    dictionary = dict.fromkeys(values)
+    if len(dictionary) <= len(values) // 2:
+        codes = {value: code for code, value in enumerate(dictionary)}
+        return "dictionary", [validity, array('I', map(codes.__getitem__, values)).tobytes()] + \
+            _string_buffers(dictionary)
+    return "plain", [validity] + _string_buffers(values)
+
+
+def write_columnar(path, columns, batches, row_group_size=ROW_GROUP_SIZE):
+    """Write row groups of per-column typed arrays followed by a JSON footer index
+
+    Layout: magic, row groups, footer JSON, footer length (8 bytes), magic.
+    Each buffer is zlib-compressed, and the footer records every column chunk's
+    encoding and buffer offsets so readers can seek straight to the columns they need.
+    """
+    row_groups = []
+    rows = 0
+    with open(path, "wb") as f:
+        f.write(COLUMNAR_MAGIC)
+
+        def flush(group):
+            chunks = []
+            for index, column in enumerate(zip(*group)):
+                encoding, buffers = _encode_column(column, columns[index][1])
+                locations = []
+                for buffer in buffers:
+                    buffer = zlib.compress(buffer, 1)
+                    locations.append([f.tell(), len(buffer)])
+                    f.write(buffer)
+                chunks.append({'encoding': encoding, 'buffers': locations})
+            row_groups.append({'rows': len(group), 'columns': chunks})
+
+        group = []
+        for batch in batches:
+            group.extend(batch)
+            rows += len(batch)
+            while len(group) >= row_group_size:
+                flush(group[:row_group_size])
+                group = group[row_group_size:]
+        if group:
+            flush(group)
+
+        footer = json.dumps({'schema': columns, 'rows': rows, 'row_groups': row_groups}).encode("utf-8")
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(COLUMNAR_MAGIC)
+    return rows
+
+
+def read_columnar_footer(f):
+    f.seek(-(8 + len(COLUMNAR_MAGIC)), os.SEEK_END)
+    footer_length = struct.unpack("<Q", f.read(8))[0]
+    if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar export file")
+    f.seek(-(8 + len(COLUMNAR_MAGIC) + footer_length), os.SEEK_END)
+    return json.loads(f.read(footer_length))
+
+
+def read_columnar(path, columns=None):
+    """Yield each row group as {column: list}, reading only the requested columns"""
+    with open(path, "rb") as f:
+        footer = read_columnar_footer(f)
+        schema = [tuple(column) for column in footer['schema']]
+        wanted = [(index, name, column_type) for index, (name, column_type) in enumerate(schema)
+                  if columns is None or name in columns]
+
+        def read(location):
+            f.seek(location[0])
+            return zlib.decompress(f.read(location[1]))
+
+        def strings(offsets_buffer, data_buffer):
+            offsets = array('I')
+            offsets.frombytes(read(offsets_buffer))
+            data = read(data_buffer)
+            return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+        for group in footer['row_groups']:
+            result = {}
+            for index, name, column_type in wanted:
+                chunk = group['columns'][index]
+                buffers = chunk['buffers']
+                validity = read(buffers[0])
+                if column_type in COLUMNAR_TYPES:
+                    data = array(COLUMNAR_TYPES[column_type])
+                    data.frombytes(read(buffers[1]))
+                    values = data.tolist()
+                elif chunk['encoding'] == "dictionary":
+                    codes = array('I')
+                    codes.frombytes(read(buffers[1]))
+                    values = list(map(strings(buffers[2], buffers[3]).__getitem__, codes))
+                else:
+                    values = strings(buffers[1], buffers[2])
+                result[name] = [value if valid else None for value, valid in zip(values, validity)]
+            yield result
+
+
+def export_dataset(dataset, path, fmt="csv.gz", start=None, end=None, donor_id=None):
+    """Export one dataset to gzip CSV or the columnar format; returns rows written"""
+    columns = DATASETS[dataset][1]
+    batches = iter_batches(dataset, start, end, donor_id)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "csv.gz":
+        return write_csv_gz(path, columns, batches)
+    if fmt == "columnar":
+        return write_columnar(path, columns, batches)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def benchmark_export(rows=1000000, database="temp/export_bench.db", folder="temp/export_bench"):
+    """Seed a scratch database, then time both export formats and measure their peak memory"""
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+
+    rng = random.Random(rows)
+    start = datetime(2020, 1, 1)
+    conn = get_connection()
+    conn.executemany(
+        "INSERT INTO donations (donor_id, amount, timestamp, receipt_number) VALUES (?, ?, ?, ?)",
+        ((f"D{rng.randint(1, 50000):05d}", rng.choice((3900.0, 3500.0, 7878.0, 3232.0)),
+          (start + timedelta(minutes=rng.randint(0, 2600000))).isoformat(), f"HF{i:012d}")
+         for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+    result = {'rows': rows}
+    for fmt, extension in (("csv.gz", "csv.gz"), ("columnar", "hcol")):
+        path = os.path.join(folder, f"donations.{extension}")
+        key = fmt.replace(".", "_")
+        started = time.perf_counter()
+        result[f"{key}_rows"] = export_dataset("donations", path, fmt)
+        result[f"{key}_seconds"] = round(time.perf_counter() - started, 2)
+        result[f"{key}_size_mb"] = round(os.path.getsize(path) / 1024 / 1024, 1)
+
+        # Second pass under tracemalloc, which would distort the timing
+        tracemalloc.start()
+        export_dataset("donations", path, fmt)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[f"{key}_peak_memory_mb"] = round(peak / 1024 / 1024, 1)
+
+    started = time.perf_counter()
+    total = sum(sum(value for value in group['amount']) for group in
+                read_columnar(os.path.join(folder, "donations.hcol"), columns={'amount'}))
+    result['columnar_amount_scan_seconds'] = round(time.perf_counter() - started, 3)
+    result['columnar_amount_total'] = round(total, 2)
+    return result
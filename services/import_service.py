@@ -0,0 +1,364 @@
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import date, datetime
+
+from auth.validation import NIC_PATTERN, PHONE_PATTERN, EMAIL_PATTERN, normalize_nic, normalize_phone
+from config import config
+from database.changes import bump_change
+from database.operations import get_connection, init_database, allocate_donor_ids, epoch_seconds
+from database.writer import begin_immediate
+
+CHUNK_SIZE = 5000
+KINDS = ('donors', 'children', 'donations')
+
+
+class RowError(ValueError):
+    def __init__(self, field, message, raw=None):
+        super().__init__(message)
+        self.field = field
+        self.raw = raw
+
+
+def iter_records(path):
+    """Yield (line_number, record) from a CSV or JSONL file; malformed JSON or a non-object yields a RowError"""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, RowError("record", f"invalid JSON: {e.msg}", raw=line.strip())
+                    continue
+                if isinstance(record, dict):
+                    yield line_number, record
+                else:
+                    yield line_number, RowError("record", "expected a JSON object", raw=line.strip())
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader, [])]
+            for row in reader:
+                if row:
+                    yield reader.line_num, dict(zip(header, row))
+
+
+def _text(record, field, required=True):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ""
+    if required and not value:
+        raise RowError(field, "required")
+    return value
+
+
+def _donor(record):
+    name = _text(record, 'name')
+    nic = normalize_nic(_text(record, 'nic'))
+    if not NIC_PATTERN.fullmatch(nic):
+        raise RowError('nic', "invalid NIC")
+    phone = normalize_phone(_text(record, 'phone'))
+    if not PHONE_PATTERN.fullmatch(phone):
+        raise RowError('phone', "invalid phone number")
+    email = _text(record, 'email', required=False) or None
+    if email and not EMAIL_PATTERN.match(email):
+        raise RowError('email', "invalid email")
+    return name, nic, phone, email, _text(record, 'username', required=False) or None
+
+
+def _child(record, milk_types):
+    name = _text(record, 'name')
+    birthday = _text(record, 'birthday')
+    try:
+        birthday = date.fromisoformat(birthday).isoformat()
+    except ValueError:
+        raise RowError('birthday', "expected YYYY-MM-DD")
+    guardian = _text(record, 'guardian')
+    phone = normalize_phone(_text(record, 'phone'))
+    if not PHONE_PATTERN.fullmatch(phone):
+        raise RowError('phone', "invalid phone number")
+    milk_type = _text(record, 'milk_type')
+    if milk_type not in milk_types:
+        raise RowError('milk_type', "unknown milk type")
+    return name, birthday, guardian, phone, milk_type
+
+
+def _donation(record):
+    donor_id = _text(record, 'donor_id', required=False)
+    nic = normalize_nic(_text(record, 'nic', required=False))
+    if not donor_id and not nic:
+        raise RowError('donor_id', "donor_id or nic required")
+    try:
+        amount = float(_text(record, 'amount').replace(",", ""))
+    except ValueError:
+        raise RowError('amount', "not a number")
+    if amount <= 0:
+        raise RowError('amount', "must be positive")
+    try:
+        timestamp = datetime.fromisoformat(_text(record, 'date')).isoformat()
+    except ValueError:
+        raise RowError('date', "expected an ISO date")
+    return donor_id, nic, amount, timestamp, _text(record, 'receipt_number', required=False) or None
+
+
+def _existing(conn, query, values):
+    """Values already present, looked up in one statement through json_each"""
+    if not values:
+        return set()
+    return {row[0] for row in conn.execute(query, (json.dumps(list(values)),))}
+
+
+def _store_donors(conn, rows, errors):
+    nics, usernames, emails = set(), set(), set()
+    unique = []
+    for line_number, (name, nic, phone, email, username) in rows:
+        duplicate = ('nic' if nic in nics else 'username' if username and username in usernames
+                     else 'email' if email and email in emails else None)
+        if duplicate:
+            errors.append((line_number, duplicate, "duplicate within file", None))
+            continue
+        nics.add(nic)
+        usernames.add(username)
+        emails.add(email)
+        unique.append((line_number, (name, nic, phone, email, username)))
+
+    taken_nics = _existing(conn, "SELECT nic FROM donors WHERE nic IN (SELECT value FROM json_each(?))", nics)
+    taken_usernames = _existing(
+        conn, "SELECT username FROM donors WHERE username IN (SELECT value FROM json_each(?))", usernames - {None}
+    )
+    taken_emails = _existing(
+        conn, "SELECT email FROM donors WHERE email IN (SELECT value FROM json_each(?))", emails - {None}
+    )
+    accepted = []
+    for line_number, row in unique:
+        name, nic, phone, email, username = row
+        if nic in taken_nics:
+            errors.append((line_number, 'nic', "already registered", None))
+        elif username in taken_usernames:
+            errors.append((line_number, 'username', "already taken", None))
+        elif email in taken_emails:
+            errors.append((line_number, 'email', "already registered", None))
+        else:
+            accepted.append((line_number, row))
+
+    # Donors without a username get their donor id as one, which may be taken too
+    donor_ids = allocate_donor_ids(len(accepted), conn) if accepted else []
+    defaults = {donor_id for donor_id, (_, row) in zip(donor_ids, accepted) if not row[4]}
+    taken_defaults = _existing(
+        conn, "SELECT username FROM donors WHERE username IN (SELECT value FROM json_each(?))", defaults
+    ) | (defaults & usernames)
+    stored = []
+    for donor_id, (line_number, (name, nic, phone, email, username)) in zip(donor_ids, accepted):
+        if not username and donor_id in taken_defaults:
+            errors.append((line_number, 'username', f"default username {donor_id} already taken", None))
+        else:
+            stored.append((donor_id, name, nic, phone, email, username or donor_id))
+
+    # Imported donors have no password until they use password reset
+    conn.executemany(
+        "INSERT INTO donors (donor_id, name, nic, phone, email, username, password) VALUES (?, ?, ?, ?, ?, ?, '!')",
+        stored
+    )
+    if stored:
+        bump_change(conn, 'donors')
+    return len(stored)
+
+
+def _store_children(conn, rows, errors):
+    conn.executemany(
+        "INSERT INTO children (name, birthday, guardian, phone, milk_type) VALUES (?, ?, ?, ?, ?)",
+        [row for _, row in rows]
+    )
+    return len(rows)
+
+
+def _store_donations(conn, rows, errors):
+    donor_ids = _existing(
+        conn, "SELECT donor_id FROM donors WHERE donor_id IN (SELECT value FROM json_each(?))",
+        {row[0] for _, row in rows if row[0]}
+    )
+    nics = {row[1] for _, row in rows if not row[0]}
+    by_nic = dict(conn.execute(
+        "SELECT nic, donor_id FROM donors WHERE nic IN (SELECT value FROM json_each(?))", (json.dumps(list(nics)),)
+    )) if nics else {}
+
+    accepted = []
+    for line_number, (donor_id, nic, amount, timestamp, receipt_number) in rows:
+        if donor_id:
+            donor_id = donor_id if donor_id in donor_ids else None
+        else:
+            donor_id = by_nic.get(nic)
+        if donor_id is None:
+            errors.append((line_number, 'donor_id', "unknown donor", None))
+            continue
+        seconds = epoch_seconds(timestamp)
+        accepted.append((donor_id, amount, timestamp, receipt_number, seconds, seconds // 86400))
+    conn.executemany(
+        """INSERT INTO donations (donor_id, amount, timestamp, receipt_number, epoch_second, epoch_day)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        accepted
+    )
+    return len(accepted)
+
+
+def default_job_id(kind, path):
+    """The same unchanged file always maps to the same job, so re-running resumes it"""
+    stat = os.stat(path)
+    key = f"{kind}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def run_import(kind, path, job_id=None, chunk_size=CHUNK_SIZE, report_path=None, progress=None):
+    """Stream records into the database in chunked transactions
+
+    Each chunk's rows, rejected lines and the job's checkpoint are committed
+    together, so an interrupted import resumes after the last committed line
+    without duplicating or losing rows.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    job_id = job_id or default_job_id(kind, path)
+    report_path = report_path or f"{path}.errors.csv"
+    started = time.perf_counter()
+
+    conn = get_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO import_jobs (job_id, kind, source) VALUES (?, ?, ?)",
+            (job_id, kind, os.path.abspath(path))
+        )
+        conn.commit()
+        last_line, imported, rejected, finished_at = conn.execute(
+            "SELECT last_line, imported, rejected, finished_at FROM import_jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        resumed_from = last_line
+
+        if finished_at is None:
+            milk_types = {row[0] for row in conn.execute("SELECT name FROM inventory")}
+            parse = {
+                'donors': _donor,
+                'children': lambda record: _child(record, milk_types),
+                'donations': _donation,
+            }[kind]
+            store = {'donors': _store_donors, 'children': _store_children, 'donations': _store_donations}[kind]
+
+            rows, errors = [], []
+
+            def flush(line_number):
+                nonlocal imported, rejected
+                # The chunk checks for existing rows before inserting; take the write lock first so
+                # another process cannot write in between, and so a busy lock is waited for, not failed
+                begin_immediate(conn)
+                stored = store(conn, rows, errors) if rows else 0
+                conn.executemany(
+                    "INSERT INTO import_errors (job_id, line, field, message, record) VALUES (?, ?, ?, ?, ?)",
+                    [(job_id,) + error for error in errors]
+                )
+                imported += stored
+                rejected += len(errors)
+                conn.execute(
+                    """UPDATE import_jobs SET last_line = ?, imported = ?, rejected = ?,
+                       updated_at = CURRENT_TIMESTAMP WHERE job_id = ?""",
+                    (line_number, imported, rejected, job_id)
+                )
+                conn.commit()
+                rows.clear()
+                errors.clear()
+                if progress:
+                    progress(f"line {line_number}: {imported} imported, {rejected} rejected")
+
+            line_number = last_line
+            for line_number, record in iter_records(path):
+                if line_number <= last_line:
+                    continue
+                try:
+                    if isinstance(record, RowError):
+                        raise record
+                    rows.append((line_number, parse(record)))
+                except RowError as e:
+                    raw = record.raw if isinstance(record, RowError) else json.dumps(record, default=str)
+                    errors.append((line_number, e.field, str(e), raw))
+                if len(rows) + len(errors) >= chunk_size:
+                    flush(line_number)
+            flush(line_number)
+            conn.execute("UPDATE import_jobs SET finished_at = CURRENT_TIMESTAMP WHERE job_id = ?", (job_id,))
+            conn.commit()
+
+        _write_report(conn, job_id, report_path)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'job_id': job_id,
+        'kind': kind,
+        'resumed_from_line': resumed_from,
+        'imported': imported,
+        'rejected': rejected,
+        'report': report_path if rejected else None,
+        'seconds': round(elapsed, 3),
+    }
+
+
+def _write_report(conn, job_id, report_path):
+    cursor = conn.execute(
+        "SELECT line, field, message, record FROM import_errors WHERE job_id = ? ORDER BY line", (job_id,)
+    )
+    first = cursor.fetchone()
+    if first is None:
+        return
+    with open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "field", "error", "record"])
+        writer.writerow(first)
+        writer.writerows(cursor)
+
+
+def benchmark_import(rows=200000, kind="donors", database="temp/import_bench.db", folder="temp/import_bench"):
+    """Generate a CSV with a few bad rows and import it into a scratch database"""
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+
+    rng = random.Random(rows)
+    path = os.path.join(folder, f"{kind}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if kind == "donors":
+            writer.writerow(["name", "nic", "phone", "email"])
+            for i in range(rows):
+                nic = f"{199000000000 + i}" if i % 1000 else "bad-nic"
+                writer.writerow([f"Donor {i}", nic, f"077{i % 10000000:07d}", f"donor{i}@example.com"])
+        elif kind == "children":
+            writer.writerow(["name", "birthday", "guardian", "phone", "milk_type"])
+            for i in range(rows):
+                writer.writerow([f"Child {i}", f"20{rng.randint(10, 22)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                                 f"Guardian {i}", "0771234567", rng.choice(["Pediasure", "Ensure", "Sustagen"])])
+        else:
+            conn = get_connection()
+            conn.executemany(
+                "INSERT INTO donors (donor_id, name, nic, phone, email, username, password) "
+                "VALUES (?, ?, ?, '0771234567', NULL, ?, '!')",
+                [(f"D{i:03d}", f"Donor {i}", f"{199000000000 + i}", f"D{i:03d}") for i in range(1, 1001)]
+            )
+            conn.commit()
+            conn.close()
+            writer.writerow(["donor_id", "amount", "date", "receipt_number"])
+            for i in range(rows):
+                writer.writerow([f"D{rng.randint(1, 1000):03d}", f"{rng.choice([3900, 3500, 3200]):.2f}",
+                                 f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", f"HIST{i:08d}"])
+
+    result = run_import(kind, path)
+    result['rows'] = rows
+    result['rows_per_second'] = round(rows / result['seconds'], 1) if result['seconds'] else 0.0
+    return result
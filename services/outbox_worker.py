@@ -0,0 +1,78 @@
+import threading
+import time
+import uuid
+
+from database.operations import claim_outbox_batch, complete_outbox_batch, count_outbox
+from utils import metrics
+
+
+class OutboxWorker:
+    """Background loop that claims due outbox rows in batches and hands them to deliver()
+
+    Subclasses set ``table`` (and optionally ``filters`` to claim a subset of its
+    rows) and implement ``deliver(batch)``, returning
+    ``(sent_ids, failures, released_ids)`` where failures are
+    ``(id, attempts, error)`` tuples.
+    """
+
+    table = None
+    name = "outbox"
+    filters = None
+
+    def __init__(self, batch_size, poll_interval, max_attempts, backoff_base, backoff_max):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_token = uuid.uuid4().hex
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def deliver(self, batch):
+        raise NotImplementedError
+
+    def idle(self):
+        """Called when the queue is empty (e.g. to close a reused connection)"""
+
+    def run_once(self):
+        """Deliver one batch; returns the number of messages handled"""
+        batch = claim_outbox_batch(self.table, self.claim_token, self.batch_size, filters=self.filters)
+        if not batch:
+            self.idle()
+            return 0
+
+        started = time.perf_counter()
+        try:
+            sent_ids, failures, released_ids = self.deliver(batch)
+        except Exception as e:
+            sent_ids, released_ids = [], []
+            failures = [(message['id'], message['attempts'], str(e)) for message in batch]
+        complete_outbox_batch(self.table, sent_ids, failures, self.max_attempts,
+                              self.backoff_base, self.backoff_max, released_ids)
+
+        metrics.observe('husma_outbox_batch_seconds', time.perf_counter() - started, queue=self.name)
+        metrics.inc('husma_outbox_sent_total', len(sent_ids), queue=self.name)
+        metrics.inc('husma_outbox_failed_total', len(failures), queue=self.name)
+        return len(batch)
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            try:
+                handled = self.run_once()
+            except Exception:
+                handled = 0
+            if handled < self.batch_size:
+                self.stop_event.wait(self.poll_interval)
+        self.idle()
+
+    def start(self):
+        metrics.register_queue(self.name, lambda: count_outbox(self.table, filters=self.filters))
+        self.thread = threading.Thread(target=self.run_forever, name=f"husma-{self.name}-worker", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
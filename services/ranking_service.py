@@ -0,0 +1,157 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from database.changes import subscribe
+from database.operations import load_donor_totals, get_donations_after, compute_donor_totals, \
+    get_verified_donors, transaction, rebuild_donor_totals
+
+TOLERANCE = 0.005
+# Lookups reuse a refresh this recent; the event pipeline refreshes after every donation anyway
+MAX_AGE_SECONDS = 1.0
+
+
+class DonorRanking:
+    """
+    In-process mirror of donor_totals: totals per donor plus a list of
+    (-total, donor_id) kept sorted, so top-K is a slice and a donor's rank is a
+    binary search. It loads from donor_totals once, then applies donations past
+    its high-water mark the same way the donations trigger updates the table.
+
+    A sorted list rather than a heap: a heap gives the maximum cheaply but not a
+    donor's position, which rank and percentile need.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.refreshed_at = 0.0
+        self.high_water = 0
+        self.totals = {}
+        self.order = []
+
+    def _load(self):
+        self.high_water, self.totals = load_donor_totals()
+        self.order = sorted((-total, donor_id) for donor_id, (total, _) in self.totals.items())
+        self.loaded = True
+
+    def _apply(self, donor_id, amount):
+        total, count = self.totals.get(donor_id, (0.0, 0))
+        if count:
+            del self.order[bisect_left(self.order, (-total, donor_id))]
+        self.totals[donor_id] = (total + amount, count + 1)
+        insort(self.order, (-(total + amount), donor_id))
+
+    def refresh(self, max_age=0.0):
+        """Bring the mirror up to date unless it was refreshed within max_age seconds"""
+        if time.monotonic() - self.refreshed_at < max_age:
+            return
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            for donation_id, donor_id, amount in get_donations_after(self.high_water):
+                if donor_id is not None and donor_id != 'anonymous':
+                    self._apply(donor_id, amount)
+                self.high_water = donation_id
+            self.refreshed_at = time.monotonic()
+
+    def top(self, limit=10):
+        """Verified donors with the highest totals, as get_donor_ranking rows"""
+        self.refresh(MAX_AGE_SECONDS)
+        ranking = []
+        start = 0
+        while len(ranking) < limit and start < len(self.order):
+            with self.lock:
+                chunk = self.order[start:start + limit * 2]
+                counts = [self.totals[donor_id][1] for _, donor_id in chunk]
+            names = get_verified_donors([donor_id for _, donor_id in chunk])
+            for (total, donor_id), count in zip(chunk, counts):
+                if donor_id in names and len(ranking) < limit:
+                    ranking.append({'name': names[donor_id], 'donor_id': donor_id,
+                                    'donation_count': count, 'total_donated': -total})
+            start += len(chunk)
+        return ranking
+
+    def rank(self, donor_id):
+        """(rank, donors ranked) with 1 as the highest total; rank is None without donations"""
+        self.refresh(MAX_AGE_SECONDS)
+        with self.lock:
+            if donor_id not in self.totals:
+                return None, len(self.order)
+            return bisect_left(self.order, (-self.totals[donor_id][0], donor_id)) + 1, len(self.order)
+
+    def percentile(self, donor_id):
+        """Percentage of other donors who have given less than this donor"""
+        rank, donors = self.rank(donor_id)
+        if rank is None:
+            return None
+        return 100.0 * (donors - rank) / (donors - 1) if donors > 1 else 100.0
+
+
+_ranking = DonorRanking()
+
+
+def get_ranking():
+    return _ranking
+
+
+def refresh_ranking(event=None):
+    """Analytics refresher for the donation_recorded event pipeline"""
+    _ranking.refresh()
+
+
+def reset_ranking():
+    """Forget the mirror, e.g. after switching databases"""
+    global _ranking
+    _ranking = DonorRanking()
+
+
+# The mirror only applies new donations; anything else starts it over from donor_totals
+subscribe('donations', reset_ranking)
+subscribe('donor_totals', reset_ranking)
+
+
+def _differences(expected, actual):
+    """Donor ids whose (total, count) disagree between two {donor_id: (total, count)} maps"""
+    return sorted(
+        donor_id for donor_id in set(expected) | set(actual)
+        if donor_id not in expected or donor_id not in actual
+        or abs(expected[donor_id][0] - actual[donor_id][0]) > TOLERANCE
+        or expected[donor_id][1] != actual[donor_id][1]
+    )
+
+
+def verify_ranking(repair=False):
+    """Compare donor_totals and the in-process mirror with a full recompute from donations"""
+    started = time.perf_counter()
+    expected = compute_donor_totals()
+    recompute_seconds = time.perf_counter() - started
+
+    table = load_donor_totals()[1]
+    ranking = DonorRanking()
+    ranking.refresh()
+    result = {
+        'donors': len(expected),
+        'recompute_ms': round(recompute_seconds * 1000, 2),
+        'table_mismatches': _differences(expected, table),
+        'mirror_mismatches': _differences(expected, ranking.totals),
+    }
+    if ranking.order:
+        expected_order = sorted(expected, key=lambda donor_id: (-expected[donor_id][0], donor_id))
+        result['order_matches'] = [donor_id for _, donor_id in ranking.order] == expected_order
+
+        donor_id = ranking.order[len(ranking.order) // 2][1]
+        for name, lookup in (('top_10', lambda: ranking.top(10)), ('rank', lambda: ranking.rank(donor_id)),
+                             ('percentile', lambda: ranking.percentile(donor_id))):
+            started = time.perf_counter()
+            for _ in range(100):
+                lookup()
+            result[f"{name}_ms"] = round((time.perf_counter() - started) * 10, 4)
+
+    if repair and (result['table_mismatches'] or result['mirror_mismatches']):
+        with transaction() as conn:
+            rebuild_donor_totals(conn.cursor())
+        reset_ranking()
+        result['repaired'] = True
+    return result
+
@@ -0,0 +1,444 @@
+import csv
+import hashlib
+import os
+import random
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from config import config
+from database.operations import get_connection, init_database, transaction
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%d %b %Y", "%Y/%m/%d")
+DEFAULT_COLUMNS = {'date': "Date", 'amount': "Amount", 'credit': "Credit", 'reference': "Reference",
+                   'description': "Description"}
+RECEIPT_PATTERN = re.compile(r'HF\d{14}[0-9A-F]{6}')
+DONOR_ID_PATTERN = re.compile(r'\bD\d{3,}\b')
+WORD_PATTERN = re.compile(r'[a-z]{2,}')
+
+IMPORT_CHUNK_SIZE = 5000
+MATCH_WINDOW_DAYS = 3
+MAX_FUZZY_CANDIDATES = 25
+MAX_STORED_CANDIDATES = 5
+FUZZY_THRESHOLD = 0.8
+FUZZY_MARGIN = 0.15
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text, date_format=None):
+    """ISO date from a bank export; cached because a statement repeats the same few hundred dates"""
+    text = text.strip()
+    for candidate in ((date_format,) if date_format else DATE_FORMATS):
+        try:
+            return datetime.strptime(text, candidate).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {text!r}")
+
+
+def parse_amount_cents(text):
+    text = text.replace("LKR", "").replace(",", "").strip()
+    negative = text.startswith("(") and text.endswith(")")
+    cents = round(float(text.strip("()")) * 100)
+    return -cents if negative else cents
+
+
+def iter_statement_csv(path, columns=None, date_format=None, errors=None):
+    """Yield (posted_date, amount_cents, reference, description) for each credit line of a bank export"""
+    columns = dict(DEFAULT_COLUMNS, **(columns or {}))
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        amount_column = columns['amount'] if columns['amount'] in reader.fieldnames else columns['credit']
+        for line_number, row in enumerate(reader, start=2):
+            try:
+                amount_text = (row.get(amount_column) or "").strip()
+                if not amount_text:
+                    continue
+                amount_cents = parse_amount_cents(amount_text)
+                if amount_cents <= 0:
+                    continue
+                yield (parse_date(row[columns['date']], date_format), amount_cents,
+                       (row.get(columns['reference']) or "").strip(), (row.get(columns['description']) or "").strip())
+            except (KeyError, ValueError) as e:
+                if errors is not None:
+                    errors.append((line_number, str(e)))
+
+
+def import_statement(path, source=None, columns=None, date_format=None):
+    """Stream a bank statement CSV into bank_statement_lines
+
+    Each line is keyed by a hash of its fields and its occurrence number within
+    the file, so re-importing an export (or an overlapping one) adds nothing twice.
+    """
+    source = source or os.path.basename(path)
+    errors = []
+    occurrences = Counter()
+    lines = 0
+    conn = get_connection()
+    try:
+        before = conn.total_changes
+        batch = []
+        for posted_date, amount_cents, reference, description in iter_statement_csv(path, columns, date_format,
+                                                                                    errors):
+            fields = (posted_date, amount_cents, reference, description)
+            occurrences[fields] += 1
+            line_hash = hashlib.sha1(repr(fields + (occurrences[fields],)).encode("utf-8")).hexdigest()
+            batch.append((line_hash, source) + fields)
+            lines += 1
+            if len(batch) >= IMPORT_CHUNK_SIZE:
+                _insert_lines(conn, batch)
+                batch = []
+        if batch:
+            _insert_lines(conn, batch)
+        imported = conn.total_changes - before
+    finally:
+        conn.close()
+    return {'lines': lines, 'imported': imported, 'duplicates': lines - imported, 'errors': errors}
+
+
+def _insert_lines(conn, batch):
+    conn.executemany(
+        """INSERT OR IGNORE INTO bank_statement_lines
+           (line_hash, source, posted_date, amount_cents, reference, description)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        batch
+    )
+    conn.commit()
+
+
+@lru_cache(maxsize=4096)
+def _day(text):
+    return date.fromisoformat(text[:10]).toordinal()
+
+
+def _words(text):
+    return WORD_PATTERN.findall(text.lower())
+
+
+def name_score(name_words, text_words):
+    """How well a donor name appears in statement text (0-1), tolerant of typos"""
+    if not name_words or not text_words:
+        return 0.0
+    total = 0.0
+    for name_word in name_words:
+        if name_word in text_words:
+            total += 1.0
+            continue
+        best = 0.0
+        matcher = SequenceMatcher(None, name_word)
+        for text_word in text_words:
+            matcher.set_seq1(text_word)
+            if matcher.real_quick_ratio() > best and matcher.quick_ratio() > best:
+                best = max(best, matcher.ratio())
+        total += best
+    return total / len(name_words)
+
+
+def _find(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+class _AmountBucket:
+    """Unclaimed donations of one amount, ordered by day, with O(α) skipping of claimed ones"""
+
+    __slots__ = ('days', 'donations', 'right', 'left')
+
+    def __init__(self, entries):
+        entries.sort()
+        self.days = [day for day, _ in entries]
+        self.donations = [index for _, index in entries]
+        self.right = list(range(len(entries) + 1))
+        self.left = list(range(len(entries) + 1))
+
+    def claim(self, position):
+        self.right[position] = position + 1
+        self.left[position + 1] = position
+
+    def nearest(self, day, window, limit):
+        """Up to limit unclaimed (position, donation) pairs within the window, nearest day first"""
+        days = self.days
+        center = bisect_left(days, day)
+        r = _find(self.right, center)
+        l = _find(self.left, center) - 1
+        found = []
+        while len(found) < limit:
+            r_ok = r < len(days) and days[r] - day <= window
+            l_ok = l >= 0 and day - days[l] <= window
+            if r_ok and (not l_ok or days[r] - day <= day - days[l]):
+                found.append((r, self.donations[r]))
+                r = _find(self.right, r + 1)
+            elif l_ok:
+                found.append((l, self.donations[l]))
+                l = _find(self.left, l) - 1
+            else:
+                break
+        return found
+
+
+def _match(donations, lines, window_days):
+    """(matched links, candidate links, status per line) for unmatched donations and statement lines"""
+    d_id = [row[0] for row in donations]
+    d_cents = [round(row[1] * 100) for row in donations]
+    d_day = [_day(row[2]) for row in donations]
+    d_names = [row[5] or "" for row in donations]
+    claimed = bytearray(len(donations))
+    by_receipt = {row[3]: i for i, row in enumerate(donations) if row[3]}
+    by_donor = defaultdict(list)
+    for i, row in enumerate(donations):
+        by_donor[(d_cents[i], row[4])].append(i)
+
+    matched, candidates = [], []
+    line_status = {}
+
+    def match(line_id, index, method, score=1.0):
+        claimed[index] = 1
+        matched.append((line_id, d_id[index], 'matched', method, score))
+        line_status[line_id] = 'matched'
+
+    # Pass 1 and 2: exact keys quoted in the reference
+    remaining = []
+    for line_id, posted_date, cents, reference, description, _ in lines:
+        text = f"{reference} {description}"
+        upper = text.upper()
+        day = _day(posted_date)
+        index = next((by_receipt[token] for token in RECEIPT_PATTERN.findall(upper)
+                      if token in by_receipt and not claimed[by_receipt[token]]
+                      and d_cents[by_receipt[token]] == cents), None)
+        if index is not None:
+            match(line_id, index, 'receipt')
+            continue
+        index = None
+        for token in DONOR_ID_PATTERN.findall(upper):
+            nearby = [i for i in by_donor.get((cents, token), ())
+                      if not claimed[i] and abs(d_day[i] - day) <= window_days]
+            if nearby:
+                index = min(nearby, key=lambda i: abs(d_day[i] - day))
+                break
+        if index is not None:
+            match(line_id, index, 'donor_id')
+            continue
+        remaining.append((line_id, day, cents, text))
+
+    # Pass 3: amount and date window, with a bounded fuzzy pass on names
+    bucket_entries = defaultdict(list)
+    for i in range(len(donations)):
+        if not claimed[i]:
+            bucket_entries[d_cents[i]].append((d_day[i], i))
+    buckets = {cents: _AmountBucket(entries) for cents, entries in bucket_entries.items()}
+    del bucket_entries
+
+    name_words = {}
+    scores = {}
+    # Matching a line can leave an earlier ambiguous line with a single candidate,
+    # so ambiguous lines are retried until a round resolves nothing new
+    while True:
+        ambiguous = []
+        for line in remaining:
+            line_id, day, cents, text = line
+            bucket = buckets.get(cents)
+            found = bucket.nearest(day, window_days, MAX_FUZZY_CANDIDATES + 1) if bucket else []
+            if not found:
+                line_status[line_id] = 'unmatched'
+                continue
+            if len(found) == 1:
+                position, index = found[0]
+                bucket.claim(position)
+                match(line_id, index, 'amount_date')
+                continue
+
+            text_words = None
+            scored = []
+            for position, index in found[:MAX_FUZZY_CANDIDATES]:
+                name = d_names[index]
+                score = scores.get((name, text))
+                if score is None:
+                    if text_words is None:
+                        text_words = set(_words(text))
+                    words = name_words.get(name)
+                    if words is None:
+                        words = name_words[name] = _words(name)
+                    # Names and references repeat a lot, so each pair is compared once
+                    score = scores[(name, text)] = name_score(words, text_words)
+                scored.append((score, position, index))
+            scored.sort(key=lambda item: -item[0])
+            best = scored[0]
+            if best[0] >= FUZZY_THRESHOLD and best[0] - scored[1][0] >= FUZZY_MARGIN:
+                bucket.claim(best[1])
+                match(line_id, best[2], 'fuzzy', round(best[0], 3))
+            else:
+                ambiguous.append((line, scored))
+        if not ambiguous or len(ambiguous) == len(remaining):
+            break
+        remaining = [line for line, _ in ambiguous]
+
+    for (line_id, _, _, _), scored in ambiguous:
+        line_status[line_id] = 'ambiguous'
+        candidates.extend((line_id, d_id[index], 'candidate', 'amount_date', round(score, 3))
+                          for score, _, index in scored[:MAX_STORED_CANDIDATES])
+    return matched, candidates, line_status
+
+
+def _links_version(conn):
+    """Changes whenever a reconciliation run stores its links"""
+    return tuple(conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM reconciliation_links").fetchone())
+
+
+def reconcile(window_days=MATCH_WINDOW_DAYS, attempts=3):
+    """Match unreconciled statement lines to donations and store the links
+
+    1. receipt numbers quoted in the reference (hash join)
+    2. donor ids quoted in the reference, same amount, within the window (hash join)
+    3. same amount within the window (merge over day-sorted buckets); several
+       candidates are separated by a bounded fuzzy comparison of donor names with
+       the statement text, otherwise the line is marked ambiguous.
+
+    Reading and matching hold no lock; the links are replaced in one short write
+    transaction at the end. If another run stored links in the meantime, the
+    matching is redone from a fresh read.
+    """
+    started = time.perf_counter()
+    for _ in range(attempts):
+        conn = get_connection()
+        try:
+            # One read transaction, so donations, lines and links come from the same snapshot
+            conn.execute("BEGIN")
+            version = _links_version(conn)
+            donations = conn.execute(
+                """SELECT d.id, d.amount, d.timestamp, d.receipt_number, d.donor_id, don.name
+                   FROM donations d
+                            LEFT JOIN donors don ON don.donor_id = d.donor_id
+                   WHERE NOT EXISTS (SELECT 1 FROM reconciliation_links l
+                                     WHERE l.donation_id = d.id AND l.status = 'matched')"""
+            ).fetchall()
+            lines = conn.execute(
+                """SELECT id, posted_date, amount_cents, reference, description, status
+                   FROM bank_statement_lines WHERE status != 'matched' ORDER BY posted_date, id"""
+            ).fetchall()
+            conn.rollback()
+        finally:
+            conn.close()
+
+        matched, candidates, line_status = _match(donations, lines, window_days)
+        previous_status = {line[0]: line[5] for line in lines}
+
+        with transaction() as conn:
+            if _links_version(conn) != version:
+                continue
+            # Ambiguous lines are re-evaluated from scratch on every run
+            conn.execute("DELETE FROM reconciliation_links WHERE status = 'candidate'")
+            conn.executemany(
+                """INSERT INTO reconciliation_links (statement_line_id, donation_id, status, method, score)
+                   VALUES (?, ?, ?, ?, ?)""",
+                matched + candidates
+            )
+            conn.executemany(
+                "UPDATE bank_statement_lines SET status = ? WHERE id = ?",
+                [(status, line_id) for line_id, status in line_status.items() if status != previous_status[line_id]]
+            )
+        break
+    else:
+        raise RuntimeError(f"Reconciliation kept being overtaken by other runs ({attempts} attempts)")
+
+    counts = Counter(line_status.values())
+    return {
+        'lines': len(lines),
+        'matched': counts['matched'],
+        'ambiguous': counts['ambiguous'],
+        'unmatched': counts['unmatched'],
+        'methods': dict(Counter(link[3] for link in matched)),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def get_reconciliation_sets(limit=100):
+    """Sample rows of the matched, ambiguous and unmatched sets"""
+    conn = get_connection()
+    try:
+        sets = {}
+        for status in ('matched', 'ambiguous', 'unmatched'):
+            rows = conn.execute(
+                """SELECT l.id, l.posted_date, l.amount_cents / 100.0 AS amount, l.reference, l.description,
+                          GROUP_CONCAT(r.donation_id) AS donation_ids
+                   FROM bank_statement_lines l
+                            LEFT JOIN reconciliation_links r ON r.statement_line_id = l.id
+                   WHERE l.status = ?
+                   GROUP BY l.id
+                   ORDER BY l.posted_date, l.id
+                   LIMIT ?""",
+                (status, limit)
+            ).fetchall()
+            sets[status] = [dict(row) for row in rows]
+        return sets
+    finally:
+        conn.close()
+
+
+def benchmark_reconciliation(lines=300000, year=2024, database="temp/reconcile_bench.db",
+                             statement="temp/reconcile_bench.csv"):
+    """Seed a year of donations plus a matching bank export with typos, noise and lag, then reconcile"""
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+
+    rng = random.Random(year)
+    first_names = ["Nimal", "Kamala", "Sunil", "Anura", "Chamari", "Ruwan", "Dilani", "Saman", "Ishara", "Mahesh"]
+    last_names = ["Perera", "Fernando", "Silva", "Jayasinghe", "Bandara", "Wijesinghe", "Rathnayake", "Dissanayake"]
+    donors = [(f"D{i:06d}", f"{rng.choice(first_names)} {rng.choice(last_names)}") for i in range(1, 20001)]
+    start = date(year, 1, 1)
+
+    conn = get_connection()
+    donations, statement_rows = [], []
+    for i in range(lines):
+        donor_id, name = rng.choice(donors)
+        amount = round(rng.choice([3900, 3500, 3200, 4100, 3800, 3000]) * rng.randint(1, 4) * 1.01
+                       + rng.randint(0, 99) / 100, 2)
+        when = start + timedelta(days=rng.randint(0, 364))
+        receipt = f"HF{when.strftime('%Y%m%d')}{i:06d}{i % 16777216:06X}"
+        donations.append((donor_id, amount, f"{when.isoformat()}T10:00:00", receipt))
+        posted = when + timedelta(days=rng.randint(0, 2))
+        style = rng.random()
+        if style < 0.3:
+            reference = receipt
+        elif style < 0.5:
+            reference = donor_id
+        elif style < 0.8:
+            reference = name.upper() if rng.random() < 0.7 else name.replace("a", "e", 1).upper()
+        else:
+            reference = "ONLINE TRANSFER"
+        statement_rows.append((posted.strftime("%d/%m/%Y"), f"{amount:,.2f}", reference, "CEFT CREDIT"))
+    # Bank lines with no donation behind them
+    for i in range(lines // 50):
+        posted = start + timedelta(days=rng.randint(0, 364))
+        statement_rows.append((posted.strftime("%d/%m/%Y"), f"{rng.randint(100, 999)}.00", "INTEREST", ""))
+
+    conn.executemany("INSERT INTO donors (donor_id, name, nic, phone, email, username, password) "
+                     "VALUES (?, ?, ?, '', ?, ?, '!')", [(d, n, d, f"{d}@example.com", d) for d, n in donors])
+    conn.executemany("INSERT INTO donations (donor_id, amount, timestamp, receipt_number) VALUES (?, ?, ?, ?)",
+                     donations)
+    conn.commit()
+    conn.close()
+
+    with open(statement, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Description", "Reference", "Amount"])
+        writer.writerows((row[0], row[3], row[2], row[1]) for row in statement_rows)
+
+    started = time.perf_counter()
+    imported = import_statement(statement)
+    import_seconds = time.perf_counter() - started
+    result = reconcile()
+    result['import_seconds'] = round(import_seconds, 3)
+    result['imported'] = imported['imported']
+    return result
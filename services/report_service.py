@@ -1,22 +1,29 @@
 import streamlit as st
-from database.operations import get_donation_analytics, get_monthly_donation_trend, get_donor_ranking
+from services.analytics_snapshot import get_snapshot, summary, monthly_trend, repeat_donor_rate, rolling_totals, \
+    gift_size_distribution
+from services.ranking_service import get_ranking
+from utils.instrumentation import instrument
 
 
+@instrument()
 def generate_donation_report():
-    """Generate comprehensive donation report"""
-    analytics = get_donation_analytics()
-    monthly_trend = get_monthly_donation_trend()
-    donor_ranking = get_donor_ranking()
+    """Generate comprehensive donation report from the in-memory donation snapshot"""
+    columns = get_snapshot()
+    dates, totals = rolling_totals(columns)
 
     report = {
-        'summary': analytics,
-        'monthly_trend': monthly_trend,
-        'donor_ranking': donor_ranking
+        'summary': summary(columns),
+        'monthly_trend': monthly_trend(columns),
+        'donor_ranking': get_ranking().top(10),
+        'repeat_donor_rate': repeat_donor_rate(columns),
+        'rolling_30_day': {'date': dates[-365:].tolist(), 'total': totals[-365:].tolist()},
+        'gift_sizes': gift_size_distribution(columns)
     }
 
     return report
 
 
+@instrument()
 def display_analytics_dashboard():
     """Display analytics dashboard in Streamlit"""
     report = generate_donation_report()
@@ -67,4 +74,16 @@ def display_analytics_dashboard():
                 f"{i}. **{donor['name']}** - "
                 f"LKR {donor['total_donated']:,.2f} "
                 f"({donor['donation_count']} donations)"
-            )
\ No newline at end of file
+            )
+
+    # Giving Patterns
+    if report['summary'].get('total_donations'):
+        st.subheader("🔁 Giving Patterns")
+        st.metric("Repeat Donor Rate", f"{report['repeat_donor_rate']:.1%}")
+
+        st.write("**Rolling 30-day total (last year)**")
+        st.line_chart(report['rolling_30_day'], x='date', y='total')
+
+        st.write("**Gift size distribution (LKR)**")
+        st.bar_chart({'band': [label for label, _ in report['gift_sizes']],
+                      'donations': [count for _, count in report['gift_sizes']]}, x='band', y='donations')
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import config
+from services.outbox_worker import OutboxWorker
+from utils import metrics
+from utils.rate_limit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class SMSTransportError(Exception):
+    """Raised when a whole bulk submission fails; a short result list fails the messages it leaves out"""
+
+
+class LogTransport:
+    """Writes messages to the application log (development default)"""
+
+    def send_bulk(self, messages):
+        for message in messages:
+            logger.info("SMS to %s: %s", message['to'], message['text'])
+        return [None] * len(messages)
+
+
+class HttpTransport:
+    """Submits messages to a JSON bulk SMS API
+
+    POSTs ``{"sender": ..., "messages": [{"to": ..., "text": ...}]}`` and accepts an
+    optional ``{"results": [{"status": "ok" | "error", "error": ...}]}`` body with
+    one entry per message.
+    """
+
+    def __init__(self, url, api_key="", sender_id="", timeout=15):
+        self.url = url
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.timeout = timeout
+
+    def send_bulk(self, messages):
+        payload = json.dumps({'sender': self.sender_id, 'messages': messages}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        if self.api_key:
+            request.add_header('Authorization', f"Bearer {self.api_key}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+        except (urllib.error.URLError, OSError) as e:
+            raise SMSTransportError(str(e)) from e
+
+        results = json.loads(body).get('results') if body else None
+        if not results:
+            return [None] * len(messages)
+        return [None if result.get('status') == 'ok' else result.get('error', 'rejected') for result in results]
+
+
+def default_transport():
+    if config.SMS_TRANSPORT == "http":
+        return HttpTransport(config.SMS_API_URL, config.SMS_API_KEY, config.SMS_SENDER_ID)
+    return LogTransport()
+
+
+class SMSDispatcher(OutboxWorker):
+    """Sends queued SMS in rate-limited bulk submissions"""
+
+    table = "sms_outbox"
+    name = "sms"
+
+    def __init__(self, transport=None, rate_per_second=None, bulk_size=None, batch_size=None,
+                 poll_interval=None, max_attempts=None, backoff_base=None, backoff_max=None):
+        super().__init__(
+            batch_size or config.SMS_BATCH_SIZE,
+            config.SMS_POLL_INTERVAL if poll_interval is None else poll_interval,
+            max_attempts or config.SMS_MAX_ATTEMPTS,
+            config.SMS_BACKOFF_BASE if backoff_base is None else backoff_base,
+            config.SMS_BACKOFF_MAX if backoff_max is None else backoff_max,
+        )
+        self.transport = transport or default_transport()
+        rate = rate_per_second or config.SMS_RATE_PER_SECOND
+        # A bulk call never carries more messages than one second's allowance
+        self.bulk_size = max(1, min(bulk_size or config.SMS_BULK_SIZE, int(rate) or 1))
+        self.limiter = TokenBucketLimiter(rate, self.bulk_size)
+
+    def _wait_for_tokens(self, count):
+        while not self.limiter.allow('gateway', count):
+            if self.stop_event.wait(self.limiter.retry_after('gateway', count)):
+                return False
+        return True
+
+    def deliver(self, batch):
+        sent_ids, failures, released_ids = [], [], []
+        for start in range(0, len(batch), self.bulk_size):
+            chunk = batch[start:start + self.bulk_size]
+            if not self._wait_for_tokens(len(chunk)):
+                released_ids.extend(row['id'] for row in batch[start:])
+                break
+
+            started = time.perf_counter()
+            try:
+                errors = self.transport.send_bulk([{'to': row['recipient'], 'text': row['body']} for row in chunk])
+            except SMSTransportError as e:
+                failures.extend((row['id'], row['attempts'], str(e)) for row in chunk)
+                released_ids.extend(row['id'] for row in batch[start + len(chunk):])
+                break
+            finally:
+                metrics.observe('husma_sms_send_seconds', time.perf_counter() - started)
+
+            for row, error in zip(chunk, errors):
+                if error is None:
+                    sent_ids.append(row['id'])
+                else:
+                    failures.append((row['id'], row['attempts'], error))
+            # Messages the gateway returned no result for are unconfirmed; fail them so they are retried
+            if len(errors) < len(chunk):
+                error = f"gateway returned {len(errors)} results for {len(chunk)} messages"
+                failures.extend((row['id'], row['attempts'], error) for row in chunk[len(errors):])
+        return sent_ids, failures, released_ids
+
+
+def start_sms_worker():
+    """Start the background SMS dispatcher once per process"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SMSDispatcher().start()
+    return _worker
+
+
+class _StubGatewayHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.record(len(payload['messages']))
+        body = json.dumps({'results': [{'status': 'ok'} for _ in payload['messages']]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGateway(ThreadingHTTPServer):
+    """Local bulk SMS API that accepts everything; used to exercise HttpTransport"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StubGatewayHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.messages = 0
+
+    def record(self, count):
+        with self.lock:
+            self.requests += 1
+            self.messages += count
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/bulk"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="husma-sms-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def benchmark_dispatch(messages=1000, rate_per_second=500, database="temp/sms_bench.db"):
+    """Queue messages in a scratch database and dispatch them to a local stub gateway"""
+    from database.operations import init_database, count_outbox
+    from services.sms_service import send_sms
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+
+    for i in range(messages):
+        send_sms(f"07{i:08d}", "Thank you! Your donation to Husma Foundation has been received.")
+
+    gateway = StubGateway().start()
+    dispatcher = SMSDispatcher(transport=HttpTransport(gateway.url), rate_per_second=rate_per_second,
+                               poll_interval=0)
+    started = time.perf_counter()
+    while dispatcher.run_once():
+        pass
+    elapsed = time.perf_counter() - started
+    gateway.stop()
+
+    return {
+        'messages': messages,
+        'delivered': gateway.messages,
+        'bulk_requests': gateway.requests,
+        'outstanding': count_outbox("sms_outbox"),
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(gateway.messages / elapsed, 1) if elapsed else 0.0,
+    }
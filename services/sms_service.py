@@ -1,29 +1,39 @@
-import streamlit as st
+import hashlib
+import time
+from config import config
+from database.operations import enqueue_outbox
+from utils.instrumentation import instrument
 
 
-def send_sms(phone_number, message):
+@instrument()
+def send_sms(phone_number, message, idempotency_key=None):
     """
-    Simulate SMS sending
-    In production, replace with real SMS service like Twilio
+    Queue an SMS for the background dispatcher.
+    Returns False if a message with the same idempotency key was already queued.
+    Messages tied to an event should pass its key (e.g. the receipt number); free-form
+    messages without one are only queued once per number and text per dedupe window.
     """
-    st.info(f"""
-    **📱 SMS Notification**
-
-    **To:** {phone_number}
-    **Message:** {message}
-
-    *In production, this would be sent via SMS gateway*
-    """)
-    return True
-
-
-def send_donation_confirmation_sms(phone_number, donor_name, amount):
+    phone_number = phone_number.replace(' ', '').replace('-', '')
+    if idempotency_key is None:
+        window = int(time.time() // config.SMS_DEDUPE_WINDOW)
+        digest = hashlib.sha1(message.encode('utf-8')).hexdigest()[:16]
+        idempotency_key = f"{phone_number}:{digest}:{window}"
+    return enqueue_outbox("sms_outbox", {
+        'idempotency_key': idempotency_key,
+        'recipient': phone_number,
+        'body': message,
+    })
+
+
+@instrument()
+def send_donation_confirmation_sms(phone_number, donor_name, amount, idempotency_key=None):
     """Send donation confirmation SMS"""
     message = f"Thank you {donor_name}! Your donation of LKR {amount:,.2f} to Husma Foundation has been received. Your support helps children fighting cancer."
-    return send_sms(phone_number, message)
+    return send_sms(phone_number, message, idempotency_key=idempotency_key)
 
 
+@instrument()
 def send_password_reset_sms(phone_number, donor_name):
     """Send password reset SMS"""
     message = f"Hi {donor_name}, for password reset assistance, please contact Husma Foundation at 0777348822."
-    return send_sms(phone_number, message)
\ No newline at end of file
+    return send_sms(phone_number, message)
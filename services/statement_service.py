@@ -0,0 +1,225 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from config import config
+from database.operations import get_connection, init_database
+
+STATEMENT_FOLDER = "temp/statements"
+FETCH_SIZE = 5000
+
+
+def iter_donor_groups(year, after_donor_id=""):
+    """Stream one year of donations ordered by donor and yield (donor, donations) groups
+
+    The query walks idx_donations_donor_timestamp, so rows arrive already grouped and
+    only one donor's donations are held in memory at a time.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.execute(
+            """SELECT d.donor_id, d.amount, d.timestamp, d.receipt_number,
+                      don.name, don.email, don.nic
+               FROM donations d
+                        JOIN donors don ON don.donor_id = d.donor_id
+               WHERE d.donor_id > ?
+                 AND d.timestamp >= ?
+                 AND d.timestamp < ?
+               ORDER BY d.donor_id, d.timestamp""",
+            (after_donor_id, f"{year}-01-01", f"{year + 1}-01-01")
+        )
+
+        def rows():
+            while True:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    return
+                yield from batch
+
+        for donor_id, group in groupby(rows(), key=itemgetter(0)):
+            group = list(group)
+            first = group[0]
+            donations = [(row[1], row[2], row[3]) for row in group]
+            yield {'donor_id': donor_id, 'name': first[4], 'email': first[5], 'nic': first[6]}, donations
+    finally:
+        conn.close()
+
+
+def build_statement_text(year, donor, donations):
+    total = sum(amount for amount, _, _ in donations)
+    lines = [
+        "HUSMA FOUNDATION - ANNUAL DONATION STATEMENT",
+        "============================================",
+        "",
+        f"Year: {year}",
+        f"Donor: {donor['name']} ({donor['donor_id']})",
+        f"NIC: {donor['nic'] or '-'}",
+        "",
+        f"{'Date':<12}{'Receipt':<28}{'Amount (LKR)':>16}",
+    ]
+    for amount, timestamp, receipt_number in donations:
+        lines.append(f"{timestamp[:10]:<12}{(receipt_number or '-'):<28}{amount:>16,.2f}")
+    lines += [
+        "",
+        f"{'Total':<40}{total:>16,.2f}",
+        f"Donations: {len(donations)}",
+        "",
+        "Husma Foundation, 278/1, Katuwana Road, Homagama",
+        "0777348822 / 0777138822",
+    ]
+    return "\n".join(lines) + "\n", total
+
+
+def render_statement(year, donor, donations, folder, write_pdf=True):
+    """Render one donor's statement PDF and email parts (runs in a worker process)"""
+    from services.template_service import render_email
+    from utils.pdf_generator import render_pdf
+
+    text, total = build_statement_text(year, donor, donations)
+    path = os.path.join(folder, str(year), f"{donor['donor_id']}.pdf")
+    if write_pdf:
+        render_pdf(text, path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        path = path[:-4] + ".txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    html_body, text_body = render_email("annual_statement", {
+        'donor_name': donor['name'],
+        'donor_id': donor['donor_id'],
+        'year': year,
+        'donation_count': len(donations),
+        'total': total,
+        'statement_reference': f"ST{year}-{donor['donor_id']}",
+    })
+    return donor['donor_id'], donor['email'], path, html_body, text_body
+
+
+def _render_batch(year, groups, folder, write_pdf):
+    return [render_statement(year, donor, donations, folder, write_pdf) for donor, donations in groups]
+
+
+def _load_checkpoint(path, year):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('year') == year:
+            return checkpoint
+    return {'year': year, 'last_donor_id': "", 'donors_done': 0}
+
+
+def _save_checkpoint(path, checkpoint):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def run_statement_job(year, workers=None, folder=STATEMENT_FOLDER, checkpoint_path=None, send_email=False,
+                      write_pdf=True, batch_size=200, progress=print, progress_every=5000):
+    """Render year-end statements for every donor who gave in the year
+
+    Groups are rendered in batches on a process pool with a bounded number of batches
+    in flight. The checkpoint only advances past a donor once every earlier batch has
+    finished, so a crashed job resumes without gaps and queued emails are de-duplicated
+    by their idempotency keys.
+    """
+    from services.email_service import send_email as queue_email
+
+    workers = workers or config.RECEIPT_WORKERS
+    checkpoint_path = checkpoint_path or os.path.join(folder, f"statements_{year}.checkpoint.json")
+    os.makedirs(folder, exist_ok=True)
+    checkpoint = _load_checkpoint(checkpoint_path, year)
+    if checkpoint['last_donor_id']:
+        progress(f"Resuming after donor {checkpoint['last_donor_id']} ({checkpoint['donors_done']} done)")
+
+    started = time.perf_counter()
+    next_report = checkpoint['donors_done'] + progress_every
+    in_flight = deque()
+
+    def finish_oldest():
+        nonlocal next_report
+        future, last_donor_id = in_flight.popleft()
+        for donor_id, email, path, html_body, text_body in future.result():
+            if send_email and email:
+                queue_email(email, f"Your {year} Donation Statement - Husma Foundation", text_body, html_body,
+                            idempotency_key=f"statement:{year}:{donor_id}")
+            checkpoint['donors_done'] += 1
+        checkpoint['last_donor_id'] = last_donor_id
+        _save_checkpoint(checkpoint_path, checkpoint)
+        if checkpoint['donors_done'] >= next_report:
+            elapsed = time.perf_counter() - started
+            progress(f"{checkpoint['donors_done']} statements, {elapsed:.1f}s elapsed")
+            next_report += progress_every
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        batch = []
+        for donor, donations in iter_donor_groups(year, checkpoint['last_donor_id']):
+            batch.append((donor, donations))
+            if len(batch) >= batch_size:
+                in_flight.append((pool.submit(_render_batch, year, batch, folder, write_pdf), donor['donor_id']))
+                batch = []
+                while len(in_flight) >= workers * 2:
+                    finish_oldest()
+        if batch:
+            in_flight.append((pool.submit(_render_batch, year, batch, folder, write_pdf), batch[-1][0]['donor_id']))
+        while in_flight:
+            finish_oldest()
+
+    elapsed = time.perf_counter() - started
+    progress(f"Finished {checkpoint['donors_done']} statements for {year} in {elapsed:.1f}s")
+    return {'year': year, 'donors': checkpoint['donors_done'], 'seconds': round(elapsed, 2)}
+
+
+def seed_statement_database(path, donors, donations_per_donor, year):
+    """Scratch database with donors who each gave several times during the year"""
+    for name in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+    config.DATABASE_URL = path
+    init_database()
+    start = datetime(year, 1, 1)
+    conn = get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO donors (donor_id, name, nic, phone, email, username, password) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"D{i:06d}", f"Donor {i}", f"{190000000000 + i}", "0771234567", f"donor{i}@example.com",
+              f"donor{i}", "!") for i in range(1, donors + 1))
+        )
+        conn.executemany(
+            "INSERT INTO donations (donor_id, amount, timestamp, receipt_number) VALUES (?, ?, ?, ?)",
+            ((f"D{i:06d}", 3900.0 * random.randint(1, 3),
+              (start + timedelta(minutes=random.randint(0, 525000))).isoformat(), f"HF{year}{i:06d}{n:02d}")
+             for i in range(1, donors + 1) for n in range(donations_per_donor))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def benchmark_statements(donors=100000, donations_per_donor=3, year=2024, workers=None, write_pdf=False,
+                         database="temp/statement_bench.db", folder="temp/statement_bench"):
+    """Seed a scratch database and run the statement job under tracemalloc"""
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    seed_statement_database(database, donors, donations_per_donor, year)
+    shutil.rmtree(folder, ignore_errors=True)
+
+    tracemalloc.start()
+    result = run_statement_job(year, workers=workers, folder=folder, write_pdf=write_pdf,
+                               progress_every=max(donors // 10, 1))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result['peak_memory_mb'] = round(peak / 1024 / 1024, 1)
+    result['donors_per_second'] = round(result['donors'] / result['seconds'], 1) if result['seconds'] else 0.0
+    return result
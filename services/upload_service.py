@@ -0,0 +1,116 @@
+import hashlib
+import os
+import time
+import uuid
+
+from config import config
+from database.operations import record_upload, get_upload, get_referenced_slips, delete_uploads
+from utils import metrics
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> (MIME type, extension); the client-reported type is not trusted
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'%PDF-', 'application/pdf', 'pdf'),
+)
+
+
+class UploadRejected(ValueError):
+    """The uploaded file cannot be stored"""
+
+
+class UploadTooLarge(UploadRejected):
+    def __init__(self, max_size):
+        super().__init__(f"File is larger than {max_size // (1024 * 1024)}MB")
+        self.max_size = max_size
+
+
+def sniff_type(head):
+    for signature, mime_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type, extension
+    raise UploadRejected("Only PNG, JPG and PDF files are accepted")
+
+
+def store_upload(source, max_size=None, folder=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream a file-like object into the upload folder under its SHA-256.
+    The size limit is enforced while writing and identical content is stored once.
+    Returns the upload's metadata row.
+    """
+    max_size = max_size or config.MAX_FILE_SIZE
+    folder = folder or config.UPLOAD_FOLDER
+    declared_size = getattr(source, 'size', None)
+    if declared_size is not None and declared_size > max_size:
+        raise UploadTooLarge(max_size)
+
+    os.makedirs(folder, exist_ok=True)
+    temp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    file_type = None
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                if file_type is None:
+                    file_type = sniff_type(chunk)
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                f.write(chunk)
+        if file_type is None:
+            raise UploadRejected("The uploaded file is empty")
+
+        sha256 = digest.hexdigest()
+        mime_type, extension = file_type
+        path = os.path.join(folder, f"{sha256}.{extension}")
+        try:
+            # Identical content is already stored; touching it restarts gc-uploads' grace period,
+            # which must cover this upload's donation as well as the first one's
+            os.utime(path)
+            os.remove(temp_path)
+        except FileNotFoundError:
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    created = record_upload(sha256, path, size, mime_type)
+    metrics.record_cache('upload_dedupe', not created)
+    return get_upload(sha256)
+
+
+def find_orphaned_uploads(folder=None, grace_seconds=3600):
+    """Files in the upload folder that no donation references
+
+    Files younger than grace_seconds are skipped: a slip is stored just before
+    its donation is committed, and temporary files may belong to a running upload.
+    """
+    folder = folder or config.UPLOAD_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    cutoff = time.time() - grace_seconds
+    candidates = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                candidates[os.path.join(folder, entry.name)] = entry.stat().st_size
+    referenced = get_referenced_slips(candidates)
+    return sorted((path, size) for path, size in candidates.items() if path not in referenced)
+
+
+def collect_garbage(folder=None, grace_seconds=3600, delete=False):
+    """Report (and with delete=True remove) orphaned upload files and their metadata"""
+    orphans = find_orphaned_uploads(folder, grace_seconds)
+    if delete:
+        for path, _ in orphans:
+            os.remove(path)
+        delete_uploads([path for path, _ in orphans])
+    return orphans
@@ -0,0 +1,69 @@
+import streamlit as st
+from database.operations import count_pending_slips, get_pending_slips, set_verification_status
+from services.reconciliation_service import get_reconciliation_sets
+from utils.instrumentation import instrument
+from utils.thumbnails import get_thumbnails
+
+PAGE_SIZE = 12
+COLUMNS = 4
+RECONCILIATION_LIMIT = 100
+
+
+@instrument()
+def display_verification_queue():
+    """Page through pending payment slips and approve or reject them in batches"""
+    st.subheader("🧾 Payment Slip Verification")
+
+    pending = count_pending_slips()
+    if not pending:
+        st.success("No payment slips are waiting for review")
+        return
+
+    pages = (pending + PAGE_SIZE - 1) // PAGE_SIZE
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.write(f"**{pending}** slips pending review")
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="verification_page")
+
+    slips = get_pending_slips(PAGE_SIZE, (page - 1) * PAGE_SIZE)
+    # Only this page's thumbnails are rendered; later reruns are served from the cache
+    thumbnails = get_thumbnails([slip['payment_slip'] for slip in slips])
+
+    select_all = st.checkbox("Select all on this page", key=f"verification_select_all_{page}")
+    selected = []
+    for start in range(0, len(slips), COLUMNS):
+        for column, slip in zip(st.columns(COLUMNS), slips[start:start + COLUMNS]):
+            with column:
+                st.image(thumbnails[slip['payment_slip']], use_column_width=True)
+                st.caption(f"{slip.get('donor_name') or 'Anonymous'} ({slip['donor_id']})\n\n"
+                           f"LKR {slip['amount']:,.2f} · {slip['timestamp'][:10]}")
+                if st.checkbox("Select", value=select_all, key=f"verify_{slip['id']}_{select_all}"):
+                    selected.append(slip['id'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"✅ Approve Selected ({len(selected)})", disabled=not selected, use_container_width=True):
+            set_verification_status(selected, 'approved')
+            st.rerun()
+    with col2:
+        if st.button(f"❌ Reject Selected ({len(selected)})", disabled=not selected, use_container_width=True):
+            set_verification_status(selected, 'rejected')
+            st.rerun()
+
+
+@instrument()
+def display_reconciliation_sets():
+    """Show the matched, ambiguous and unmatched bank statement lines from the last reconcile run"""
+    sets = get_reconciliation_sets(limit=RECONCILIATION_LIMIT)
+    if not any(sets.values()):
+        return
+
+    st.subheader("🏦 Bank Reconciliation")
+    for status, label in (('ambiguous', "❓ Ambiguous"), ('unmatched', "❌ Unmatched"), ('matched', "✅ Matched")):
+        rows = sets[status]
+        with st.expander(f"{label} ({len(rows)}{'+' if len(rows) == RECONCILIATION_LIMIT else ''})"):
+            if rows:
+                st.dataframe(rows, use_container_width=True, hide_index=True)
+            else:
+                st.caption("No statement lines")
@@ -0,0 +1,195 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Samples kept per section for the percentile view
+MAX_SAMPLES_PER_SECTION = 2000
+# Raw records kept for the JSON lines export
+MAX_EXPORT_RECORDS = 20000
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES_PER_SECTION))
+_records = deque(maxlen=MAX_EXPORT_RECORDS)
+_local = threading.local()
+_hooks_installed = False
+
+
+class _Frame:
+    __slots__ = ('name', 'rerun_id', 'started', 'queries', 'query_time', 'bytes')
+
+    def __init__(self, name, rerun_id):
+        self.name = name
+        self.rerun_id = rerun_id
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.bytes = 0
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def section(name):
+    """Measure wall time, queries and bytes emitted inside a named section"""
+    stack = _stack()
+    rerun_id = stack[0].rerun_id if stack else f"{threading.get_ident()}-{time.time_ns()}"
+    frame = _Frame(name, rerun_id)
+    stack.append(frame)
+    try:
+        yield frame
+    finally:
+        stack.pop()
+        _store(frame, time.perf_counter() - frame.started)
+
+
+def instrument(name=None):
+    """Decorator that runs a function inside its own section"""
+    def decorator(func):
+        section_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with section(section_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_query(elapsed):
+    """Attribute one database query to every open section on this thread"""
+    for frame in getattr(_local, 'stack', ()):
+        frame.queries += 1
+        frame.query_time += elapsed
+
+
+def record_bytes(size):
+    """Attribute emitted bytes to every open section on this thread"""
+    for frame in getattr(_local, 'stack', ()):
+        frame.bytes += size
+
+
+def _store(frame, wall):
+    record = {
+        'ts': time.time(),
+        'rerun_id': frame.rerun_id,
+        'section': frame.name,
+        'wall_ms': round(wall * 1000, 3),
+        'queries': frame.queries,
+        'query_ms': round(frame.query_time * 1000, 3),
+        'bytes': frame.bytes,
+    }
+    with _lock:
+        _samples[frame.name].append((wall, frame.queries, frame.query_time, frame.bytes))
+        _records.append(record)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def get_section_stats():
+    """Return p50/p95/p99 statistics for every recorded section"""
+    with _lock:
+        snapshot = {name: list(samples) for name, samples in _samples.items()}
+
+    stats = []
+    for name, samples in sorted(snapshot.items()):
+        walls = sorted(s[0] * 1000 for s in samples)
+        query_counts = sorted(s[1] for s in samples)
+        query_times = sorted(s[2] * 1000 for s in samples)
+        sizes = sorted(s[3] for s in samples)
+        stats.append({
+            'section': name,
+            'count': len(samples),
+            'wall_p50_ms': round(_percentile(walls, 50), 2),
+            'wall_p95_ms': round(_percentile(walls, 95), 2),
+            'wall_p99_ms': round(_percentile(walls, 99), 2),
+            'queries_p50': _percentile(query_counts, 50),
+            'queries_p95': _percentile(query_counts, 95),
+            'query_p95_ms': round(_percentile(query_times, 95), 2),
+            'bytes_p50': _percentile(sizes, 50),
+            'bytes_p95': _percentile(sizes, 95),
+        })
+    return stats
+
+
+def export_jsonl(path=None):
+    """Export the raw section records as JSON lines, optionally to a file"""
+    with _lock:
+        records = list(_records)
+    data = ''.join(json.dumps(record) + '\n' for record in records)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    return data
+
+
+def reset():
+    """Drop all collected samples"""
+    with _lock:
+        _samples.clear()
+        _records.clear()
+
+
+@contextmanager
+def profiled(limit=25):
+    """Profile the enclosed block; the yielded list is filled with the top functions"""
+    top_functions = []
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield top_functions
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative')
+        for func in stats.fcn_list[:limit]:
+            primitive_calls, total_calls, total_time, cumulative_time, _ = stats.stats[func]
+            filename, line, func_name = func
+            top_functions.append({
+                'function': f"{func_name} ({filename}:{line})",
+                'calls': total_calls,
+                'total_ms': round(total_time * 1000, 3),
+                'cumulative_ms': round(cumulative_time * 1000, 3),
+            })
+
+
+def install_streamlit_hooks():
+    """Count the bytes of every element Streamlit emits (installed once per process)"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    try:
+        from streamlit.delta_generator import DeltaGenerator
+    except ImportError:
+        return
+
+    original_enqueue = getattr(DeltaGenerator, '_enqueue', None)
+    if original_enqueue is None:
+        return
+
+    @wraps(original_enqueue)
+    def _enqueue(self, *args, **kwargs):
+        element_proto = args[1] if len(args) > 1 else kwargs.get('element_proto')
+        if element_proto is not None and hasattr(element_proto, 'ByteSize'):
+            record_bytes(element_proto.ByteSize())
+        return original_enqueue(self, *args, **kwargs)
+
+    DeltaGenerator._enqueue = _enqueue
+    _hooks_installed = True
@@ -0,0 +1,223 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from database.changes import start_change_feed
+
+LOCALHOST = "127.0.0.1"
+AFFINITY_COOKIE = "husma_worker"
+_AFFINITY_PATTERN = re.compile(rb"^cookie:.*\b" + AFFINITY_COOKIE.encode() + rb"=(\d+)", re.IGNORECASE | re.MULTILINE)
+
+
+class WorkerProxy:
+    """
+    TCP proxy in front of several Streamlit workers on local ports.
+
+    A Streamlit session lives in one worker (its websocket, uploads and session
+    state), so a browser must keep talking to the same one. The proxy reads the
+    first request head of each connection: a request carrying the affinity
+    cookie goes to that worker, any other goes round-robin and the response
+    sets the cookie. After the head, bytes are copied both ways unchanged.
+    """
+
+    def __init__(self, worker_ports):
+        self.worker_ports = worker_ports
+        self.next_worker = 0
+
+    def _pick(self, head):
+        match = _AFFINITY_PATTERN.search(head)
+        if match and int(match.group(1)) < len(self.worker_ports):
+            return int(match.group(1)), True
+        self.next_worker = (self.next_worker + 1) % len(self.worker_ports)
+        return self.next_worker, False
+
+    @staticmethod
+    async def _pipe(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        worker, pinned = self._pick(head)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(LOCALHOST, self.worker_ports[worker])
+        except OSError:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client_writer.close()
+            return
+
+        upstream_writer.write(head)
+        if not pinned:
+            try:
+                response = await upstream_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                client_writer.close()
+                upstream_writer.close()
+                return
+            status, rest = response.split(b"\r\n", 1)
+            cookie = f"Set-Cookie: {AFFINITY_COOKIE}={worker}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+            client_writer.write(status + b"\r\n" + cookie + rest)
+        await asyncio.gather(self._pipe(client_reader, upstream_writer), self._pipe(upstream_reader, client_writer))
+
+
+def _start_worker(index, port):
+    # Every worker gets its own metrics port; the rest of the configuration is shared. serve has
+    # already migrated the database, so the workers skip init_database (see ensure_database).
+    env = dict(os.environ, METRICS_PORT=str(config.METRICS_PORT + index), DATABASE_URL=config.DATABASE_URL,
+               HUSMA_MIGRATED=config.DATABASE_URL)
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port),
+         "--server.address", LOCALHOST, "--server.headless", "true"],
+        env=env
+    )
+
+
+async def _supervise(workers, ports):
+    """Restart any worker process that exits"""
+    while True:
+        await asyncio.sleep(1)
+        for index, process in enumerate(workers):
+            if process.poll() is not None:
+                print(f"worker {index} exited with {process.returncode}; restarting")
+                workers[index] = _start_worker(index, ports[index])
+
+
+def serve(workers=2, host=LOCALHOST, port=8501, base_port=8600):
+    """Run workers Streamlit processes on base_port.. behind a proxy on host:port until interrupted"""
+    from database.operations import init_database
+
+    # Migrate once here; the workers are told so through HUSMA_MIGRATED and skip it
+    init_database()
+    ports = [base_port + index for index in range(workers)]
+    processes = [_start_worker(index, worker_port) for index, worker_port in enumerate(ports)]
+
+    async def main():
+        server = await asyncio.start_server(WorkerProxy(ports).handle, host, port)
+        print(f"Serving {workers} workers (ports {ports[0]}-{ports[-1]}) on http://{host}:{port}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), _supervise(processes, ports))
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def _consistency_worker(database, threads, checkouts, donors, barrier, rewritten, results):
+    """One worker process: warm the caches, run concurrent checkouts, then report what its caches see"""
+    config.DATABASE_URL = database
+    from database.operations import record_checkout
+    from services.analytics_snapshot import get_snapshot
+    from services.ranking_service import get_ranking
+
+    feed = start_change_feed()
+    get_snapshot()
+    get_ranking().refresh()
+    errors = []
+
+    def session(number):
+        for checkout in range(checkouts):
+            try:
+                record_checkout(f"D{(number + checkout) % donors + 1:03d}", 100.0, [(1, 1)], {}, (), None, None)
+            except Exception as e:
+                errors.append(str(e))
+
+    barrier.wait()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(session, range(threads)))
+    barrier.wait()
+
+    # The parent voids a donation: a rewrite the caches cannot see by appending
+    rewritten.wait()
+    feed.poll()
+    columns = get_snapshot()
+    ranking = get_ranking()
+    ranking.refresh()
+    results.put({
+        'errors': errors,
+        'donations': len(columns.amount),
+        'total': float(columns.amount.sum()),
+        'ranking': {donor_id: total for donor_id, (total, _) in ranking.totals.items()},
+    })
+
+
+def check_workers(workers=2, threads=4, checkouts=50, donors=4, database="temp/workers_check.db"):
+    """Concurrent checkouts from several processes, then compare every process's caches with the database"""
+    from database.operations import init_database, create_donor, execute_write, execute_query, \
+        compute_donor_totals, load_donor_totals
+
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    for path in (database, f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    config.DATABASE_URL = database
+    init_database()
+    for number in range(1, donors + 1):
+        create_donor((f"D{number:03d}", f"Donor {number}", f"{number:012d}", "0771234567",
+                      f"d{number}@example.com", f"donor{number}", "!"))
+    expected = workers * threads * checkouts
+    execute_write("UPDATE inventory SET stock = ? WHERE product_id = 1", (expected,))
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    rewritten = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_consistency_worker,
+                                 args=(database, threads, checkouts, donors, barrier, rewritten, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    barrier.wait()
+    execute_write("DELETE FROM donations WHERE id = (SELECT MIN(id) FROM donations)")
+    rewritten.set()
+    views = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+
+    truth = execute_query("SELECT COUNT(*) AS donations, COALESCE(SUM(amount), 0) AS total FROM donations",
+                          fetch=True)
+    stock = execute_query("SELECT stock FROM inventory WHERE product_id = 1", fetch=True)['stock']
+    totals = compute_donor_totals()
+    table = load_donor_totals()[1]
+    result = {
+        'workers': workers,
+        'checkouts': expected,
+        'errors': sum(len(view['errors']) for view in views),
+        'donations': truth['donations'],
+        'stock_left': stock,
+        'donations_recorded': truth['donations'] == expected - 1,
+        'stock_matches': stock == 0,
+        'donor_totals_match': all(abs(table[donor_id][0] - total) < 0.005 and table[donor_id][1] == count
+                                  for donor_id, (total, count) in totals.items()) and len(table) == len(totals),
+        'snapshots_match': all(view['donations'] == truth['donations'] and abs(view['total'] - truth['total']) < 0.005
+                               for view in views),
+        'rankings_match': all(set(view['ranking']) == set(totals) and
+                              all(abs(view['ranking'][donor_id] - total) < 0.005
+                                  for donor_id, (total, _) in totals.items())
+                              for view in views),
+    }
+    result['consistent'] = not result['errors'] and all(value for key, value in result.items()
+                                                        if key.endswith(('_recorded', '_matches', '_match')))
+    return result
@@ -0,0 +1,315 @@
+import itertools
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from queue import Empty
+
+from config import config
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+LOAD_PASSWORD = "LoadTest#2024"
+LOCKED_MESSAGE = "database is locked"
+
+_counter = itertools.count(1)
+_counter_lock = threading.Lock()
+
+
+def _next_number():
+    with _counter_lock:
+        return next(_counter)
+
+
+def seed_database(path, donors=100, donations=1000, children=50):
+    """Create a scratch database with synthetic donors, donations and children"""
+    from database.operations import init_database, get_connection, sync_donor_sequence
+    from auth.authentication import hash_password
+
+    for name in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+    config.DATABASE_URL = path
+    init_database()
+
+    password = hash_password(LOAD_PASSWORD)
+    conn = get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO donors (donor_id, name, nic, phone, email, username, password) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"D{i:03d}", f"Load Donor {i}", f"{199000000000 + i}", "0771234567",
+              f"donor{i}@load.test", f"loaduser{i}", password) for i in range(1, donors + 1))
+        )
+        start = datetime.now() - timedelta(days=365)
+        conn.executemany(
+            "INSERT INTO donations (donor_id, amount, payment_slip, timestamp) VALUES (?, ?, NULL, ?)",
+            ((f"D{random.randint(1, donors):03d}", random.choice((3000.0, 3500.0, 3900.0, 7800.0)),
+              (start + timedelta(minutes=random.randint(0, 525600))).isoformat())
+             for _ in range(donations if donors else 0))
+        )
+        conn.executemany(
+            "INSERT INTO children (name, birthday, guardian, phone, milk_type) VALUES (?, ?, ?, ?, ?)",
+            ((f"Load Child {i}", "2018-01-01", f"Guardian {i}", "0771234567", "Pediasure")
+             for i in range(1, children + 1))
+        )
+        # Keep stock high enough that checkouts never run dry
+        conn.execute("UPDATE inventory SET stock = 1000000")
+        sync_donor_sequence(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"Widget not found: {label}")
+
+
+def _messages(at):
+    messages = [str(e.value) for e in at.error]
+    messages += [str(e.value) for e in at.exception]
+    return messages
+
+
+class VirtualUser:
+    """One simulated donor or admin driving app.py through AppTest; steps are appended to records"""
+
+    def __init__(self, records, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.records = records
+
+    @staticmethod
+    def _run(node):
+        """node.run(), tolerating AppTest's race on the runner's shutdown event
+
+        AppTest returns once the script has stopped, then reads the query string
+        from the shutdown event, which a loaded machine may not have recorded yet
+        (KeyError 'client_state'). The page is already rendered by then, so the
+        step's own checks still decide whether it passed.
+        """
+        try:
+            node.run()
+        except KeyError as e:
+            if e.args != ('client_state',):
+                raise
+
+    def _step(self, name, action, expect=None):
+        started = time.perf_counter()
+        error = None
+        try:
+            action()
+            messages = _messages(self.at)
+            if messages:
+                error = messages[0]
+            elif expect and not any(expect in str(s.value) for s in self.at.success):
+                error = f"missing '{expect}'"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.records.append((name, time.perf_counter() - started, error))
+        return error is None
+
+    def register(self):
+        number = _next_number()
+        tag = f"{os.getpid()}_{number}"
+        at = self.at
+
+        def submit():
+            at.session_state.current_page = "Register"
+            at.session_state.show_login = False
+            at.session_state.user = None
+            self._run(at)
+            at.text_input(key="register_name").input(f"Virtual Donor {tag}")
+            at.text_input(key="register_nic").input(f"{200000000000 + number + os.getpid() * 100000}")
+            at.text_input(key="register_phone").input("0771234567")
+            at.text_input(key="register_email").input(f"vu{tag}@load.test")
+            at.text_input(key="register_username").input(f"vu{tag}")
+            at.text_input(key="register_password").input(LOAD_PASSWORD)
+            at.checkbox(key="register_terms").check()
+            # Form submit buttons take no key in this Streamlit version
+            self._run(_widget(at.button, "Create Account").click())
+
+        return self._step("register", submit, expect="Account created")
+
+    def login(self, username):
+        at = self.at
+
+        def submit():
+            at.session_state.current_page = "Register"
+            at.session_state.show_login = True
+            at.session_state.user = None
+            self._run(at)
+            at.text_input(key="login_identifier").input(username)
+            at.text_input(key="login_password").input(LOAD_PASSWORD)
+            self._run(_widget(at.button, "Login").click())
+            if not at.session_state.user:
+                raise RuntimeError("login rejected")
+
+        return self._step("login", submit)
+
+    def checkout(self, product_id=1, quantity=1):
+        at = self.at
+
+        def add_items():
+            at.session_state.current_page = "Donate"
+            at.session_state.checkout_active = False
+            at.session_state.cart = []
+            self._run(at)
+            self._run(at.number_input(key=f"qty_{product_id}").set_value(quantity))
+            self._run(at.button(key=f"add_{product_id}").click())
+            if not at.session_state.cart:
+                raise RuntimeError("cart is empty")
+
+        if not self._step("add_to_cart", add_items):
+            return False
+
+        def confirm():
+            self._run(at.button(key="proceed_checkout").click())
+            self._run(at.button(key="confirm_donation").click())
+
+        return self._step("checkout", confirm, expect="Thank you for your donation")
+
+    def issue_milk(self, child_id):
+        at = self.at
+
+        def issue():
+            at.session_state.current_page = "Admin"
+            at.session_state.admin_logged_in = True
+            self._run(at)
+            self._run(at.button(key=f"issue_{child_id}").click())
+
+        return self._step("issue_milk", issue)
+
+
+def _virtual_user(index, iterations, seed_donors, seed_children, timeout, results):
+    """One virtual user in its own process: AppTest sessions share Streamlit's runtime within a process"""
+    records = []
+    try:
+        user = VirtualUser(records, timeout)
+        for _ in range(iterations):
+            # Every fifth user also works the admin desk
+            if index % 5 == 0 and seed_children:
+                user.issue_milk(random.randint(1, seed_children))
+            if user.register():
+                user.checkout(product_id=random.randint(1, 6))
+            if seed_donors:
+                if user.login(f"loaduser{random.randint(1, seed_donors)}"):
+                    user.checkout(product_id=random.randint(1, 6), quantity=random.randint(1, 3))
+    except Exception as e:
+        records.append(("session", 0.0, f"{type(e).__name__}: {e}"))
+    results.put(records)
+
+
+class LoadTestResults:
+    """Latency and error collection per step, merged from every virtual user"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.locked_errors = 0
+        self.error_samples = defaultdict(list)
+
+    def record(self, step, elapsed, error=None):
+        self.latencies[step].append(elapsed)
+        if error:
+            self.errors[step] += 1
+            if LOCKED_MESSAGE in error:
+                self.locked_errors += 1
+            if len(self.error_samples[step]) < 5:
+                self.error_samples[step].append(error)
+
+    def summary(self, duration):
+        rows = []
+        for step, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+
+            def pct(p):
+                return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+            rows.append({
+                'step': step,
+                'count': len(ordered),
+                'throughput_per_s': round(len(ordered) / duration, 2) if duration else 0.0,
+                'p50_ms': round(pct(50), 1),
+                'p95_ms': round(pct(95), 1),
+                'p99_ms': round(pct(99), 1),
+                'error_rate': round(self.errors[step] / len(ordered), 4),
+            })
+        return rows
+
+
+def run_load_test(users=10, iterations=5, seed_donors=100, seed_donations=1000, seed_children=50,
+                  database="temp/loadtest.db", timeout=30):
+    """Run concurrent virtual users, one process each, through the donor and admin flows"""
+    os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    seed_database(database, seed_donors, seed_donations, seed_children)
+
+    # Spawned users read their configuration from the environment at import. Virtual
+    # users share a small pool of identifiers, so keep the login throttle out of the results.
+    overrides = {'DATABASE_URL': database, 'METRICS_ENABLED': "false",
+                 'LOGIN_IDENTIFIER_BURST': str(10 ** 9), 'LOGIN_IP_BURST': str(10 ** 9)}
+    previous = {name: os.environ.get(name) for name in overrides}
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [context.Process(target=_virtual_user,
+                                 args=(index, iterations, seed_donors, seed_children, timeout, queue))
+                 for index in range(users)]
+
+    results = LoadTestResults()
+    started = time.perf_counter()
+    os.environ.update(overrides)
+    try:
+        for process in processes:
+            process.start()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    reported = 0
+    while reported < users:
+        try:
+            records = queue.get(timeout=1)
+        except Empty:
+            if any(process.is_alive() for process in processes):
+                continue
+            # A user process died without reporting
+            for _ in range(users - reported):
+                results.record("session", 0.0, "virtual user process exited without results")
+            break
+        reported += 1
+        for step, elapsed, error in records:
+            results.record(step, elapsed, error)
+    for process in processes:
+        process.join()
+    duration = time.perf_counter() - started
+
+    return {
+        'users': users,
+        'iterations': iterations,
+        'duration_s': round(duration, 2),
+        'steps': results.summary(duration),
+        'locked_errors': results.locked_errors,
+        'error_samples': dict(results.error_samples),
+    }
+
+
+def print_report(report):
+    """Print a load test report as a table"""
+    print(f"Virtual users: {report['users']}  iterations: {report['iterations']}  "
+          f"duration: {report['duration_s']}s")
+    print(f"{'step':<14}{'count':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for row in report['steps']:
+        print(f"{row['step']:<14}{row['count']:>8}{row['throughput_per_s']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['error_rate']:>10.2%}")
+    print(f"'database is locked' errors: {report['locked_errors']}")
+    for step, samples in report['error_samples'].items():
+        for sample in samples:
+            print(f"  {step}: {sample}")
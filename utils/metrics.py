@@ -0,0 +1,268 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    'husma_rerun_seconds': ('histogram', 'Streamlit rerun latency per page'),
+    'husma_query_seconds': ('histogram', 'execute_query latency per operation'),
+    'husma_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'husma_checkouts_total': ('counter', 'Completed donation checkouts'),
+    'husma_registrations_total': ('counter', 'Completed donor registrations'),
+    'husma_outbox_batch_seconds': ('histogram', 'Outbox batch delivery time per queue'),
+    'husma_outbox_sent_total': ('counter', 'Outbox messages delivered per queue'),
+    'husma_outbox_failed_total': ('counter', 'Outbox delivery failures per queue'),
+    'husma_sms_send_seconds': ('histogram', 'SMS gateway bulk submission latency'),
+    'husma_write_batch_seconds': ('histogram', 'Writer thread transaction time per group commit'),
+    'husma_write_batch_operations': ('histogram', 'Write operations per group commit'),
+}
+
+_registry_lock = threading.Lock()
+_scrape_lock = threading.Lock()
+_shards = []
+_retired_counters = {}
+_retired_histograms = {}
+_local = threading.local()
+_gauges = {}
+_queues = {}
+_server = None
+
+
+class _Shard:
+    """Metric values written by a single thread; merged at scrape time"""
+    __slots__ = ('thread', 'lock', 'counters', 'histograms')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _registry_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter"""
+    shard = _shard()
+    key = (name, _labels_key(labels))
+    with shard.lock:
+        shard.counters[key] = shard.counters.get(key, 0) + amount
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Record one observation in a histogram"""
+    shard = _shard()
+    key = (name, _labels_key(labels))
+    with shard.lock:
+        hist = shard.histograms.get(key)
+        if hist is None:
+            # bucket counts, then sum and count
+            hist = shard.histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+        for i, bound in enumerate(hist[0]):
+            if value <= bound:
+                hist[1][i] += 1
+                break
+        hist[2] += value
+        hist[3] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the enclosed block"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def record_cache(cache, hit):
+    """Count a cache hit or miss"""
+    inc('husma_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+_QUERY_PATTERN = re.compile(
+    r'^\s*(select|insert|update|delete|replace)\b(?:.*?\b(?:from|into)\s+(\w+)|\s+(?:or\s+\w+\s+)?(\w+))',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+@lru_cache(maxsize=512)
+def query_operation(query):
+    """Short operation label for a SQL statement, e.g. 'select donors'"""
+    match = _QUERY_PATTERN.match(query)
+    if not match:
+        return query.split(None, 1)[0].lower() if query.strip() else 'unknown'
+    return f"{match.group(1).lower()} {match.group(2) or match.group(3)}"
+
+
+def register_gauge(name, help_text, callback):
+    """Register a gauge; callback returns a number or a list of (labels, value)"""
+    _gauges[name] = (help_text, callback)
+
+
+def register_queue(queue, depth_callback):
+    """Expose the outstanding depth of a notification queue"""
+    _queues[queue] = depth_callback
+
+
+def _fold(counters, histograms, source_counters, source_histograms):
+    for key, value in source_counters.items():
+        counters[key] = counters.get(key, 0) + value
+    for key, (buckets, bucket_counts, total, count) in source_histograms.items():
+        hist = histograms.get(key)
+        if hist is None:
+            hist = histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+        hist[1] = [a + b for a, b in zip(hist[1], bucket_counts)]
+        hist[2] += total
+        hist[3] += count
+
+
+def _merge():
+    """Merge every shard; shards of finished threads are folded into the retired totals"""
+    counters = {}
+    histograms = {}
+    with _scrape_lock:
+        _fold(counters, histograms, _retired_counters, _retired_histograms)
+        with _registry_lock:
+            shards = list(_shards)
+        for shard in shards:
+            with shard.lock:
+                shard_counters = dict(shard.counters)
+                shard_histograms = {k: [v[0], list(v[1]), v[2], v[3]] for k, v in shard.histograms.items()}
+            _fold(counters, histograms, shard_counters, shard_histograms)
+            if not shard.thread.is_alive():
+                with _registry_lock:
+                    _shards.remove(shard)
+                _fold(_retired_counters, _retired_histograms, shard_counters, shard_histograms)
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    counters, histograms = _merge()
+    lines = []
+    emitted = set()
+
+    def header(name, kind, help_text):
+        if name not in emitted:
+            emitted.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for name, (kind, help_text) in _HELP.items():
+        if kind == 'counter' and not any(key[0] == name for key in counters):
+            header(name, kind, help_text)
+            lines.append(f"{name} 0")
+
+    for (name, labels), value in sorted(counters.items()):
+        kind, help_text = _HELP.get(name, ('counter', name))
+        header(name, kind, help_text)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    # Derived hit ratio per cache
+    lookups = {}
+    for (name, labels), value in counters.items():
+        if name == 'husma_cache_requests_total':
+            label_map = dict(labels)
+            hits, total = lookups.get(label_map['cache'], (0, 0))
+            lookups[label_map['cache']] = (hits + (value if label_map['result'] == 'hit' else 0), total + value)
+    header('husma_cache_hit_ratio', 'gauge', 'Cache hit ratio since process start')
+    for cache, (hits, total) in sorted(lookups.items()):
+        lines.append(f"husma_cache_hit_ratio{_format_labels([('cache', cache)])} {_format_value(hits / total)}")
+
+    for (name, labels), (buckets, bucket_counts, total, count) in sorted(histograms.items()):
+        kind, help_text = _HELP.get(name, ('histogram', name))
+        header(name, kind, help_text)
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    header('husma_notification_queue_depth', 'gauge', 'Outstanding notifications per queue')
+    for queue, callback in sorted(_queues.items()):
+        try:
+            depth = callback()
+        except Exception:
+            continue
+        lines.append(f"husma_notification_queue_depth{_format_labels([('queue', queue)])} {depth}")
+
+    for name, (help_text, callback) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception:
+            continue
+        header(name, 'gauge', help_text)
+        if isinstance(value, (int, float)):
+            lines.append(f"{name} {_format_value(value)}")
+        else:
+            for labels, sample in value:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(sample)}")
+
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host, port):
+    """Start the metrics HTTP server on a background thread (once per process)"""
+    global _server
+    with _registry_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            # Another worker process already serves this port
+            return None
+        _server.daemon_threads = True
+        thread = threading.Thread(target=_server.serve_forever, name='husma-metrics', daemon=True)
+        thread.start()
+        return _server
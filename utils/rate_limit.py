@@ -0,0 +1,105 @@
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets kept as (tokens, timestamp) tuples
+
+    Buckets that have refilled completely carry no state, so they are evicted
+    by a periodic sweep and the table only holds recently active keys.
+    """
+
+    def __init__(self, rate, burst, sweep_interval=60.0, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.next_sweep = clock() + sweep_interval
+
+    def _refill(self, key, now):
+        state = self.buckets.get(key)
+        if state is None:
+            return self.burst
+        tokens, last = state
+        return min(self.burst, tokens + (now - last) * self.rate)
+
+    def allow(self, key, cost=1.0):
+        """Take cost tokens from the key's bucket; False if not enough are left"""
+        now = self.clock()
+        with self.lock:
+            if now >= self.next_sweep:
+                self._sweep(now)
+            tokens = self._refill(key, now)
+            if tokens < cost:
+                self.buckets[key] = (tokens, now)
+                return False
+            self.buckets[key] = (tokens - cost, now)
+            return True
+
+    def retry_after(self, key, cost=1.0):
+        """Seconds until the key's bucket holds cost tokens again"""
+        with self.lock:
+            tokens = self._refill(key, self.clock())
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def _sweep(self, now):
+        full_after = self.burst / self.rate
+        stale = [key for key, (_, last) in self.buckets.items() if now - last >= full_after]
+        for key in stale:
+            del self.buckets[key]
+        self.next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+class ExpiringSet:
+    """Set of keys that each expire ttl seconds after being added"""
+
+    def __init__(self, ttl, max_size=100000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def add(self, key):
+        now = self.clock()
+        with self.lock:
+            if len(self.entries) >= self.max_size:
+                self._evict(now)
+            # Re-insert so dict order stays oldest-first
+            self.entries.pop(key, None)
+            self.entries[key] = now + self.ttl
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __contains__(self, key):
+        with self.lock:
+            expires = self.entries.get(key)
+            if expires is None:
+                return False
+            if expires <= self.clock():
+                del self.entries[key]
+                return False
+            return True
+
+    def _evict(self, now):
+        expired = [key for key, expires in self.entries.items() if expires <= now]
+        for key in expired:
+            del self.entries[key]
+        # Still full: drop the oldest quarter
+        if len(self.entries) >= self.max_size:
+            for key in list(self.entries)[:self.max_size // 4]:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,128 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from database.changes import subscribe
+from utils import metrics
+
+THUMBNAIL_SIZE = (240, 240)
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+_pool = None
+_pool_lock = threading.Lock()
+_placeholders = {}
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond max_size"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_cache = LRUCache(config.THUMBNAIL_CACHE_SIZE)
+# Slips garbage-collected by any process should render as missing, not from the cache
+subscribe('uploads', _cache.clear)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.THUMBNAIL_WORKERS, thread_name_prefix="husma-thumbnail")
+    return _pool
+
+
+def _to_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def placeholder(label):
+    """Document icon with a label, drawn once per label"""
+    if label not in _placeholders:
+        from PIL import Image, ImageDraw, ImageFont
+
+        width, height = THUMBNAIL_SIZE
+        image = Image.new('RGB', THUMBNAIL_SIZE, color=(240, 244, 248))
+        draw = ImageDraw.Draw(image)
+        left, top, right, bottom = width // 2 - 50, 30, width // 2 + 50, height - 50
+        draw.polygon([(left, top), (right - 30, top), (right, top + 30), (right, bottom), (left, bottom)],
+                     fill=(255, 255, 255), outline=(46, 134, 171))
+        draw.line([(right - 30, top), (right - 30, top + 30), (right, top + 30)], fill=(46, 134, 171))
+        try:
+            font = ImageFont.truetype("arial.ttf", 24)
+        except OSError:
+            font = ImageFont.load_default()
+        bbox = draw.textbbox((0, 0), label, font=font)
+        draw.text(((width - (bbox[2] - bbox[0])) // 2, (top + bottom) // 2 - 12), label, fill=(46, 134, 171),
+                  font=font)
+        _placeholders[label] = _to_png(image)
+    return _placeholders[label]
+
+
+def render_thumbnail(path):
+    """PNG thumbnail of an image slip, or a placeholder for PDFs and unreadable files"""
+    from PIL import Image
+
+    if not os.path.exists(path):
+        return placeholder("MISSING")
+    if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+        return placeholder("PDF")
+    try:
+        with Image.open(path) as image:
+            # JPEGs decode straight at a reduced scale instead of full size
+            image.draft('RGB', THUMBNAIL_SIZE)
+            image = image.convert('RGB')
+            image.thumbnail(THUMBNAIL_SIZE)
+            return _to_png(image)
+    except OSError:
+        return placeholder("ERROR")
+
+
+def get_thumbnails(paths):
+    """Thumbnails for a page of slips keyed by path; cache misses render concurrently
+
+    Uploads are content-addressed, so a path always refers to the same bytes and
+    cached thumbnails never go stale.
+    """
+    thumbnails, futures = {}, {}
+    for path in dict.fromkeys(paths):
+        cached = _cache.get(path)
+        metrics.record_cache('slip_thumbnails', cached is not None)
+        if cached is not None:
+            thumbnails[path] = cached
+        else:
+            futures[path] = get_pool().submit(render_thumbnail, path)
+    for path, future in futures.items():
+        thumbnails[path] = future.result()
+        _cache.put(path, thumbnails[path])
+    return thumbnails